@@ -0,0 +1,311 @@
+"""
+Settlement benchmark against an in-process EVM (eth-tester), no testnet needed.
+
+Sweeps merchant count, concurrent checkout sessions and simulated block time
+through X402SettlementTool (or the full ForceToolPaymentProcessor agent) and
+reports payouts/transactions per second, p50/p99 cart latency and RPC calls
+per cart as JSON.
+
+    python bench_settlement.py --merchants 1,10,50,200 --concurrency 1,4,16 --block-time 0,0.25 --out bench.json
+    python bench_settlement.py --out new.json --compare bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from eth_account import Account
+from eth_tester import EthereumTester, PyEVMBackend
+from web3 import AsyncWeb3
+from web3._utils.caching import async_handle_request_caching
+from web3.providers.eth_tester import AsyncEthereumTesterProvider
+from web3.providers.eth_tester.defaults import API_ENDPOINTS, static_return
+
+from shopping_concierge.rpc_client import SKALE_CHAIN_ID
+from shopping_concierge.mandate_verifier import mandate_verifier, mandate_message
+from shopping_concierge.wallet_pool import WalletPool
+from shopping_concierge.x402_settlement_tool import X402SettlementTool
+
+# Keys that identify a scenario when comparing two result files
+SCENARIO_KEYS = ("path", "mode", "merchants", "concurrency", "block_time", "wallets")
+
+
+class LocalChainProvider(AsyncEthereumTesterProvider):
+    """
+    eth-tester provider that answers as the SKALE chain, counts every RPC, and can
+    simulate block time: eth-tester mines each transaction immediately, so receipts
+    are withheld until the block boundary after the transaction was sent.
+    """
+
+    def __init__(self, chain_id: int = SKALE_CHAIN_ID, block_time: float = 0.0):
+        super().__init__()
+        backend = PyEVMBackend()
+        type(backend.chain).chain_id = chain_id
+        self.ethereum_tester = EthereumTester(backend)
+        self.api_endpoints = {**API_ENDPOINTS, "eth": {**API_ENDPOINTS["eth"], "chainId": static_return(chain_id)}}
+        self.block_time = block_time
+        self.calls = Counter()
+        self.round_trips = 0
+        self._started = time.monotonic()
+        self._mined_at: dict[str, float] = {}
+
+    def _next_block(self) -> float:
+        elapsed = time.monotonic() - self._started
+        return self._started + math.floor(elapsed / self.block_time + 1) * self.block_time
+
+    async def _request(self, method, params):
+        self.calls[method] += 1
+        if self.block_time and method == "eth_getTransactionReceipt":
+            mined_at = self._mined_at.get(str(params[0]).lower())
+            if mined_at is not None and time.monotonic() < mined_at:
+                return {"jsonrpc": "2.0", "id": self._current_request_id, "result": None}
+        response = await super().make_request(method, params)
+        if self.block_time and method == "eth_sendRawTransaction" and "result" in response:
+            self._mined_at[str(response["result"]).lower()] = self._next_block()
+        return response
+
+    # Same request caching HTTPProvider applies, so eth_chainId is counted as it would be live
+    @async_handle_request_caching
+    async def make_request(self, method, params):
+        self.round_trips += 1
+        return await self._request(method, params)
+
+    async def make_batch_request(self, requests):
+        self.round_trips += 1
+        return [await self._request(method, params) for method, params in requests]
+
+
+def sign_cart(cart_mandate: dict, private_key) -> str:
+    digest = mandate_verifier.digest(cart_mandate["chain_id"], mandate_message(cart_mandate))
+    return "0x" + Account.unsafe_sign_hash(digest, private_key).signature.hex().removeprefix("0x")
+
+
+def build_cart(merchants: int, tag: str) -> dict:
+    # Unique item names per cart so the verifier's signature cache never short-circuits a run
+    items = [{"name": f"{tag}-item-{i}", "merchant_address": "0x00", "amount": 5 + i % 20} for i in range(merchants)]
+    return {
+        "chain_id": SKALE_CHAIN_ID,
+        "merchant_address": "0xFe5e03799Fe833D93e950d22406F9aD901Ff3Bb9",
+        "amount": sum(item["amount"] for item in items),
+        "currency": "USDC",
+        "merchants": items
+    }
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+async def _settle_via_tool(tool, payment_mandate: dict) -> dict:
+    return await tool.run_async(args={"payment_mandate": payment_mandate}, tool_context=None)
+
+
+def _processor_runner(tool):
+    """ForceToolPaymentProcessor behind an ADK Runner, settling through `tool`."""
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from shopping_concierge.x402_settlement import ForceToolPaymentProcessor
+
+    processor = ForceToolPaymentProcessor()
+    processor._settlement_tool = tool
+    return Runner(app_name="bench", agent=processor, session_service=InMemorySessionService())
+
+
+async def _settle_via_processor(runner, payment_mandate: dict) -> dict:
+    from google.genai.types import Content, Part
+    from shopping_concierge.mandate_index import INDEX_STATE_KEY
+
+    session = await runner.session_service.create_session(
+        app_name="bench",
+        user_id="bench",
+        state={
+            "payment_mandate": {"authorized": True, "signature": payment_mandate["signature"]},
+            INDEX_STATE_KEY: {"authorized": True, "signature": payment_mandate["signature"], "cart_mandate": payment_mandate["cart_mandate"]}
+        }
+    )
+    message = Content(role="user", parts=[Part(text="Here is my signature for the CartMandate: " + payment_mandate["signature"])])
+    final_text = ""
+    async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+        if not event.partial and event.content and event.content.parts:
+            final_text = event.content.parts[0].text or ""
+    start = final_text.find("```json\n")
+    if start == -1:
+        return {"status": "failed", "receipts": [], "failures": [final_text]}
+    return json.loads(final_text[start + 8:final_text.rindex("\n```")])
+
+
+async def run_scenario(scenario: dict, carts_per_session: int) -> dict:
+    provider = LocalChainProvider(block_time=scenario["block_time"])
+    provider.cache_allowed_requests = True
+    provider.cacheable_requests = {"eth_chainId"}
+    w3 = AsyncWeb3(provider)
+
+    funder = (await w3.eth.accounts)[0]
+    agents = [Account.create() for _ in range(scenario["wallets"])]
+    for agent in agents:
+        await w3.eth.wait_for_transaction_receipt(
+            await w3.eth.send_transaction({"from": funder, "to": agent.address, "value": 10 ** 22})
+        )
+    user = Account.create()
+    tool = X402SettlementTool(
+        w3=w3,
+        wallet_pool=WalletPool([agent.key.hex() for agent in agents], w3),
+        mode=scenario["mode"]
+    )
+    if scenario["path"] == "processor":
+        runner = _processor_runner(tool)
+        settle = lambda mandate: _settle_via_processor(runner, mandate)
+    else:
+        settle = lambda mandate: _settle_via_tool(tool, mandate)
+
+    # Warm-up cart: deploys the batch contract where needed and primes fee/nonce caches
+    warm_cart = build_cart(1, "warmup")
+    await _settle_via_tool(tool, {"signature": sign_cart(warm_cart, user.key), "cart_mandate": warm_cart})
+    provider.calls.clear()
+    provider.round_trips = 0
+
+    latencies, payouts, failures = [], 0, 0
+
+    async def session(index: int):
+        nonlocal payouts, failures
+        for cart_index in range(carts_per_session):
+            cart = build_cart(scenario["merchants"], f"s{index}c{cart_index}")
+            mandate = {"signature": sign_cart(cart, user.key), "cart_mandate": cart}
+            started = time.perf_counter()
+            result = await settle(mandate)
+            latencies.append(time.perf_counter() - started)
+            payouts += len(result.get("receipts", []))
+            failures += len(result.get("failures", []))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(index) for index in range(scenario["concurrency"])))
+    wall = time.perf_counter() - started
+
+    carts = scenario["concurrency"] * carts_per_session
+    return {
+        **scenario,
+        "carts": carts,
+        "wall_seconds": round(wall, 4),
+        "payouts_per_second": round(payouts / wall, 2),
+        "transactions_per_second": round(provider.calls["eth_sendRawTransaction"] / wall, 2),
+        "carts_per_second": round(carts / wall, 3),
+        "latency_p50": round(statistics.median(latencies), 4),
+        "latency_p99": round(percentile(latencies, 99), 4),
+        "rpc_calls_per_cart": round(provider.round_trips / carts, 2),
+        "rpc_methods_per_cart": {method: round(count / carts, 2) for method, count in sorted(provider.calls.items())},
+        "payouts": payouts,
+        "failures": failures
+    }
+
+
+def scenario_key(result: dict) -> tuple:
+    return tuple(result[key] for key in SCENARIO_KEYS)
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Prints per-scenario deltas; returns the scenarios that regressed by more than `tolerance`."""
+    before = {scenario_key(result): result for result in baseline["results"]}
+    regressions = []
+    print(f"\nComparing against {baseline['meta'].get('commit')} (tolerance {tolerance:.0%})")
+    print(f"{'scenario':<48} {'tps':>22} {'p99 (s)':>22} {'rpc/cart':>16}")
+    for result in current["results"]:
+        old = before.get(scenario_key(result))
+        if old is None:
+            continue
+        tps_delta = result["payouts_per_second"] / old["payouts_per_second"] - 1 if old["payouts_per_second"] else 0.0
+        p99_delta = result["latency_p99"] / old["latency_p99"] - 1 if old["latency_p99"] else 0.0
+        label = "/".join(str(value) for value in scenario_key(result))
+        print(
+            f"{label:<48} {old['payouts_per_second']:>8} -> {result['payouts_per_second']:<8} ({tps_delta:+.0%})"
+            f" {old['latency_p99']:>7} -> {result['latency_p99']:<7} ({p99_delta:+.0%})"
+            f" {old['rpc_calls_per_cart']:>6} -> {result['rpc_calls_per_cart']:<6}"
+        )
+        if tps_delta < -tolerance or p99_delta > tolerance:
+            regressions.append(label)
+    return regressions
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",") if item]
+
+
+async def main(args) -> int:
+    scenarios = [
+        {"path": path, "mode": mode, "merchants": merchants, "concurrency": concurrency, "block_time": block_time, "wallets": args.wallets}
+        for path in parse_list(args.path, str)
+        for mode in parse_list(args.modes, str)
+        for block_time in parse_list(args.block_time, float)
+        for merchants in parse_list(args.merchants, int)
+        for concurrency in parse_list(args.concurrency, int)
+    ]
+    results = []
+    for scenario in scenarios:
+        # The tool and agent log every step; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO() if not args.verbose else sys.stdout):
+            result = await run_scenario(scenario, args.carts_per_session)
+        results.append(result)
+        print(
+            f"[BENCH] {'/'.join(str(value) for value in scenario_key(result))}: "
+            f"{result['payouts_per_second']} payouts/s, p50 {result['latency_p50']}s, "
+            f"p99 {result['latency_p99']}s, {result['rpc_calls_per_cart']} RPC/cart",
+            file=sys.stderr
+        )
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "carts_per_session": args.carts_per_session
+        },
+        "results": results
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} scenario(s) regressed: {', '.join(regressions)}")
+            return 1
+        print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--merchants", default="1,10,50,200", help="comma-separated merchant counts per cart")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrent checkout sessions")
+    parser.add_argument("--block-time", default="0,0.25", help="comma-separated simulated block times (seconds)")
+    parser.add_argument("--modes", default="pipelined", help="settlement modes: pipelined,sequential,batch_contract")
+    parser.add_argument("--path", default="tool", help="tool (X402SettlementTool) and/or processor (ForceToolPaymentProcessor)")
+    parser.add_argument("--wallets", type=int, default=1, help="agent wallets in the pool")
+    parser.add_argument("--carts-per-session", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to diff against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed tps drop / p99 rise when comparing")
+    parser.add_argument("--verbose", action="store_true", help="keep the tool's own logging")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,6 +1,7 @@
+import asyncio
 import os
-from web3 import Web3
 from dotenv import load_dotenv
+from shopping_concierge.rpc_client import get_async_web3, close_async_web3
 
 # Load your .env file
 load_dotenv()
@@ -10,18 +11,23 @@ if not private_key:
     print("❌ ERROR: SKALE_AGENT_PRIVATE_KEY not found in .env")
     exit()
 
-# Connect to SKALE Base Sepolia Testnet
-w3 = Web3(Web3.HTTPProvider("https://base-sepolia-testnet.skalenodes.com/v1/jubilant-horrible-ancha"))
+async def main():
+    # Connect to SKALE Base Sepolia Testnet through the shared pooled client
+    w3 = await get_async_web3()
 
-# Derive your agent's public address
-account = w3.eth.account.from_key(private_key)
-address = account.address
+    # Derive your agent's public address
+    account = w3.eth.account.from_key(private_key)
+    address = account.address
 
-# Fetch the balance
-balance_wei = w3.eth.get_balance(address)
-balance_sfuel = w3.from_wei(balance_wei, 'ether')
+    # Fetch the balance
+    balance_wei = await w3.eth.get_balance(address)
+    balance_sfuel = w3.from_wei(balance_wei, 'ether')
 
-print("\n" + "="*50)
-print(f"🤖 Agent Wallet Address: {address}")
-print(f"💰 Current Balance:      {balance_sfuel} sFUEL")
-print("="*50 + "\n")
\ No newline at end of file
+    print("\n" + "="*50)
+    print(f"🤖 Agent Wallet Address: {address}")
+    print(f"💰 Current Balance:      {balance_sfuel} sFUEL")
+    print("="*50 + "\n")
+
+    await close_async_web3()
+
+asyncio.run(main())
@@ -0,0 +1,37 @@
+# pragma version ~=0.4.3
+"""
+@title BatchPayout
+@notice Pays every merchant of a CartMandate in a single transaction.
+        A payout that the recipient rejects is reported through its
+        Payout event and refunded to the caller with any leftover value,
+        so one bad recipient never reverts the rest of the batch.
+"""
+
+event Payout:
+    slot: indexed(uint256)
+    recipient: indexed(address)
+    amount: uint256
+    success: bool
+
+MAX_PAYOUTS: constant(uint256) = 256
+# Gas forwarded to each recipient on top of the value-transfer stipend
+PAYOUT_GAS: constant(uint256) = 30000
+
+
+@external
+@payable
+def disburse(recipients: DynArray[address, MAX_PAYOUTS], amounts: DynArray[uint256, MAX_PAYOUTS]):
+    assert len(recipients) == len(amounts), "length mismatch"
+
+    remaining: uint256 = msg.value
+    for i: uint256 in range(len(recipients), bound=MAX_PAYOUTS):
+        amount: uint256 = amounts[i]
+        # Underflow reverts the whole batch when msg.value does not cover the amounts
+        remaining -= amount
+        success: bool = raw_call(recipients[i], b"", value=amount, gas=PAYOUT_GAS, revert_on_failure=False)
+        if not success:
+            remaining += amount
+        log Payout(slot=i, recipient=recipients[i], amount=amount, success=success)
+
+    if remaining > 0:
+        send(msg.sender, remaining)
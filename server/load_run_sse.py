@@ -0,0 +1,310 @@
+"""
+End-to-end load generator for /run_sse with a stub Gemini backend.
+
+Boots the ADK FastAPI app (the same get_fast_api_app server_entry.py serves) in
+a background uvicorn thread, with every LlmAgent's model swapped for a
+deterministic stub that answers in the shape each agent's instruction asks for,
+after a configurable per-token latency. Settlement goes to an in-process EVM
+(see bench_settlement.py), so no Gemini, Google Search or testnet is touched.
+
+Each simulated user walks plan -> approve -> sign (the sign turn settles) over
+/run_sse exactly like the chat page does, and the report gives throughput,
+time-to-first-event and p50/p99 turn latency per stage and per agent.
+
+    python load_run_sse.py --users 20 --flows-per-user 2 --items 5 --token-latency 0.005 --out load.json
+"""
+import os
+# Every turn must reach the stub model; a cached answer would skew the numbers
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import re
+import socket
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import AsyncGenerator
+
+import httpx
+import uvicorn
+from eth_account import Account
+from google.adk.agents import LlmAgent
+from google.adk.cli.fast_api import get_fast_api_app
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai.types import Content, Part
+
+from bench_settlement import LocalChainProvider, percentile, sign_cart
+from shopping_concierge import conductor
+from shopping_concierge.mandate_index import extract_cart_mandate
+from shopping_concierge.rpc_client import SKALE_CHAIN_ID
+from shopping_concierge.wallet_pool import WalletPool
+from shopping_concierge.x402_settlement import payment_processor_agent
+from shopping_concierge.x402_settlement_tool import X402SettlementTool
+from web3 import AsyncWeb3
+
+APP_NAME = "shopping_concierge"
+STAGES = ("plan", "approve", "sign")
+CATALOG = [
+    "backpack", "notebooks", "pens", "pencils", "highlighters", "erasers", "folders", "calculator",
+    "pencil case", "ruler", "water bottle", "lunchbox", "sneakers", "hand sanitizer", "tissues"
+]
+ITEM_BLOCK_PATTERN = re.compile(r'\*\*(.+?)\*\*\s*\n\s*- Vendor: .*\n\s*- Price: \$([\d,]+(?:\.\d+)?)')
+
+
+class StubGemini(BaseLlm):
+    """
+    Deterministic stand-in for gemini-2.5-flash. Picks its answer from the agent's
+    system instruction and releases it after first_token_latency plus token_latency
+    per ~4-character token, streamed in chunks when the run asks for streaming.
+    """
+
+    model: str = "gemini-stub"
+    token_latency: float = 0.005
+    first_token_latency: float = 0.2
+    chunk_tokens: int = 8
+
+    @staticmethod
+    def _text(content: Content) -> str:
+        return "".join(part.text or "" for part in content.parts or [])
+
+    def _answer(self, llm_request) -> str:
+        instruction = str(llm_request.config.system_instruction or "")
+        contents = llm_request.contents or []
+        user_text = next((self._text(c) for c in reversed(contents) if c.role == "user" and self._text(c)), "")
+
+        if "ONE item" in instruction:
+            item = re.search(r"best product for: (.*)", instruction).group(1).strip()
+            return f"**{item.title()} Classic**\n   - Vendor: {item.title()} Outlet\n   - Price: ${10 + len(item)}.99"
+        if "Merchant Agent" in instruction:
+            history = "\n".join(self._text(c) for c in contents)
+            items = ITEM_BLOCK_PATTERN.findall(history) or [("Backpack Classic", "18.99")]
+            # Amounts in 6-decimal USDC units, as the Merchant Agent's instruction shows
+            merchants = [
+                {"name": name, "merchant_address": "0xFe5e03799Fe833D93e950d22406F9aD901Ff3Bb9", "amount": round(float(price.replace(",", "")) * 10 ** 6)}
+                for name, price in items
+            ]
+            mandate = {"total_budget_amount": sum(m["amount"] for m in merchants), "currency": "USDC", "merchants": merchants}
+            return "```json\n" + json.dumps(mandate, indent=2) + "\n```"
+        if "Orchestrator" in instruction:
+            wanted = user_text.split(":", 1)[-1]
+            return f"<orchestrator>{wanted.strip()}</orchestrator>"
+        if "Shopping Agent" in instruction:
+            return (
+                "1. **Backpack Classic**\n   - Vendor: Backpack Outlet\n   - Price: $18.99\n\n"
+                "**Total Price:** $18.99\n\nIs this good, or do you want to make any edits?"
+            )
+        if "Authorization Agent" in instruction:
+            return "Please sign the EIP-712 payload via MetaMask to authorize this batch transaction."
+        return user_text
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        text = self._answer(llm_request)
+        await asyncio.sleep(self.first_token_latency)
+        chunk_chars = self.chunk_tokens * 4
+        if stream:
+            for start in range(0, len(text), chunk_chars):
+                chunk = text[start:start + chunk_chars]
+                await asyncio.sleep(self.token_latency * math.ceil(len(chunk) / 4))
+                yield LlmResponse(content=Content(role="model", parts=[Part(text=chunk)]), partial=True)
+        else:
+            await asyncio.sleep(self.token_latency * math.ceil(len(text) / 4))
+        yield LlmResponse(content=Content(role="model", parts=[Part(text=text)]))
+
+
+def install_stub_model(agent, stub: StubGemini):
+    """Points every LlmAgent under `agent` at `stub` (per-item discovery agents copy it from the ShoppingAgent)."""
+    if isinstance(agent, LlmAgent):
+        agent.model = stub
+    for sub_agent in agent.sub_agents:
+        install_stub_model(sub_agent, stub)
+
+
+def install_local_chain(wallets: int) -> LocalChainProvider:
+    """Routes the payment processor's settlements to a fresh in-process EVM with funded agent wallets."""
+    provider = LocalChainProvider()
+    provider.cache_allowed_requests = True
+    provider.cacheable_requests = {"eth_chainId"}
+    w3 = AsyncWeb3(provider)
+    tester = provider.ethereum_tester
+    agents = [Account.create() for _ in range(wallets)]
+    for agent in agents:
+        tester.send_transaction({"from": tester.get_accounts()[0], "to": agent.address, "value": 10 ** 22, "gas": 21000})
+    payment_processor_agent._settlement_tool = X402SettlementTool(
+        w3=w3, wallet_pool=WalletPool([agent.key.hex() for agent in agents], w3)
+    )
+    return provider
+
+
+def start_server(port: int) -> uvicorn.Server:
+    agents_dir = os.path.dirname(os.path.abspath(__file__))
+    app = get_fast_api_app(agents_dir=agents_dir, session_service_uri="memory://", web=False)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="adk-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Metrics:
+    def __init__(self):
+        self.turns = defaultdict(list)        # stage -> [(ttfe, latency)]
+        self.agents = defaultdict(list)       # author -> [(first event, last event)] relative to turn start
+        self.errors = defaultdict(list)       # stage -> [message]
+        self.flows_completed = 0
+        self.payouts = 0
+
+
+async def run_turn(client: httpx.AsyncClient, metrics: Metrics, stage: str, user_id: str, session_id: str, text: str, streaming: bool) -> str:
+    """One /run_sse turn; returns the concatenated event text the chat page would show."""
+    body = {
+        "app_name": APP_NAME,
+        "user_id": user_id,
+        "session_id": session_id,
+        "new_message": {"role": "user", "parts": [{"text": text}]},
+        "streaming": streaming
+    }
+    started = time.perf_counter()
+    first_event = None
+    seen = {}
+    texts = []
+    async with client.stream("POST", "/run_sse", json=body, headers={"Accept": "text/event-stream"}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            now = time.perf_counter() - started
+            first_event = now if first_event is None else first_event
+            event = json.loads(line[6:])
+            if event.get("error"):
+                raise RuntimeError(event["error"])
+            author = event.get("author", "unknown")
+            seen[author] = (seen.get(author, (now, now))[0], now)
+            for part in (event.get("content") or {}).get("parts") or []:
+                if part.get("text") and not event.get("partial"):
+                    texts.append(part["text"])
+    latency = time.perf_counter() - started
+    metrics.turns[stage].append((first_event if first_event is not None else latency, latency))
+    for author, span in seen.items():
+        metrics.agents[author].append(span)
+    return "\n".join(texts)
+
+
+async def run_user(client: httpx.AsyncClient, metrics: Metrics, index: int, flows: int, items: int, streaming: bool):
+    user_id = f"load-user-{index}"
+    signer = Account.create()
+    for flow in range(flows):
+        session_id = uuid.uuid4().hex
+        stage = "plan"
+        try:
+            await client.post(f"/apps/{APP_NAME}/users/{user_id}/sessions/{session_id}", json={})
+            wanted = [CATALOG[(index + flow + i) % len(CATALOG)] for i in range(items)]
+            await run_turn(client, metrics, "plan", user_id, session_id, "I need these for school: " + ", ".join(wanted), streaming)
+            stage = "approve"
+            approval = await run_turn(client, metrics, "approve", user_id, session_id, "Looks good", streaming)
+            cart_mandate = extract_cart_mandate(approval)
+            if not cart_mandate:
+                raise RuntimeError("No CartMandate in the approve turn")
+            stage = "sign"
+            # The processor verifies against the SKALE chain id whatever the mandate says
+            signature = sign_cart({**cart_mandate, "chain_id": SKALE_CHAIN_ID}, signer.key)
+            receipt = await run_turn(
+                client, metrics, "sign", user_id, session_id,
+                f"Here is my signature for the CartMandate: {signature}", streaming
+            )
+            if "tx_hash" not in receipt:
+                raise RuntimeError(f"Settlement did not complete: {receipt[-200:]}")
+            metrics.payouts += receipt.count('"tx_hash"')
+            metrics.flows_completed += 1
+        except Exception as e:
+            metrics.errors[stage].append(f"{type(e).__name__}: {e}")
+
+
+def summarize(spans: list[tuple[float, float]], labels: tuple[str, str] = ("ttfe", "latency")) -> dict:
+    """p50/p99 of both ends of each span: (time to first event, turn latency) for stages,
+    (first event, last event) after the turn started for agents."""
+    summary = {"count": len(spans)}
+    for label, values in zip(labels, zip(*spans)):
+        summary[f"{label}_p50"] = round(statistics.median(values), 4)
+        summary[f"{label}_p99"] = round(percentile(values, 99), 4)
+    return summary
+
+
+async def drive(args, port: int) -> dict:
+    metrics = Metrics()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            run_user(client, metrics, index, args.flows_per_user, args.items, args.streaming) for index in range(args.users)
+        ))
+        wall = time.perf_counter() - started
+
+    turns = sum(len(spans) for spans in metrics.turns.values())
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "verbose")},
+        "throughput": {
+            "wall_seconds": round(wall, 3),
+            "flows_completed": metrics.flows_completed,
+            "flows_per_second": round(metrics.flows_completed / wall, 3),
+            "turns_per_second": round(turns / wall, 3),
+            "payouts_settled": metrics.payouts
+        },
+        "stages": {
+            stage: {**summarize(metrics.turns[stage]), "errors": len(metrics.errors[stage])}
+            for stage in STAGES if metrics.turns[stage]
+        },
+        "agents": {author: summarize(spans, ("first_event", "last_event")) for author, spans in sorted(metrics.agents.items())},
+        "errors": {stage: messages[:5] for stage, messages in metrics.errors.items() if messages}
+    }
+
+
+def main(args) -> int:
+    stub = StubGemini(token_latency=args.token_latency, first_token_latency=args.first_token_latency)
+    install_stub_model(conductor, stub)
+    install_local_chain(args.wallets)
+
+    # The agents log every step; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO() if not args.verbose else sys.stdout):
+        port = free_port()
+        server = start_server(port)
+        try:
+            report = asyncio.run(drive(args, port))
+        finally:
+            server.should_exit = True
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    print(output)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--flows-per-user", type=int, default=1, help="plan -> approve -> sign flows each user runs back-to-back")
+    parser.add_argument("--items", type=int, default=5, help="items in each shopping plan")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="stub model seconds per output token")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="stub model seconds before the first token")
+    parser.add_argument("--streaming", action="store_true", help="ask /run_sse for token streaming (partial events)")
+    parser.add_argument("--wallets", type=int, default=1, help="agent wallets settling on the local chain")
+    parser.add_argument("--timeout", type=float, default=300, help="per-request HTTP timeout")
+    parser.add_argument("--out", help="also write the JSON report here")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's own logging")
+    sys.exit(main(parser.parse_args()))
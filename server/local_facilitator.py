@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import os
+import random
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Stand-in x402 facilitator for local runs and tests:
+#   FACILITATOR_URL=http://localhost:8002 python server.py
+# Faults can be injected through env vars or at runtime with POST /faults.
+
+app = FastAPI()
+
+NETWORK_ID = "eip155:84532"
+
+faults = {
+    # Probability that a call answers 503 instead of settling
+    "error_rate": float(os.getenv("LOCAL_FACILITATOR_ERROR_RATE", "0")),
+    # Fail exactly the next N calls with 503 (handy for deterministic retry tests)
+    "fail_next": int(os.getenv("LOCAL_FACILITATOR_FAIL_NEXT", "0")),
+    # Seconds added to every call
+    "latency": float(os.getenv("LOCAL_FACILITATOR_LATENCY", "0")),
+}
+stats = {"requests": 0, "settled": 0, "replayed": 0, "injected_errors": 0}
+# Idempotency-Key -> the response first returned for it
+settlements: dict[str, dict] = {}
+
+
+async def _inject_faults():
+    stats["requests"] += 1
+    if faults["latency"]:
+        await asyncio.sleep(faults["latency"])
+    if faults["fail_next"] > 0 or random.random() < faults["error_rate"]:
+        faults["fail_next"] = max(faults["fail_next"] - 1, 0)
+        stats["injected_errors"] += 1
+        return JSONResponse({"error": "Injected facilitator failure"}, status_code=503)
+    return None
+
+
+@app.post("/settle")
+async def settle(request: Request):
+    failure = await _inject_faults()
+    if failure:
+        return failure
+    body = await request.body()
+    key = request.headers.get("Idempotency-Key") or hashlib.sha256(body).hexdigest()
+    if key in settlements:
+        stats["replayed"] += 1
+        return settlements[key]
+    payload = await request.json()
+    settlements[key] = {
+        "success": True,
+        "transaction": "0x" + hashlib.sha256(key.encode()).hexdigest(),
+        "network": payload.get("network", NETWORK_ID),
+        "payer": payload.get("payer") or payload.get("signer_address"),
+    }
+    stats["settled"] += 1
+    return settlements[key]
+
+
+@app.post("/verify")
+async def verify(request: Request):
+    failure = await _inject_faults()
+    if failure:
+        return failure
+    payload = await request.json()
+    return {"isValid": True, "payer": payload.get("payer")}
+
+
+@app.get("/supported")
+async def supported():
+    return {"kinds": [{"x402Version": 2, "scheme": "exact", "network": NETWORK_ID}], "extensions": [], "signers": {}}
+
+
+@app.post("/faults")
+async def set_faults(request: Request):
+    faults.update({key: value for key, value in (await request.json()).items() if key in faults})
+    return faults
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "faults": faults}
+
+
+if __name__ == "__main__":
+    print("Local facilitator running on port 8002...")
+    uvicorn.run(app, host="0.0.0.0", port=8002)
@@ -1,20 +1,23 @@
 import uvicorn
+import json
 from typing import Any
-from fastapi import FastAPI
-from x402.http import FacilitatorConfig, HTTPFacilitatorClient, PaymentOption
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from x402.http import HTTPFacilitatorClient, PaymentOption
 from x402.http.middleware.fastapi import PaymentMiddlewareASGI
 from x402.http.types import RouteConfig
 from x402.mechanisms.evm.exact import ExactEvmServerScheme
 from x402.server import x402ResourceServer
+from shopping_concierge.adk_context_utils import facilitator_config
+from shopping_concierge.payment_channel import ProviderLedger, VOUCHER_HEADER, usdc_to_micro
 
 app = FastAPI()
 
 RECIPIENT_ADDRESS = "0xFe5e03799Fe833D93e950d22406F9aD901Ff3Bb9"
 NETWORK_ID = "eip155:84532"
 
-facilitator = HTTPFacilitatorClient(
-    FacilitatorConfig(url="https://x402.org/facilitator")
-)
+# Pooled, retrying client so verify/settle calls reuse warm connections
+facilitator = HTTPFacilitatorClient(facilitator_config())
 server = x402ResourceServer(facilitator)
 server.register(NETWORK_ID, ExactEvmServerScheme())
 
@@ -43,6 +46,41 @@ async def checkout_endpoint() -> dict[str, Any]:
         "message": "Payment successful! Your order is confirmed."
     }
 
+# --- Voucher-paid premium reviews (payment channel provider side) ---
+REVIEW_PRICE = "0.01"
+ledger = ProviderLedger(RECIPIENT_ADDRESS)
+
+@app.get("/premium_reviews")
+async def premium_reviews(product_name: str, request: Request):
+    raw_voucher = request.headers.get(VOUCHER_HEADER)
+    if not raw_voucher:
+        return JSONResponse(
+            {"error": "Payment voucher required", "price": REVIEW_PRICE, "pay_to": RECIPIENT_ADDRESS},
+            status_code=402
+        )
+    try:
+        channel = ledger.accept(json.loads(raw_voucher), usdc_to_micro(REVIEW_PRICE))
+    except (ValueError, KeyError) as e:
+        return JSONResponse({"error": f"Invalid voucher: {e}"}, status_code=402)
+    return {
+        "product": product_name,
+        "premium_insight": f"Audiophiles highly rate the {product_name} for superior active noise cancellation and build quality. Highly recommended.",
+        "channel": channel
+    }
+
+@app.post("/vouchers/settle")
+async def vouchers_settle(request: Request):
+    try:
+        return await ledger.record_settlement(await request.json())
+    except (ValueError, KeyError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.get("/vouchers/{channel_id}")
+async def voucher_channel(channel_id: str):
+    if channel_id not in ledger.channels:
+        return JSONResponse({"error": "Unknown channel"}, status_code=404)
+    return ledger.state(channel_id)
+
 if __name__ == "__main__":
     print("Merchant Server running on port 8001...")
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -1,22 +1,99 @@
+import os
 from fastapi import FastAPI
 from google.adk.cli.fast_api import get_fast_api_app
+from shopping_concierge.payment_channel import channel_lifespan
+
+# Resolved from this file, so the sessions DB and its compaction don't depend on the working directory
+AGENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shopping_concierge")
 
 # This helper automatically creates /run, /run_sse, and session routes under /apps/{app_name}/
 app: FastAPI = get_fast_api_app(
-    agents_dir="shopping_concierge",
+    agents_dir=AGENTS_DIR,
     web=False,
-    allow_origins=["http://localhost:3000"]  # Adjust as needed for your frontend
+    allow_origins=["http://localhost:3000"],  # Adjust as needed for your frontend
+    # Opens the pooled RPC client and settles open payment channels on shutdown
+    lifespan=channel_lifespan
 )
 
+# Fold old session events into one summary event in the background
+from shopping_concierge.session_compaction import session_db_path, start_compaction_thread
+start_compaction_thread(session_db_path(AGENTS_DIR))
+
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
-import httpx
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext, new_invocation_context_id
+from google.adk.events import Event, EventActions
+from google.adk.runners import Runner
+from google.genai.types import Content, Part
+from typing import AsyncGenerator
+import json
+
+from shopping_concierge import SESSION_SERVICE, shopping_agent, merchant_agent
+from shopping_concierge.intent_router import classify_turn, user_text
+from shopping_concierge.mandate_index import extract_cart_mandate
+
+# /apps/main/run drives its stages in-process, on the same session store, instead of
+# POSTing back to this server
+MAIN_APP_NAME = "main"
+
+class MainRunPipeline(BaseAgent):
+    """
+    Root agent for /apps/main/run. Runs copies of the ShoppingAgent and MerchantAgent (the
+    originals already belong to the conductor) and picks one per turn with the intent
+    router, so the MerchantAgent only runs on a turn the user approved.
+    """
+
+    def __init__(self):
+        super().__init__(
+            name="MainRunPipeline",
+            sub_agents=[shopping_agent.llm_agent.clone(), merchant_agent.clone()]
+        )
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        shopping, merchant = self.sub_agents
+        stage = classify_turn(user_text(ctx.user_content), ctx.session.state)
+        stage_agent = {"plan": shopping, "revise": shopping, "approve": merchant}.get(stage)
+        if stage_agent is None:
+            return
+        async for event in stage_agent.run_async(ctx):
+            yield event
+
+main_pipeline = MainRunPipeline()
+main_runner = Runner(app_name=MAIN_APP_NAME, agent=main_pipeline, session_service=SESSION_SERVICE)
+
+async def run_stage(user_id: str, session_id: str, text: str) -> str | None:
+    """Runs one user turn through the pipeline and returns its final text response."""
+    final_text = None
+    async for event in main_runner.run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=Content(role="user", parts=[Part(text=text)])
+    ):
+        if event.is_final_response() and event.content and event.content.parts:
+            final_text = "".join(part.text or "" for part in event.content.parts)
+    return final_text
+
+async def add_context(session, intent_mandate: dict, discovery_data):
+    """Records a shopping list the caller already has as pipeline context, not as something the user said."""
+    payload = {"intent_mandate": intent_mandate, "discovery_data": discovery_data}
+    await SESSION_SERVICE.append_event(session, Event(
+        author=main_pipeline.name,
+        invocation_id=new_invocation_context_id(),
+        content=Content(role="model", parts=[Part(text=json.dumps(payload))]),
+        actions=EventActions(state_delta={"discovery_data": discovery_data})
+    ))
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/cache_stats")
+async def cache_stats():
+    from shopping_concierge.response_cache import response_cache
+    return response_cache.stats()
+
 # --- Real AI orchestration for /apps/main/run ---
 @app.post("/apps/main/run")
 async def main_run(request: Request):
@@ -49,46 +126,50 @@ async def main_run(request: Request):
         else:
             return JSONResponse({"result": {"text": "Missing intent_mandate or legacy fields."}}, status_code=400)
 
+    user_id = body.get("user_id", "main_user")
+    # The user's own words for this call; a CartMandate is only built when they approve the list
+    message = body.get("message", "")
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        # A fresh session per call, so a cart never carries items or mandates from an earlier run
+        session = await SESSION_SERVICE.create_session(app_name=MAIN_APP_NAME, user_id=user_id)
+
+        if discovery_data:
+            await add_context(session, intent_mandate, discovery_data)
+        else:
             # ShoppingAgent: send intent_mandate, get discovery_data
-            shopping_agent_url = "http://localhost:8000/apps/shopping_concierge/run"  # Example endpoint
-            shopping_payload = {"intent_mandate": intent_mandate}
-            shopping_resp = await client.post(shopping_agent_url, json=shopping_payload)
-            if shopping_resp.status_code == 200:
-                shopping_result = shopping_resp.json()
-                discovery_data = shopping_result.get("discovery_data", {})
-            else:
-                return JSONResponse({"result": {"text": "ShoppingAgent error."}}, status_code=500)
-
-            # MerchantAgent: send intent_mandate and discovery_data, get cart_mandate
-            merchant_agent_url = "http://localhost:8000/apps/shopping_concierge/merchant/run"  # Example endpoint
-            merchant_payload = {
-                "intent_mandate": intent_mandate,
-                "discovery_data": discovery_data
-            }
-            merchant_resp = await client.post(merchant_agent_url, json=merchant_payload)
-            if merchant_resp.status_code == 200:
-                merchant_result = merchant_resp.json()
-                cart_mandate = merchant_result.get("cart_mandate")
-            else:
-                return JSONResponse({"result": {"text": "MerchantAgent error."}}, status_code=500)
-
-            if not cart_mandate:
-                return JSONResponse({"result": {"text": "No suitable product found."}})
-
-            cart_details = {
-                "cart_id": cart_mandate.get("cart_id"),
-                "items": cart_mandate.get("items", []),
-                "total_price": cart_mandate.get("total_price"),
-                "price_valid_until": cart_mandate.get("price_valid_until"),
-                "source_agent": cart_mandate.get("source_agent")
-            }
+            shopping_text = await run_stage(user_id, session.id, json.dumps({"intent_mandate": intent_mandate}))
+            session = await SESSION_SERVICE.get_session(app_name=MAIN_APP_NAME, user_id=user_id, session_id=session.id)
+            discovery_data = session.state.get("discovery_data") or shopping_text
+        if not discovery_data:
+            return JSONResponse({"result": {"text": "ShoppingAgent error."}}, status_code=500)
+
+        if classify_turn(message, {"discovery_data": discovery_data}) != "approve":
             return JSONResponse({
                 "result": {
-                    "text": "Here are the cart details for the noise-canceling headphones:",
-                    "cart": cart_details
+                    "text": "Here is what I found. Send it back with your approval in `message` to get the cart details.",
+                    "discovery_data": discovery_data
                 }
             })
+
+        # MerchantAgent: the user's approval is the turn, the shopping list is already in the session
+        merchant_text = await run_stage(user_id, session.id, message)
+        cart_mandate = extract_cart_mandate(merchant_text or "")
+
+        if not cart_mandate:
+            return JSONResponse({"result": {"text": "No suitable product found."}})
+
+        cart_details = {
+            "cart_id": cart_mandate.get("cart_id", session.id),
+            "items": cart_mandate.get("items", cart_mandate.get("merchants", [])),
+            "total_price": cart_mandate.get("total_price", cart_mandate.get("total_budget")),
+            "price_valid_until": cart_mandate.get("price_valid_until"),
+            "source_agent": cart_mandate.get("source_agent", merchant_agent.name)
+        }
+        return JSONResponse({
+            "result": {
+                "text": "Here are the cart details for the noise-canceling headphones:",
+                "cart": cart_details
+            }
+        })
     except Exception as e:
         return JSONResponse({"result": {"text": f"Error: {str(e)}"}}, status_code=500)
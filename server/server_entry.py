@@ -13,7 +13,9 @@ print("\n=======================================================================
 print(f"[server_entry.py] Booting up ADK Server. Scanning directory: {current_dir}")
 
 # 2. Start the app. The ADK will look inside 'current_dir' and find the 'shopping_concierge' folder.
-app = get_fast_api_app(agents_dir=current_dir, web=False)
+#    The lifespan opens the pooled RPC client and settles open payment channels on shutdown.
+from shopping_concierge.payment_channel import channel_lifespan
+app = get_fast_api_app(agents_dir=current_dir, web=False, lifespan=channel_lifespan)
 
 # 3. Add CORS so your Next.js app can talk to it
 app.add_middleware(
@@ -24,7 +26,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 4. Print the routes to guarantee /run_sse was registered
+# 4. Keep the session database from growing with every turn: fold old events into a summary
+from shopping_concierge.session_compaction import session_db_path, start_compaction_thread
+start_compaction_thread(session_db_path(current_dir))
+
+# 5. Print the routes to guarantee /run_sse was registered
 print("\n🚨 REGISTERED FASTAPI ROUTES 🚨")
 for route in app.routes:
     if hasattr(route, "path") and "run_sse" in route.path:
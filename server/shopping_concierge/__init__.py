@@ -11,7 +11,7 @@ root_agent = conductor
 from .shopping_agent import shopping_agent
 from .merchant_agent import merchant_agent
 
-from .adk_context_utils import SESSION_SERVICE, get_or_create_session, build_invocation_context
+from .adk_context_utils import SESSION_SERVICE, SESSION_DIRECTORY, get_or_create_session, build_invocation_context
 
 # 4. Silence Pylance by explicitly declaring what this module exports
 __all__ = [
@@ -21,6 +21,7 @@ __all__ = [
 	"shopping_agent",
 	"merchant_agent",
 	"SESSION_SERVICE",
+	"SESSION_DIRECTORY",
 	"get_or_create_session",
 	"build_invocation_context"
 ]
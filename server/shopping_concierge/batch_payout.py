@@ -0,0 +1,120 @@
+import os
+
+from .rpc_client import SKALE_CHAIN_ID
+
+# Compiled from contracts/BatchPayout.vy (vyper 0.4.3, paris target so it runs on
+# chains without PUSH0/MCOPY). Rebuild with:
+#   vyper --evm-version paris -f abi,bytecode contracts/BatchPayout.vy
+BATCH_PAYOUT_ABI = [
+    {
+        "name": "Payout",
+        "inputs": [
+            {
+                "name": "slot",
+                "type": "uint256",
+                "indexed": True
+            },
+            {
+                "name": "recipient",
+                "type": "address",
+                "indexed": True
+            },
+            {
+                "name": "amount",
+                "type": "uint256",
+                "indexed": False
+            },
+            {
+                "name": "success",
+                "type": "bool",
+                "indexed": False
+            }
+        ],
+        "anonymous": False,
+        "type": "event"
+    },
+    {
+        "stateMutability": "payable",
+        "type": "function",
+        "name": "disburse",
+        "inputs": [
+            {
+                "name": "recipients",
+                "type": "address[]"
+            },
+            {
+                "name": "amounts",
+                "type": "uint256[]"
+            }
+        ],
+        "outputs": []
+    }
+]
+
+BATCH_PAYOUT_BYTECODE = (
+    "0x61025a6100116100003961025a610000f360003560e01c634980f731811861024f5760433611156102555760043560"
+    "0401610100813511610255578035600081610100811161025557801561006457905b8060051b6020850101358060a01c"
+    "610255578160051b6060015260010181811861003f575b50508060405250506024356004016101008135116102555780"
+    "3560208160051b0180836120603750505061206051604051181561011d576020806140e052600f614080527f6c656e67"
+    "7468206d69736d6174636800000000000000000000000000000000006140a052614080816140e0018151815260208201"
+    "5160208201528051806020830101601f82600003163682375050601f19601f8251602001011690509050810190506308"
+    "c379a06140c052806004016140dcfd5b34614080526000604051610100811161025557801561022c57905b806140a052"
+    "6140a051612060518110156102555760051b61208001516140c052614080516140c05180820382811161025557905090"
+    "50614080526140a0516040518110156102555760051b606001516140c051600061410052614100506000600061410051"
+    "6141208486617530f1905090506140e0526140e0516101d157614080516140c051808201828110610255579050905061"
+    "4080525b6140a0516040518110156102555760051b606001516140a0517facfff79a08b8d4e781f1b5c6806dc26afa2d"
+    "2288d3a9718a92b152883af4776c6140c051614100526140e051614120526040614100a3600101818118610138575b50"
+    "50614080511561024d57600060006000600061408051336000f115610255575b005b60006000fd5b600080fd855820d6"
+    "26cd1a1b4f3811fae0e28231801fd49ad5b3776778cc63e7a4141eb8f239e419025a8000a16576797065728300040300"
+    "35"
+)
+
+# Must match MAX_PAYOUTS in BatchPayout.vy; larger carts are split across transactions
+MAX_PAYOUTS = 256
+# Seconds to wait for the BatchPayout deployment to be mined
+DEPLOY_TIMEOUT = float(os.getenv("BATCH_PAYOUT_DEPLOY_TIMEOUT", "120"))
+
+
+def batch_payout_contract(w3, address: str):
+    return w3.eth.contract(address=w3.to_checksum_address(address), abi=BATCH_PAYOUT_ABI)
+
+
+async def deploy_batch_payout(w3, private_key: str, fee_oracle, nonces) -> str:
+    """Deploys BatchPayout from the agent wallet and returns the contract address."""
+    account = w3.eth.account.from_key(private_key)
+    tx = {
+        'from': account.address,
+        'data': BATCH_PAYOUT_BYTECODE,
+        'chainId': SKALE_CHAIN_ID
+    }
+    [gas] = await fee_oracle.estimate_gas_many([tx])
+    tx.update(await fee_oracle.fee_fields())
+    tx['gas'] = gas
+    del tx['from']
+
+    async with nonces.submit_lock:
+        [nonce] = await nonces.allocate()
+        signed_tx = w3.eth.account.sign_transaction({**tx, 'nonce': nonce}, private_key)
+        try:
+            tx_hash = await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception:
+            nonces.release(nonce)
+            raise
+        nonces.mark_sent(nonce, w3.to_hex(tx_hash))
+    receipt = await nonces.wait_mined(nonce, tx_hash, DEPLOY_TIMEOUT)
+    if receipt.get("status") == 0 or not receipt.get("contractAddress"):
+        raise Exception(f"BatchPayout deployment failed in {w3.to_hex(tx_hash)}")
+    return receipt["contractAddress"]
+
+
+def parse_payout_events(contract, receipt) -> dict[int, dict]:
+    """Maps each batch slot to the recipient, amount and success flag its Payout event reported."""
+    events = contract.events.Payout().process_receipt(receipt)
+    return {
+        event["args"]["slot"]: {
+            "recipient": event["args"]["recipient"],
+            "amount": event["args"]["amount"],
+            "success": event["args"]["success"]
+        }
+        for event in events
+    }
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import secrets
+import struct
+from typing import Any
+
+from Crypto.Cipher import AES
+from py_ecc.optimized_bn128 import G2, FQ2, b2, curve_order, is_on_curve, multiply, normalize
+
+# Envelope: magic | version | epoch | encapsulated key (G2) | nonce | AES-GCM(records) | tag
+ENVELOPE_MAGIC = b"BT"
+ENVELOPE_VERSION = 2
+HEADER = struct.Struct(">2sBI")
+G2_BYTES = 128
+NONCE_BYTES = 12
+TAG_BYTES = 16
+KDF_DOMAIN = b"BITE-V2-KEM"
+
+
+def _g2_to_bytes(point) -> bytes:
+    """Affine G2 point as x.c0 | x.c1 | y.c0 | y.c1, 32 bytes each (SKALE's commonBLSPublicKey0..3 order)."""
+    x, y = normalize(point)
+    return b"".join(int(c).to_bytes(32, "big") for c in (*x.coeffs, *y.coeffs))
+
+
+def _g2_from_ints(coords: list[int]):
+    point = (FQ2(coords[0:2]), FQ2(coords[2:4]), FQ2.one())
+    if not is_on_curve(point, b2):
+        raise ValueError("Committee public key is not a point on the alt_bn128 G2 curve")
+    return point
+
+
+def _g2_from_bytes(data: bytes):
+    if len(data) != G2_BYTES:
+        raise ValueError(f"Expected a {G2_BYTES}-byte G2 point, got {len(data)} bytes")
+    return _g2_from_ints([int.from_bytes(data[i:i + 32], "big") for i in range(0, G2_BYTES, 32)])
+
+
+def parse_committee_key(value) -> tuple:
+    """
+    The committee BLS public key as a G2 point. Accepts the shapes
+    bite_getCommitteesInfo is seen to return: a hex string of the four
+    coordinates, a list of them, or a dict keyed commonBLSPublicKey0..3.
+    """
+    if isinstance(value, dict):
+        value = [value[key] for key in sorted(value)]
+    if isinstance(value, (list, tuple)):
+        return _g2_from_ints([int(c, 0) if isinstance(c, str) else int(c) for c in value])
+    return _g2_from_bytes(bytes.fromhex(value.removeprefix("0x")))
+
+
+def _derive_key(encapsulated: bytes, shared_point) -> bytes:
+    return hashlib.sha256(KDF_DOMAIN + encapsulated + _g2_to_bytes(shared_point)).digest()
+
+
+def _pack_records(fields: dict[str, Any]) -> bytes:
+    out = [struct.pack(">H", len(fields))]
+    for name, value in fields.items():
+        name_bytes = name.encode()
+        value_bytes = json.dumps(value, separators=(",", ":")).encode()
+        out.append(struct.pack(">H", len(name_bytes)) + name_bytes + struct.pack(">I", len(value_bytes)) + value_bytes)
+    return b"".join(out)
+
+
+def _unpack_records(data: bytes) -> dict[str, Any]:
+    (count,), offset = struct.unpack_from(">H", data), 2
+    fields = {}
+    for _ in range(count):
+        (name_len,) = struct.unpack_from(">H", data, offset)
+        name = data[offset + 2:offset + 2 + name_len].decode()
+        offset += 2 + name_len
+        (value_len,) = struct.unpack_from(">I", data, offset)
+        fields[name] = json.loads(data[offset + 4:offset + 4 + value_len])
+        offset += 4 + value_len
+    return fields
+
+
+def seal(fields: dict[str, Any], public_key, epoch: int) -> bytes:
+    """
+    Encrypts every field under one freshly encapsulated AES-256 key.
+
+    Key encapsulation is hashed ElGamal against the committee's G2 public key:
+    a random r gives the encapsulated point r*G2 and the shared point r*PK, whose
+    hash is the AES key. That is the only elliptic-curve work per envelope; all
+    fields then go through a single AES-GCM pass, with the header as associated
+    data so the epoch and encapsulated key cannot be swapped.
+    """
+    r = secrets.randbelow(curve_order - 1) + 1
+    encapsulated = _g2_to_bytes(multiply(G2, r))
+    key = _derive_key(encapsulated, multiply(public_key, r))
+    nonce = secrets.token_bytes(NONCE_BYTES)
+    header = HEADER.pack(ENVELOPE_MAGIC, ENVELOPE_VERSION, epoch) + encapsulated + nonce
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(header)
+    ciphertext, tag = cipher.encrypt_and_digest(_pack_records(fields))
+    return header + ciphertext + tag
+
+
+def envelope_epoch(envelope: bytes) -> int:
+    magic, version, epoch = HEADER.unpack_from(envelope)
+    if magic != ENVELOPE_MAGIC or version != ENVELOPE_VERSION:
+        raise ValueError("Not a BITE v2 envelope")
+    return epoch
+
+
+def open_envelope(envelope: bytes, secret_key: int) -> dict[str, Any]:
+    """Decrypts an envelope with the committee secret. Raises ValueError if it was tampered with."""
+    envelope_epoch(envelope)
+    offset = HEADER.size
+    encapsulated = envelope[offset:offset + G2_BYTES]
+    nonce = envelope[offset + G2_BYTES:offset + G2_BYTES + NONCE_BYTES]
+    header_len = offset + G2_BYTES + NONCE_BYTES
+    key = _derive_key(encapsulated, multiply(_g2_from_bytes(encapsulated), secret_key))
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(envelope[:header_len])
+    plaintext = cipher.decrypt_and_verify(envelope[header_len:-TAG_BYTES], envelope[-TAG_BYTES:])
+    return _unpack_records(plaintext)
+
+
+class LocalCommittee:
+    """
+    Single-key stand-in for the SKALE decryption committee, for tests and local runs.
+    On chain the secret is threshold-shared and decryption goes through the Decryptor
+    contract; here one process holds it.
+    """
+
+    def __init__(self, secret_key: int | None = None, epoch: int = 1):
+        self.secret_key = secret_key or secrets.randbelow(curve_order - 1) + 1
+        self.epoch = epoch
+        self.public_key = multiply(G2, self.secret_key)
+
+    @property
+    def public_key_hex(self) -> str:
+        return "0x" + _g2_to_bytes(self.public_key).hex()
+
+    def committees_info(self) -> dict:
+        """A bite_getCommitteesInfo response for this committee."""
+        return {"jsonrpc": "2.0", "id": 1, "result": [{"commonBLSPublicKey": self.public_key_hex, "epochId": self.epoch}]}
+
+    def decrypt(self, envelope: bytes | str) -> dict[str, Any]:
+        if isinstance(envelope, str):
+            envelope = bytes.fromhex(envelope.removeprefix("0x"))
+        return open_envelope(envelope, self.secret_key)
@@ -1,13 +1,23 @@
-
-
-
 from google.adk.agents import SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from typing import AsyncGenerator
 from .orchestrator_agent import orchestrator_agent
-from .shopping_agent import shopping_agent
+from .discovery_fanout import product_discovery_agent
 from .merchant_agent import merchant_agent
 from .vault_agent import vault_agent
 from .skale_bite import skale_bite
 from .x402_settlement import payment_processor_agent
+from .mandate_index import INDEX_STATE_KEY, current_index, index_content
+from .intent_router import ROUTING_ENABLED, classify_turn, user_text
+
+# Agents each turn stage needs, in pipeline order
+STAGE_AGENTS = {
+    "plan": ("ProjectOrchestrator", "ProductDiscovery"),
+    "revise": ("ProjectOrchestrator", "ProductDiscovery"),
+    "approve": ("MerchantAgent", "CredentialsProvider"),
+    "sign": ("PaymentProcessorAgent",),
+}
 
 class ShoppingConciergeConductor(SequentialAgent):
     def __init__(self):
@@ -15,13 +25,41 @@ class ShoppingConciergeConductor(SequentialAgent):
             name="shopping_concierge",
             sub_agents=[  # 🚨 FIX: This MUST be sub_agents! 🚨
                 orchestrator_agent,
-                shopping_agent.llm_agent,
+                product_discovery_agent,
                 merchant_agent,
                 vault_agent.llm_agent,
                 payment_processor_agent
             ]
         )
 
+    def stage_agents(self, stage: str) -> list:
+        return [agent for agent in self.sub_agents if agent.name in STAGE_AGENTS[stage]]
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        # Keep the signature/CartMandate index in session state up to date as events are
+        # appended, so the payment processor never has to re-scan the whole history.
+        index = current_index(ctx)
+        pending = index if ctx.session.state.get(INDEX_STATE_KEY) != index else None
+
+        # Only dispatch the agents this turn actually needs instead of the full pipeline
+        if ROUTING_ENABLED:
+            stage = classify_turn(user_text(ctx.user_content), ctx.session.state)
+            sub_agents = self.stage_agents(stage)
+            print(f"[CONDUCTOR] Turn routed to '{stage}': {', '.join(agent.name for agent in sub_agents)}")
+        else:
+            sub_agents = self.sub_agents
+
+        for sub_agent in sub_agents:
+            async for event in sub_agent.run_async(ctx):
+                if not event.partial:
+                    updated = index_content(index, event.content)
+                    if updated:
+                        index = pending = updated
+                    if pending:
+                        event.actions.state_delta[INDEX_STATE_KEY] = pending
+                        pending = None
+                yield event
+
     def process_decryption(self, encrypted_budget, merchant_response):
         decrypt_status = skale_bite.decrypt_request(encrypted_budget["ciphertext"])
         cart_amount = merchant_response["cart_mandate"].get("amount")
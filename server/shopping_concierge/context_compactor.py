@@ -0,0 +1,116 @@
+import json
+import os
+import re
+
+from google.genai.types import Content, Part
+
+# Rough prompt-token ceiling for the conversation part of each request
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+# Longest excerpt of any one state value placed in the summary
+SUMMARY_CHARS_PER_KEY = int(os.getenv("CONTEXT_SUMMARY_CHARS_PER_KEY", "2500"))
+# Cheap token estimate; close enough for English text and JSON with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+RECEIPT_BLOCK_PATTERN = re.compile(r'```json\n[\s\S]*?"(?:receipts|tx_hash)"[\s\S]*?\n```')
+ORCHESTRATOR_TAG_PATTERN = re.compile(r'</?orchestrator>', re.IGNORECASE)
+# ADK relays another agent's messages to the current one as role=user content opening with this
+FOREIGN_CONTEXT_PREFIX = "For context:"
+
+SUMMARY_LABELS = {
+    "project_plan": "Project plan (items to buy)",
+    "discovery_data": "Current shopping list",
+    "cart_mandate_data": "Current CartMandate",
+}
+
+
+def _estimate_tokens(content: Content) -> int:
+    chars = 0
+    for part in content.parts or []:
+        if part.text:
+            chars += len(part.text)
+        elif part.function_call:
+            chars += len(json.dumps(part.function_call.args or {}, default=str)) + 32
+        elif part.function_response:
+            chars += len(json.dumps(part.function_response.response or {}, default=str)) + 32
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def _is_user_turn(content: Content) -> bool:
+    """A message the user typed; other agents' messages that ADK replays as role=user context are not turns."""
+    texts = [part.text for part in content.parts or [] if part.text]
+    return content.role == "user" and bool(texts) and not texts[0].startswith(FOREIGN_CONTEXT_PREFIX)
+
+
+def _strip_receipts(content: Content) -> Content:
+    """Settlement receipts are for the UI only; no agent reasons over them."""
+    if not any(part.text and RECEIPT_BLOCK_PATTERN.search(part.text) for part in content.parts or []):
+        return content
+    parts = [
+        Part(text=RECEIPT_BLOCK_PATTERN.sub("[settlement receipt omitted]", part.text)) if part.text else part
+        for part in content.parts
+    ]
+    return Content(role=content.role, parts=parts)
+
+
+def summarize_state(state, keys: tuple[str, ...]) -> str | None:
+    """One compact text block with the latest value of each state key, or None if none is set."""
+    lines = []
+    for key in keys:
+        value = state.get(key)
+        if not value:
+            continue
+        if not isinstance(value, str):
+            value = json.dumps(value, separators=(",", ":"), default=str)
+        value = ORCHESTRATOR_TAG_PATTERN.sub("", value).strip()
+        if len(value) > SUMMARY_CHARS_PER_KEY:
+            value = value[:SUMMARY_CHARS_PER_KEY] + " …"
+        lines.append(f"{SUMMARY_LABELS.get(key, key)}:\n{value}")
+    if not lines:
+        return None
+    return "[Summary of the earlier conversation]\n" + "\n\n".join(lines)
+
+
+class ContextCompactor:
+    """
+    before_model_callback that keeps an agent's conversation history under a token budget.
+
+    The current user turn is always sent whole. Earlier turns are added newest first
+    while they fit; whatever does not fit is replaced by one compact summary built
+    from session state (`summary_keys`), which already holds the latest plan, list and
+    mandate that those turns produced. Receipt JSON is dropped from every turn.
+    """
+
+    def __init__(self, summary_keys: tuple[str, ...] = (), token_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.summary_keys = summary_keys
+        self.token_budget = token_budget
+        self.tokens_saved = 0
+
+    def before_model_callback(self, callback_context, llm_request):
+        contents = [_strip_receipts(content) for content in llm_request.contents]
+        turn_starts = [index for index, content in enumerate(contents) if _is_user_turn(content)]
+        if not turn_starts:
+            llm_request.contents = contents
+            return None
+
+        # Always keep the current turn, then whole earlier turns while they fit
+        keep_from = turn_starts[-1]
+        used = sum(_estimate_tokens(content) for content in contents[keep_from:])
+        for start, end in reversed(list(zip(turn_starts[:-1], turn_starts[1:]))):
+            cost = sum(_estimate_tokens(content) for content in contents[start:end])
+            if used + cost > self.token_budget:
+                break
+            keep_from = start
+            used += cost
+
+        dropped = contents[:keep_from]
+        kept = contents[keep_from:]
+        if dropped:
+            self.tokens_saved += sum(_estimate_tokens(content) for content in dropped)
+            summary = summarize_state(callback_context.state, self.summary_keys)
+            if summary:
+                # Folded into the first kept user turn so roles still alternate
+                first = kept[0]
+                kept[0] = Content(role=first.role, parts=[Part(text=summary)] + list(first.parts))
+            print(f"[CONTEXT] {callback_context.agent_name}: folded {len(dropped)} old messages into a summary")
+        llm_request.contents = kept
+        return None
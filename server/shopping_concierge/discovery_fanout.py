@@ -0,0 +1,149 @@
+import asyncio
+import os
+import re
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.tools.google_search_tool import GoogleSearchTool
+from google.genai.types import Content, Part
+
+from .premium_reviews_tool import PremiumReviewsTool
+from .response_cache import response_cache
+from .shopping_agent import shopping_agent
+
+# Item searches allowed to run at once; the rest wait for a free slot
+DISCOVERY_MAX_CONCURRENCY = int(os.getenv("DISCOVERY_MAX_CONCURRENCY", "6"))
+# Plans longer than this are handed to the single ShoppingAgent instead
+DISCOVERY_MAX_ITEMS = int(os.getenv("DISCOVERY_MAX_ITEMS", "40"))
+
+PLAN_PATTERN = re.compile(r'<orchestrator>([\s\S]*?)</orchestrator>', re.IGNORECASE)
+PRICE_PATTERN = re.compile(r'Price:\s*\$?\s*([\d,]+(?:\.\d+)?)')
+LIST_NUMBER_PATTERN = re.compile(r'^\s*\d+\.\s*')
+
+ITEM_INSTRUCTION = """
+You are a strict, minimalist Shopping Agent working on ONE item of a larger shopping list.
+
+Find the single best product for: {item}
+
+You MUST output ONLY this block for that one item and NOTHING else (no numbering, no totals, no questions):
+**[Item Name]**
+   - Vendor: [Vendor Name]
+   - Price: $[Price]
+"""
+
+
+def split_plan(project_plan: str) -> list[str]:
+    """Items from the orchestrator's `<orchestrator>a, b, c</orchestrator>` output."""
+    match = PLAN_PATTERN.search(project_plan or "")
+    body = match.group(1) if match else (project_plan or "")
+    items = [item.strip(" .-*\t") for item in re.split(r'[,\n]', body)]
+    # Braces would be read as state placeholders in the per-item instruction
+    items = [item.replace("{", "").replace("}", "") for item in items if item]
+    if [item.lower() for item in items] == ["looks good"]:
+        return []
+    return items
+
+
+def merge_item_results(items: list[str], results: list[str | None]) -> str:
+    """Rebuilds the ShoppingAgent's single numbered receipt list from per-item answers."""
+    blocks = []
+    total = 0.0
+    for number, (item, text) in enumerate(zip(items, results), start=1):
+        lines = [line for line in (text or "").strip().splitlines() if line.strip() and "Total Price" not in line]
+        if not lines:
+            blocks.append(f"{number}. **{item}**\n   - Vendor: Not found\n   - Price: unavailable")
+            continue
+        lines[0] = f"{number}. {LIST_NUMBER_PATTERN.sub('', lines[0])}"
+        blocks.append("\n".join(lines))
+        price = PRICE_PATTERN.search(text)
+        if price:
+            total += float(price.group(1).replace(",", ""))
+    return "\n\n".join(blocks) + f"\n\n**Total Price:** ${total:,.2f}\n\nIs this good, or do you want to make any edits?"
+
+
+class ParallelDiscoveryAgent(BaseAgent):
+    """
+    Fans the orchestrator's plan out to one short-lived discovery agent per item, runs
+    them concurrently (bounded by DISCOVERY_MAX_CONCURRENCY) on isolated branches, and
+    merges their answers into the receipt list the ShoppingAgent used to produce.
+    A 17-item cart takes about as long as its slowest item. Single-item plans and
+    approvals go straight to the regular ShoppingAgent.
+    """
+
+    def __init__(self):
+        super().__init__(name="ProductDiscovery", sub_agents=[shopping_agent.llm_agent])
+
+    def _item_agent(self, slot: int, item: str) -> LlmAgent:
+        before_model_callback, after_model_callback, on_model_error_callback = response_cache.callbacks()
+        return LlmAgent(
+            name=f"ShoppingAgent_item_{slot + 1}",
+            model=shopping_agent.llm_agent.model,
+            instruction=ITEM_INSTRUCTION.format(item=item),
+            tools=[PremiumReviewsTool(), GoogleSearchTool()],
+            include_contents="none",
+            before_model_callback=before_model_callback,
+            after_model_callback=after_model_callback,
+            on_model_error_callback=on_model_error_callback
+        )
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        items = split_plan(ctx.session.state.get("project_plan", ""))
+        if len(items) < 2 or len(items) > DISCOVERY_MAX_ITEMS:
+            async for event in shopping_agent.llm_agent.run_async(ctx):
+                yield event
+            return
+
+        print(f"[DISCOVERY] Fanning out {len(items)} items (max {DISCOVERY_MAX_CONCURRENCY} at once)")
+        slots = asyncio.Semaphore(DISCOVERY_MAX_CONCURRENCY)
+        queue: asyncio.Queue = asyncio.Queue()
+        results: list[str | None] = [None] * len(items)
+
+        async def discover(slot: int, item: str):
+            agent = self._item_agent(slot, item)
+            item_ctx = ctx.model_copy(update={
+                "agent": agent,
+                "branch": f"{ctx.branch}.{agent.name}" if ctx.branch else f"{self.name}.{agent.name}"
+            })
+            try:
+                async with slots:
+                    async for event in agent.run_async(item_ctx):
+                        if event.is_final_response() and event.content and event.content.parts:
+                            results[slot] = "".join(part.text or "" for part in event.content.parts)
+                            # The merged list is the only copy the chat should see
+                            event.content = None
+                        # Wait until the runner has appended the event; the item's next model call reads it back
+                        appended = asyncio.Event()
+                        await queue.put((event, appended))
+                        await appended.wait()
+            except Exception as e:
+                print(f"[DISCOVERY] ❌ '{item}' failed: {e}")
+            finally:
+                await queue.put((None, None))
+
+        tasks = [asyncio.create_task(discover(slot, item)) for slot, item in enumerate(items)]
+        try:
+            running = len(tasks)
+            while running:
+                event, appended = await queue.get()
+                if event is None:
+                    running -= 1
+                    continue
+                yield event
+                appended.set()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        merged = merge_item_results(items, results)
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=Content(role="model", parts=[Part(text=merged)]),
+            actions=EventActions(state_delta={"discovery_data": merged})
+        )
+
+
+product_discovery_agent = ParallelDiscoveryAgent()
@@ -0,0 +1,261 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+# Whole-request and connect timeouts (seconds) for facilitator calls
+FACILITATOR_TIMEOUT = float(os.getenv("FACILITATOR_TIMEOUT", "30"))
+FACILITATOR_CONNECT_TIMEOUT = float(os.getenv("FACILITATOR_CONNECT_TIMEOUT", "5"))
+# Retries after the first attempt on timeouts, connection errors, 429 and 5xx
+FACILITATOR_MAX_RETRIES = int(os.getenv("FACILITATOR_MAX_RETRIES", "3"))
+# Base of the full-jitter exponential backoff between retries
+FACILITATOR_BACKOFF = float(os.getenv("FACILITATOR_BACKOFF", "0.25"))
+# Longest single wait between attempts; a Retry-After asking for more ends the retries instead
+FACILITATOR_MAX_BACKOFF = float(os.getenv("FACILITATOR_MAX_BACKOFF", "10"))
+# Seconds one call may spend across all its attempts and waits before the last outcome is returned
+FACILITATOR_RETRY_BUDGET = float(os.getenv("FACILITATOR_RETRY_BUDGET", "60"))
+FACILITATOR_POOL_SIZE = int(os.getenv("FACILITATOR_POOL_SIZE", "20"))
+# Consecutive failed calls that open the circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("FACILITATOR_CIRCUIT_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("FACILITATOR_CIRCUIT_RESET", "30"))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class FacilitatorError(Exception):
+    """The facilitator rejected a request or could not be reached after retries."""
+
+    def __init__(self, message: str, status_code: int | None = None, body: str | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class CircuitOpenError(FacilitatorError):
+    """Calls are short-circuited while the facilitator keeps failing."""
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_seconds` lets one trial call through."""
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_request(self) -> bool:
+        """Raises CircuitOpenError while open; returns True if this call is the half-open trial."""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            raise CircuitOpenError(
+                f"Facilitator circuit open after {self.failures} consecutive failures; "
+                f"retrying in {self.reset_seconds - (time.monotonic() - self.opened_at):.0f}s"
+            )
+        if state == "half_open":
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def end_trial(self):
+        """Frees the trial slot when the trial call ended without an outcome (cancelled, or a non-transport error)."""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """Retry-After in seconds, from either delta-seconds or an HTTP date; None if absent or unreadable."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    if not math.isfinite(seconds):
+        return None
+    return max(seconds, 0.0)
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport adding retries with jittered backoff, idempotency keys and a
+    circuit breaker on top of a pooled keep-alive transport. Because it sits at the
+    transport layer, the same policy covers our own /settle calls and the x402
+    library's HTTPFacilitatorClient when it is handed a client built on it.
+    """
+
+    def __init__(
+        self,
+        inner: httpx.AsyncBaseTransport | None = None,
+        max_retries: int = FACILITATOR_MAX_RETRIES,
+        backoff: float = FACILITATOR_BACKOFF,
+        breaker: CircuitBreaker | None = None,
+        max_backoff: float = FACILITATOR_MAX_BACKOFF,
+        retry_budget: float = FACILITATOR_RETRY_BUDGET
+    ):
+        self._inner = inner or httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=FACILITATOR_POOL_SIZE, max_keepalive_connections=FACILITATOR_POOL_SIZE),
+            http2=_http2_available()
+        )
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.max_backoff = max_backoff
+        self.retry_budget = retry_budget
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        trial = self.breaker.before_request()
+        if request.method == "POST" and IDEMPOTENCY_HEADER not in request.headers:
+            # Same body -> same key, so a retried settle is recognized as a duplicate
+            request.headers[IDEMPOTENCY_HEADER] = hashlib.sha256(request.content).hexdigest()
+        try:
+            return await self._send_with_retries(request)
+        finally:
+            if trial:
+                # Otherwise a cancelled trial would leave the breaker refusing every call
+                self.breaker.end_trial()
+
+    async def _send_with_retries(self, request: httpx.Request) -> httpx.Response:
+        deadline = time.monotonic() + self.retry_budget
+        for attempt in range(self.max_retries + 1):
+            delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+            try:
+                response = await self._inner.handle_async_request(request)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                wait = self._wait(delay, None)
+                if attempt == self.max_retries or time.monotonic() + wait > deadline:
+                    self.breaker.record_failure()
+                    raise
+                print(f"[FACILITATOR] ⚠️ {request.url.path} attempt {attempt + 1} failed: {type(e).__name__}")
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    self.breaker.record_success()
+                    return response
+                retry_after = _retry_after(response)
+                wait = self._wait(delay, retry_after)
+                if attempt == self.max_retries or wait is None or time.monotonic() + wait > deadline:
+                    if attempt < self.max_retries:
+                        print(f"[FACILITATOR] ⚠️ {request.url.path} got HTTP {response.status_code} (Retry-After {retry_after}); waiting would exceed the retry budget, giving up")
+                    self.breaker.record_failure()
+                    return response
+                print(f"[FACILITATOR] ⚠️ {request.url.path} attempt {attempt + 1} got HTTP {response.status_code}")
+                await response.aclose()
+            await asyncio.sleep(wait)
+
+    def _wait(self, delay: float, retry_after: float | None) -> float | None:
+        """
+        Seconds to sleep before the next attempt: full jitter up to `delay`, or a server-given
+        Retry-After with the jitter on top, capped at max_backoff. None when Retry-After alone
+        asks for longer than max_backoff.
+        """
+        if retry_after is None:
+            return random.uniform(0, delay)
+        if retry_after > self.max_backoff:
+            return None
+        return min(retry_after + random.uniform(0, delay), self.max_backoff)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def new_facilitator_http_client(base_url: str = "", transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    """A pooled AsyncClient for the facilitator with the retry/circuit policy installed."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(FACILITATOR_TIMEOUT, connect=FACILITATOR_CONNECT_TIMEOUT),
+        transport=ResilientTransport(inner=transport),
+        follow_redirects=True
+    )
+
+
+def idempotency_key(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class FacilitatorClient:
+    """Long-lived facilitator client. Connections stay warm across settlements."""
+
+    def __init__(self, base_url: str, transport: httpx.AsyncBaseTransport | None = None):
+        self.base_url = base_url
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._loop_id: int | None = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        # httpx pools are bound to the event loop that first used them
+        loop_id = id(asyncio.get_running_loop())
+        if self._client is None or self._loop_id != loop_id:
+            self._client = new_facilitator_http_client(self.base_url, self._transport)
+            self._loop_id = loop_id
+        return self._client
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self.http_client._transport.breaker
+
+    async def post(self, path: str, payload: dict, key: str | None = None) -> dict:
+        try:
+            response = await self.http_client.post(
+                path, json=payload, headers={IDEMPOTENCY_HEADER: key or idempotency_key(payload)}
+            )
+        except httpx.HTTPError as e:
+            raise FacilitatorError(f"Facilitator unreachable: {type(e).__name__}: {e}") from e
+        if response.status_code != 200:
+            raise FacilitatorError(
+                f"Facilitator error {response.status_code}: {response.text}",
+                status_code=response.status_code,
+                body=response.text
+            )
+        return response.json()
+
+    async def settle(self, payment_mandate: dict) -> dict:
+        return await self.post("/settle", payment_mandate)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
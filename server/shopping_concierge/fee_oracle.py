@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+
+from .rpc_client import get_async_web3
+
+# Fee data is refreshed at most this often, and only re-derived when a new block has landed
+FEE_CACHE_TTL = float(os.getenv("FEE_CACHE_TTL", "3"))
+# Extra headroom on estimates for anything costlier than a plain transfer
+GAS_HEADROOM = 1.2
+PLAIN_TRANSFER_GAS = 21000
+
+class FeeOracle:
+    """
+    Caches gas price / EIP-1559 fee data per block and estimates gas per transaction.
+
+    One settlement used to call `eth_gasPrice` once per merchant and reserve a flat
+    2M gas per transfer. The oracle answers every fee lookup inside the TTL from
+    memory, and estimates gas for a whole batch in a single JSON-RPC batch request.
+    """
+
+    def __init__(self, w3=None, ttl: float = FEE_CACHE_TTL):
+        self._w3 = w3
+        self.ttl = ttl
+        self._fees: dict | None = None
+        self._block_number: int | None = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _client(self):
+        return self._w3 or await get_async_web3()
+
+    async def fee_fields(self) -> dict:
+        """
+        Returns the fee fields for a transaction dict: `maxFeePerGas` and
+        `maxPriorityFeePerGas` on chains whose blocks carry a base fee,
+        otherwise a legacy `gasPrice`.
+        """
+        if self._fees is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return dict(self._fees)
+
+        async with self._lock:
+            # Another caller may have refreshed while we waited on the lock
+            if self._fees is not None and time.monotonic() - self._fetched_at < self.ttl:
+                return dict(self._fees)
+
+            w3 = await self._client()
+            block = await w3.eth.get_block("latest")
+            if self._fees is None or block["number"] != self._block_number:
+                base_fee = block.get("baseFeePerGas")
+                if base_fee is not None:
+                    priority_fee = await w3.eth.max_priority_fee
+                    self._fees = {
+                        "maxFeePerGas": 2 * base_fee + priority_fee,
+                        "maxPriorityFeePerGas": priority_fee
+                    }
+                else:
+                    self._fees = {"gasPrice": await w3.eth.gas_price}
+                self._block_number = block["number"]
+            self._fetched_at = time.monotonic()
+            return dict(self._fees)
+
+    async def gas_price(self) -> int:
+        """The per-gas price a transaction will pay at most under the current fee fields."""
+        fees = await self.fee_fields()
+        return fees.get("maxFeePerGas", fees.get("gasPrice"))
+
+    async def estimate_gas_many(self, txs: list[dict]) -> list[int]:
+        """
+        Estimates gas for each transaction (without nonce) in one batch round-trip.
+
+        Transactions that share sender, recipient and calldata share a single
+        estimate, so a cart paying ten wallets costs at most ten estimates.
+        """
+        if not txs:
+            return []
+        w3 = await self._client()
+
+        keys = [(tx.get("from"), tx.get("to"), tx.get("data", b"")) for tx in txs]
+        first_tx = {}
+        for key, tx in zip(keys, txs):
+            first_tx.setdefault(key, tx)
+        unique = list(first_tx)
+
+        try:
+            async with w3.batch_requests() as batch:
+                for key in unique:
+                    batch.add(w3.eth.estimate_gas(first_tx[key]))
+                estimates = await batch.async_execute()
+        except Exception:
+            # Providers without JSON-RPC batch support still get the requests concurrently
+            estimates = await asyncio.gather(*(w3.eth.estimate_gas(first_tx[key]) for key in unique))
+
+        by_key = {key: self._with_headroom(int(gas)) for key, gas in zip(unique, estimates)}
+        return [by_key[key] for key in keys]
+
+    @staticmethod
+    def _with_headroom(gas: int) -> int:
+        if gas <= PLAIN_TRANSFER_GAS:
+            return gas
+        return int(gas * GAS_HEADROOM)
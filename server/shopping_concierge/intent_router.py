@@ -0,0 +1,48 @@
+import os
+import re
+
+from .mandate_index import extract_signature
+
+# Set CONDUCTOR_ROUTING=0 to run every agent on every turn, as before routing existed
+ROUTING_ENABLED = os.getenv("CONDUCTOR_ROUTING", "1") != "0"
+
+# plan: a fresh request, build the project plan and find products
+# revise: edits to an existing plan, same agents as plan
+# approve: the user accepted the plan, build the CartMandate and ask for a signature
+# sign: the MetaMask signature came back, settle
+TURN_STAGES = ("plan", "revise", "approve", "sign")
+
+APPROVAL_PATTERN = re.compile(
+    r"\b(looks? good|approved?|let'?s do it|that'?s (alright|fine|good|great)|sounds good|go ahead|"
+    r"confirm(ed)?|perfect|yes|yep|yeah|ok(ay)?|buy (it|them|everything))\b"
+)
+# Approval words next to any of these mean the user still wants changes ("yes, but cheaper shoes")
+REVISION_PATTERN = re.compile(
+    r"\b(but|change|instead|swap|replace|remove|add|increase|decrease|cheaper|budget|without|except|"
+    r"more|less|don'?t|not)\b"
+)
+# Long messages are new instructions even when they happen to contain "ok"
+MAX_APPROVAL_WORDS = 12
+
+
+def user_text(content) -> str:
+    if not content or not content.parts:
+        return ""
+    return "\n".join(part.text for part in content.parts if getattr(part, "text", None))
+
+
+def classify_turn(text: str, state: dict) -> str:
+    """Picks the stage for one user turn with cheap pattern checks, no model call."""
+    if extract_signature(text)[1]:
+        return "sign"
+    has_plan = bool(state.get("discovery_data"))
+    if not has_plan:
+        return "plan"
+    lowered = text.lower()
+    if (
+        APPROVAL_PATTERN.search(lowered)
+        and not REVISION_PATTERN.search(lowered)
+        and len(lowered.split()) <= MAX_APPROVAL_WORDS
+    ):
+        return "approve"
+    return "revise"
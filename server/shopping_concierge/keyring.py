@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import threading
+
+from ecdsa import SigningKey, SECP256k1
+
+# Environment variable holding the agent's mandate-signing / x402 payer key
+AGENT_KEY_ENV = "AGENT_PRIVATE_KEY"
+
+
+def _canonical_json(data) -> str:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+
+class AgentSigner:
+    """Everything derived from one private key, built once: ecdsa keys, address, eth Account, x402 client."""
+
+    def __init__(self, private_key_hex: str):
+        self.private_key_hex = private_key_hex
+        self.signing_key = SigningKey.from_string(bytes.fromhex(private_key_hex), curve=SECP256k1)
+        self.verifying_key = self.signing_key.verifying_key
+        self.signer_address = "0x" + hashlib.sha256(self.verifying_key.to_string()).hexdigest()[:40]
+        self._account = None
+        self._x402_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def account(self):
+        if self._account is None:
+            from eth_account import Account
+            self._account = Account.from_key(self.private_key_hex)
+        return self._account
+
+    def x402_client(self):
+        with self._lock:
+            if self._x402_client is None:
+                from x402 import x402Client
+                from x402.mechanisms.evm import EthAccountSigner
+                from x402.mechanisms.evm.exact.register import register_exact_evm_client
+
+                client = x402Client()
+                register_exact_evm_client(client, EthAccountSigner(self.account))
+                print(f"[KEYRING] ✅ x402 client ready for wallet: {self.account.address}")
+                self._x402_client = client
+            return self._x402_client
+
+    def sign(self, payload: dict) -> tuple[str, str]:
+        """Signs sha256(canonical JSON of payload); returns (signature_hex, signer_address)."""
+        msg_hash = hashlib.sha256(_canonical_json(payload).encode()).digest()
+        signature = self.signing_key.sign_digest(msg_hash, sigencode=lambda r, s, order: bytes.fromhex(f"{r:064x}{s:064x}"))
+        return signature.hex(), self.signer_address
+
+
+class SignerKeyring:
+    """
+    Caches signers per private key. The active key is read from the environment
+    once; `rotate()` switches to a new key (or re-reads the environment) and drops
+    the old signer so nothing keeps signing with a retired key.
+    """
+
+    def __init__(self, env_var: str = AGENT_KEY_ENV):
+        self.env_var = env_var
+        self._signers: dict[str, AgentSigner] = {}
+        self._active: str | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(private_key: str) -> str:
+        # Remove '0x' prefix if accidentally included
+        return private_key[2:] if private_key.startswith("0x") else private_key
+
+    def _load(self, private_key: str) -> AgentSigner:
+        private_key = self._normalize(private_key)
+        signer = self._signers.get(private_key)
+        if signer is None:
+            signer = self._signers[private_key] = AgentSigner(private_key)
+        return signer
+
+    def current(self) -> AgentSigner:
+        active = self._active
+        signer = self._signers.get(active) if active is not None else None
+        if signer is not None:
+            return signer
+        with self._lock:
+            if self._active is None:
+                private_key = os.getenv(self.env_var)
+                if not private_key:
+                    raise ValueError(f"{self.env_var} not set in .env")
+                self._active = self._load(private_key).private_key_hex
+            return self._signers[self._active]
+
+    def rotate(self, private_key: str | None = None) -> AgentSigner:
+        """Makes `private_key` (default: the current environment value) the active key."""
+        private_key = private_key or os.getenv(self.env_var)
+        if not private_key:
+            raise ValueError(f"{self.env_var} not set in .env")
+        with self._lock:
+            signer = self._load(private_key)
+            retired = [key for key in self._signers if key != signer.private_key_hex]
+            for key in retired:
+                del self._signers[key]
+            self._active = signer.private_key_hex
+        if retired:
+            print(f"[KEYRING] 🔑 Rotated signing key; now signing as {signer.signer_address}")
+        return signer
+
+    def sign(self, payload: dict) -> tuple[str, str]:
+        return self.current().sign(payload)
+
+    def sign_many(self, payloads: list[dict]) -> list[tuple[str, str]]:
+        """Signs each payload with the active key, resolved once for the whole batch."""
+        signer = self.current()
+        return [signer.sign(payload) for payload in payloads]
+
+    def x402_client(self):
+        return self.current().x402_client()
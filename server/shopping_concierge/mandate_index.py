@@ -0,0 +1,130 @@
+import json
+import re
+
+# Session state key holding the latest signature / CartMandate seen in the conversation
+INDEX_STATE_KEY = "mandate_index"
+
+SIGNATURE_PATTERN = re.compile(r'(0x[a-fA-F0-9]{130,})')
+JSON_BLOCK_PATTERN = re.compile(r'```(?:json)?\n([\s\S]*?)\n```')
+RAW_JSON_PATTERN = re.compile(r'(\{[\s\S]*\})')
+
+DEFAULT_CHAIN_ID = 324705682
+
+
+def empty_index() -> dict:
+    return {"authorized": False, "signature": None, "cart_mandate": None}
+
+
+def extract_signature(text: str) -> tuple[bool, str | None]:
+    """Returns (authorized, signature) found in a single message."""
+    text = text.strip()
+    authorized = False
+    signature = None
+    # Check 1: The requested JSON flag
+    if '"authorized": true' in text or '"authorized":true' in text:
+        authorized = True
+        try:
+            signature = json.loads(text).get("signature")
+        except Exception:
+            pass
+    # Check 2: Raw regex extraction (bypasses LLM hallucinations)
+    if not signature:
+        sig_match = SIGNATURE_PATTERN.search(text)
+        if sig_match:
+            authorized = True
+            signature = sig_match.group(1)
+    return authorized, signature
+
+
+def _normalize_cart_mandate(payload: dict) -> dict | None:
+    # Handle the new Batch structure
+    if "merchants" in payload and isinstance(payload["merchants"], list):
+        return {
+            "total_budget": payload.get("total_budget_amount"),
+            "currency": payload.get("currency", "USDC"),
+            "chain_id": payload.get("chain_id", DEFAULT_CHAIN_ID),
+            "merchants": payload["merchants"]
+        }
+    # Handle if wrapped
+    if "cart_mandate" in payload:
+        return payload["cart_mandate"]
+    # Handle if wrapped in message
+    if "message" in payload and isinstance(payload["message"], dict):
+        payload = payload["message"]
+        if not ("merchant_address" in payload and "amount" in payload):
+            return None
+    # Handle if flat
+    if "merchant_address" in payload and "amount" in payload:
+        return {
+            "merchant_address": payload.get("merchant_address"),
+            "amount": payload.get("amount"),
+            "currency": payload.get("currency", "USDC"),
+            "chain_id": payload.get("chain_id", DEFAULT_CHAIN_ID)
+        }
+    return None
+
+
+def extract_cart_mandate(text: str) -> dict | None:
+    """Returns the last CartMandate in a single message, from fenced JSON or a raw JSON object."""
+    json_matches = JSON_BLOCK_PATTERN.findall(text)
+    # If no markdown blocks, try searching for raw JSON objects
+    if not json_matches:
+        raw_json_match = RAW_JSON_PATTERN.search(text)
+        if raw_json_match:
+            json_matches = [raw_json_match.group(1)]
+
+    for match in reversed(json_matches):
+        try:
+            payload = json.loads(match)
+        except Exception:
+            continue
+        if isinstance(payload, dict):
+            cart_mandate = _normalize_cart_mandate(payload)
+            if cart_mandate:
+                return cart_mandate
+    return None
+
+
+def index_content(index: dict, content) -> dict | None:
+    """
+    Folds one message into the index. Returns the updated copy, or None if the
+    message carried neither a signature nor a CartMandate.
+    """
+    if not content or not content.parts:
+        return None
+    updated = None
+    for part in content.parts:
+        if not getattr(part, "text", None):
+            continue
+        authorized, signature = extract_signature(part.text)
+        cart_mandate = extract_cart_mandate(part.text)
+        if signature or cart_mandate:
+            updated = updated or dict(index)
+        if signature:
+            updated["authorized"] = authorized
+            updated["signature"] = signature
+        if cart_mandate:
+            updated["cart_mandate"] = cart_mandate
+    return updated
+
+
+def build_index(events) -> dict:
+    """Full scan of the history, oldest first. Only needed for sessions that predate the index."""
+    index = empty_index()
+    for event in events or []:
+        if event.partial:
+            continue
+        index = index_content(index, event.content) or index
+    return index
+
+
+def current_index(context) -> dict:
+    """
+    Index for the running invocation: the copy kept in session state (backfilled
+    once if missing) plus the user message that started this turn, which the
+    conductor may not have persisted yet.
+    """
+    index = context.session.state.get(INDEX_STATE_KEY)
+    if index is None:
+        index = build_index(context.session.events)
+    return index_content(index, context.user_content) or index
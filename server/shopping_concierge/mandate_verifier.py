@@ -0,0 +1,144 @@
+import os
+import threading
+from collections import OrderedDict
+
+from eth_abi import encode
+from eth_keys import keys
+from eth_utils import keccak
+
+from .rpc_client import SKALE_CHAIN_ID
+
+# Verified (digest, signature) -> signer results kept in memory
+VERIFY_CACHE_SIZE = int(os.getenv("MANDATE_VERIFY_CACHE_SIZE", "1024"))
+
+DOMAIN_NAME = "CartBlanche"
+DOMAIN_VERSION = "1"
+VERIFYING_CONTRACT = "0x0000000000000000000000000000000000000000"
+DEFAULT_MERCHANT_ADDRESS = "0xFe5e03799Fe833D93e950d22406F9aD901Ff3Bb9"
+
+EIP712_DOMAIN_TYPE = [
+    {"name": "name", "type": "string"},
+    {"name": "version", "type": "string"},
+    {"name": "chainId", "type": "uint256"},
+    {"name": "verifyingContract", "type": "address"},
+]
+CART_MANDATE_TYPE = [
+    {"name": "merchant_address", "type": "address"},
+    {"name": "amount", "type": "uint256"},
+    {"name": "currency", "type": "string"},
+]
+
+
+def _encode_type(primary_type: str, fields: list[dict]) -> bytes:
+    return f"{primary_type}({','.join(f['type'] + ' ' + f['name'] for f in fields)})".encode()
+
+
+# Both schemas are fixed, so their type hashes are computed once at import
+EIP712_DOMAIN_TYPEHASH = keccak(_encode_type("EIP712Domain", EIP712_DOMAIN_TYPE))
+CART_MANDATE_TYPEHASH = keccak(_encode_type("CartMandate", CART_MANDATE_TYPE))
+
+
+def _uint(value) -> int:
+    # Same coercion encode_typed_data applies: numeric strings are parsed, anything else is left to eth_abi
+    if isinstance(value, str):
+        return int(value, 0)
+    return value
+
+
+def mandate_message(cart_mandate: dict) -> dict:
+    """The CartMandate struct the user signs, with the same fallbacks the frontend uses."""
+    return {
+        "merchant_address": cart_mandate.get("merchant_address", DEFAULT_MERCHANT_ADDRESS),
+        "amount": cart_mandate.get("amount") or cart_mandate.get("total_budget") or 0,
+        "currency": cart_mandate.get("currency", "USDC")
+    }
+
+
+class MandateVerifier:
+    """
+    EIP-712 CartMandate verifier. Domain separators are computed once per chain ID and
+    recovered signers are kept in an LRU, so re-verifying the same mandate (frontend
+    retries, processor re-runs) costs a dict lookup instead of a public key recovery.
+    Thread-safe: settlement runs recovery on a worker pool.
+    """
+
+    def __init__(self, cache_size: int = VERIFY_CACHE_SIZE):
+        self._cache_size = cache_size
+        self._cache: OrderedDict[tuple[bytes, bytes], str] = OrderedDict()
+        self._separators: dict[int, bytes] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def domain_separator(self, chain_id: int) -> bytes:
+        separator = self._separators.get(chain_id)
+        if separator is None:
+            separator = keccak(encode(
+                ["bytes32", "bytes32", "bytes32", "uint256", "address"],
+                [
+                    EIP712_DOMAIN_TYPEHASH,
+                    keccak(text=DOMAIN_NAME),
+                    keccak(text=DOMAIN_VERSION),
+                    _uint(chain_id),
+                    VERIFYING_CONTRACT
+                ]
+            ))
+            self._separators[chain_id] = separator
+        return separator
+
+    def digest(self, chain_id: int, message: dict) -> bytes:
+        """keccak256(0x1901 || domainSeparator || hashStruct(message)), as signed by eth_signTypedData_v4."""
+        struct_hash = keccak(encode(
+            ["bytes32", "address", "uint256", "bytes32"],
+            [
+                CART_MANDATE_TYPEHASH,
+                message["merchant_address"],
+                _uint(message["amount"]),
+                keccak(text=message["currency"])
+            ]
+        ))
+        return keccak(b"\x19\x01" + self.domain_separator(chain_id) + struct_hash)
+
+    def recover(self, cart_mandate: dict, signature: str | bytes, chain_id: int = SKALE_CHAIN_ID) -> str:
+        """Returns the checksummed address that signed `cart_mandate`."""
+        digest = self.digest(cart_mandate.get("chain_id", chain_id), mandate_message(cart_mandate))
+        signature_bytes = bytes.fromhex(signature[2:] if signature.startswith("0x") else signature) \
+            if isinstance(signature, str) else bytes(signature)
+        key = (digest, signature_bytes)
+
+        with self._lock:
+            signer = self._cache.get(key)
+            if signer is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return signer
+            self.misses += 1
+
+        if len(signature_bytes) != 65:
+            raise ValueError(f"Unexpected signature length: {len(signature_bytes)} bytes")
+        v = signature_bytes[64]
+        if v >= 27:
+            v -= 27
+        r = int.from_bytes(signature_bytes[:32], "big")
+        s = int.from_bytes(signature_bytes[32:64], "big")
+        signer = keys.Signature(vrs=(v, r, s)).recover_public_key_from_msg_hash(digest).to_checksum_address()
+
+        with self._lock:
+            self._cache[key] = signer
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return signer
+
+    def verify_many(self, items: list[tuple[dict, str]], chain_id: int = SKALE_CHAIN_ID) -> list[str | None]:
+        """Recovers a batch of (cart_mandate, signature) pairs; entries that fail to verify come back as None."""
+        signers = []
+        for cart_mandate, signature in items:
+            try:
+                signers.append(self.recover(cart_mandate, signature, chain_id))
+            except Exception as e:
+                print(f"[MANDATE_VERIFIER] ❌ Rejected signature {str(signature)[:15]}...: {e}")
+                signers.append(None)
+        return signers
+
+
+mandate_verifier = MandateVerifier()
@@ -1,4 +1,5 @@
 from google.adk.agents import LlmAgent
+from .context_compactor import ContextCompactor
 
 merchant_agent = LlmAgent(
     name="MerchantAgent",
@@ -22,5 +23,6 @@ merchant_agent = LlmAgent(
     }
     ```
     """,
-    output_key="cart_mandate_data"
+    output_key="cart_mandate_data",
+    before_model_callback=ContextCompactor(("discovery_data", "cart_mandate_data")).before_model_callback
 )
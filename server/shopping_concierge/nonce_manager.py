@@ -0,0 +1,169 @@
+import asyncio
+import bisect
+import os
+
+from .rpc_client import SKALE_CHAIN_ID, get_async_web3
+
+# Seconds to wait for a gap-fill self-transfer to be mined before resyncing from the node instead
+GAP_FILL_TIMEOUT = float(os.getenv("NONCE_GAP_FILL_TIMEOUT", "120"))
+# Node errors meaning our nonce sequence is out of step with the node (another transaction already
+# holds the nonce); "invalid transaction nonce" is how skaled words it
+STALE_NONCE_ERRORS = ("nonce too low", "invalid transaction nonce", "nonce has already been used", "replacement transaction underpriced")
+
+
+def is_stale_nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in STALE_NONCE_ERRORS)
+
+
+class NonceManager:
+    """
+    Owns the nonce sequence of one sending address across every in-flight settlement.
+
+    Settlements used to read `get_transaction_count` and count up locally, so two
+    carts approved at the same moment were handed the same nonces. Here every
+    nonce comes from one allocator: broadcast transactions are tracked until
+    confirmed, nonces that were allocated but never broadcast go back to the pool
+    (lowest first, so the next allocation closes the gap), and the sequence is
+    resynced from the chain on first use and whenever the node reports it stale.
+    """
+
+    def __init__(self, address: str, w3=None):
+        self.address = address
+        self._w3 = w3
+        self._next: int | None = None
+        self._released: list[int] = []
+        self._pending: dict[int, str] = {}
+        self._lock = asyncio.Lock()
+        # Held while a batch is allocated and broadcast, so its nonces reach the node
+        # contiguously and in order (many nodes reject a nonce above the next expected one)
+        self.submit_lock = asyncio.Lock()
+
+    async def _client(self):
+        return self._w3 or await get_async_web3()
+
+    async def sync(self):
+        """Resyncs the sequence from the node's pending transaction count."""
+        async with self._lock:
+            await self._sync_locked()
+
+    async def _sync_locked(self):
+        w3 = await self._client()
+        chain_next = await w3.eth.get_transaction_count(self.address, "pending")
+        self._next = max(self._next or 0, chain_next)
+        # The node's pending count stops at the first gap, so anything below it is already used
+        self._released = [nonce for nonce in self._released if nonce >= chain_next]
+        self._pending = {nonce: tx for nonce, tx in self._pending.items() if nonce >= chain_next}
+
+    async def allocate(self, count: int = 1) -> list[int]:
+        """Reserves `count` nonces, reusing released ones before extending the sequence."""
+        async with self._lock:
+            if self._next is None:
+                await self._sync_locked()
+            reused, self._released = self._released[:count], self._released[count:]
+            fresh = list(range(self._next, self._next + count - len(reused)))
+            self._next += len(fresh)
+            return reused + fresh
+
+    def mark_sent(self, nonce: int, tx_hash: str):
+        self._pending[nonce] = tx_hash
+
+    def confirm(self, nonce: int):
+        """The nonce's transaction was mined (successfully or not), so it is spent for good."""
+        self._pending.pop(nonce, None)
+
+    def release(self, nonce: int):
+        """Hands back a nonce that was allocated but never broadcast."""
+        self._pending.pop(nonce, None)
+        if nonce not in self._released:
+            bisect.insort(self._released, nonce)
+
+    async def wait_mined(self, nonce: int, tx_hash, timeout: float):
+        """
+        Waits for the transaction broadcast on `nonce` and confirms it. If the wait fails
+        or is cancelled, the sequence is resynced from the node instead so the nonce is
+        not counted as in flight forever; the error is re-raised.
+        """
+        w3 = await self._client()
+        try:
+            receipt = await w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        except BaseException:
+            await self._forget(nonce)
+            raise
+        self.confirm(nonce)
+        return receipt
+
+    async def reconcile(self, sent: dict[int, str]):
+        """Forgets any of `sent` (nonce -> tx hash) still pending, e.g. because its receipt wait never ran."""
+        stranded = [nonce for nonce, tx_hash in sent.items() if self._pending.get(nonce) == tx_hash]
+        if stranded:
+            await self._forget(*stranded)
+
+    async def _forget(self, *nonces: int):
+        try:
+            await self.sync()
+        except Exception as e:
+            print(f"[NONCE_MANAGER] ⚠️ Resync after unconfirmed nonces {list(nonces)} failed: {e}")
+        for nonce in nonces:
+            if nonce in self._pending:
+                # The node has not seen it at all, so it is a gap the next allocation should fill
+                self.release(nonce)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def fill_gaps(self, private_key: str, fee_fields: dict) -> list[str]:
+        """
+        Broadcasts a zero-value self-transfer on every released nonce that sits below a
+        broadcast one. Otherwise those later transactions wait until another settlement
+        happens to claim the gap.
+        """
+        async with self._lock:
+            if not self._pending:
+                return []
+            highest_sent = max(self._pending)
+            gaps = [nonce for nonce in self._released if nonce < highest_sent]
+            self._released = [nonce for nonce in self._released if nonce > highest_sent]
+
+        w3 = await self._client()
+        sent = []
+        for nonce in gaps:
+            tx = {
+                'to': self.address,
+                'value': 0,
+                'gas': 21000,
+                'nonce': nonce,
+                'chainId': SKALE_CHAIN_ID,
+                **fee_fields
+            }
+            signed_tx = w3.eth.account.sign_transaction(tx, private_key)
+            try:
+                tx_hash = w3.to_hex(await w3.eth.send_raw_transaction(signed_tx.raw_transaction))
+            except Exception as e:
+                print(f"[NONCE_MANAGER] ❌ Could not fill nonce gap {nonce}: {e}")
+                await self.sync()
+                continue
+            print(f"[NONCE_MANAGER] Filled nonce gap {nonce} with {tx_hash}")
+            self.mark_sent(nonce, tx_hash)
+            sent.append((nonce, tx_hash))
+
+        # Confirm the fills too, or they would stay in _pending and skew in_flight and later gap detection
+        results = await asyncio.gather(
+            *(self.wait_mined(nonce, tx_hash, GAP_FILL_TIMEOUT) for nonce, tx_hash in sent),
+            return_exceptions=True
+        )
+        for (nonce, tx_hash), result in zip(sent, results):
+            if isinstance(result, BaseException):
+                print(f"[NONCE_MANAGER] ⚠️ Gap fill {tx_hash} on nonce {nonce} unconfirmed: {result}")
+        return [tx_hash for _, tx_hash in sent]
+
+
+_managers: dict[str, NonceManager] = {}
+
+def get_nonce_manager(address: str, w3=None) -> NonceManager:
+    """Returns the process-wide NonceManager for `address`, creating it on first use."""
+    manager = _managers.get(address)
+    if manager is None:
+        manager = _managers[address] = NonceManager(address, w3)
+    return manager
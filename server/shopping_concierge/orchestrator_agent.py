@@ -1,4 +1,8 @@
 from google.adk.agents import LlmAgent
+from .response_cache import response_cache
+from .context_compactor import ContextCompactor
+
+before_model_callback, after_model_callback, on_model_error_callback = response_cache.callbacks()
 
 orchestrator_agent = LlmAgent(
     name="ProjectOrchestrator",
@@ -20,5 +24,8 @@ orchestrator_agent = LlmAgent(
     DO NOT output anything outside of these tags. NO intro text.
     If the user says "looks good" or "approve", output exactly: <orchestrator>looks good</orchestrator>
     """,
-    output_key="project_plan"
+    output_key="project_plan",
+    before_model_callback=[ContextCompactor(("project_plan",)).before_model_callback, before_model_callback],
+    after_model_callback=after_model_callback,
+    on_model_error_callback=on_model_error_callback
 )
\ No newline at end of file
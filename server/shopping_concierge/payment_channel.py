@@ -0,0 +1,513 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from decimal import Decimal
+
+import httpx
+from eth_abi import encode
+from eth_account import Account
+from eth_keys import keys
+from eth_utils import keccak
+from web3.exceptions import TransactionNotFound
+
+from .rpc_client import SKALE_CHAIN_ID, get_async_web3, rpc_lifespan
+from .fee_oracle import FeeOracle, PLAIN_TRANSFER_GAS
+from .nonce_manager import get_nonce_manager, is_stale_nonce_error
+from .mandate_verifier import mandate_verifier
+
+# Seconds between background settlement rounds
+CHANNEL_SETTLE_INTERVAL = float(os.getenv("CHANNEL_SETTLE_INTERVAL", "60"))
+# A channel owing at least this much (USDC) is settled on the next round instead of waiting to accumulate
+CHANNEL_SETTLE_THRESHOLD = os.getenv("CHANNEL_SETTLE_THRESHOLD", "0.10")
+# Seconds a settlement round waits for each transfer; one still unmined is rechecked next round
+CHANNEL_RECEIPT_TIMEOUT = float(os.getenv("CHANNEL_RECEIPT_TIMEOUT", "120"))
+# Channel totals survive restarts here, so balances below the threshold are not forgotten
+CHANNEL_STATE_PATH = os.getenv(
+    "CHANNEL_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "payment_channels.sqlite3")
+)
+# Request header carrying the signed voucher to the provider
+VOUCHER_HEADER = "X-Payment-Voucher"
+
+# Same USD -> native rule X402SettlementTool applies to cart payouts (USD / 1,000,000 in ether),
+# expressed per micro-USDC
+WEI_PER_MICRO_USDC = 10 ** 6
+
+PAYMENT_VOUCHER_TYPE = [
+    {"name": "payer", "type": "address"},
+    {"name": "provider", "type": "address"},
+    {"name": "channel_id", "type": "bytes32"},
+    {"name": "cumulative_amount", "type": "uint256"},
+    {"name": "nonce", "type": "uint256"},
+]
+PAYMENT_VOUCHER_TYPEHASH = keccak(
+    f"PaymentVoucher({','.join(f['type'] + ' ' + f['name'] for f in PAYMENT_VOUCHER_TYPE)})".encode()
+)
+
+
+def usdc_to_micro(amount) -> int:
+    """USDC amount (str/float/Decimal) to integer micro-USDC, the unit vouchers count in."""
+    return int((Decimal(str(amount)) * 10 ** 6).to_integral_value())
+
+
+def voucher_digest(voucher: dict, chain_id: int = SKALE_CHAIN_ID) -> bytes:
+    """EIP-712 digest of a PaymentVoucher under the CartBlanche domain."""
+    struct_hash = keccak(encode(
+        ["bytes32", "address", "address", "bytes32", "uint256", "uint256"],
+        [
+            PAYMENT_VOUCHER_TYPEHASH,
+            voucher["payer"],
+            voucher["provider"],
+            bytes.fromhex(voucher["channel_id"][2:]),
+            voucher["cumulative_amount"],
+            voucher["nonce"]
+        ]
+    ))
+    return keccak(b"\x19\x01" + mandate_verifier.domain_separator(chain_id) + struct_hash)
+
+
+def recover_voucher_signer(voucher: dict, chain_id: int = SKALE_CHAIN_ID) -> str:
+    signature = bytes.fromhex(voucher["signature"].removeprefix("0x"))
+    if len(signature) != 65:
+        raise ValueError("Malformed voucher signature")
+    v = signature[64] - 27 if signature[64] >= 27 else signature[64]
+    vrs = (v, int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:64], "big"))
+    return keys.Signature(vrs=vrs).recover_public_key_from_msg_hash(voucher_digest(voucher, chain_id)).to_checksum_address()
+
+
+class PaymentChannel:
+    """Payer-side state of one agent -> provider channel."""
+
+    def __init__(self, payer: str, provider: str, provider_url: str | None = None, channel_id: str | None = None):
+        self.payer = payer
+        self.provider = provider
+        self.provider_url = provider_url
+        self.channel_id = channel_id or "0x" + keccak(
+            bytes.fromhex(payer[2:]) + bytes.fromhex(provider[2:]) + time.time_ns().to_bytes(16, "big")
+        ).hex()
+        self.cumulative = 0
+        self.settled = 0
+        self.nonce = 0
+        # Highest cumulative total the provider answered a paid call for; only this much is ever settled
+        self.accepted = 0
+        # Settlement transfer sent but not yet seen mined: {"tx_hash", "nonce", "cumulative", "amount"}
+        self.pending: dict | None = None
+
+    @property
+    def owed(self) -> int:
+        return self.cumulative - self.settled
+
+    @property
+    def payable(self) -> int:
+        """What the next settlement may pay: the accepted total not yet settled."""
+        return max(self.accepted - self.settled, 0)
+
+    def sign_next(self, account, amount: int) -> dict:
+        """Raises the cumulative total by `amount` and signs a voucher for the new total."""
+        self.cumulative += amount
+        self.nonce += 1
+        voucher = {
+            "payer": self.payer,
+            "provider": self.provider,
+            "channel_id": self.channel_id,
+            "cumulative_amount": self.cumulative,
+            "nonce": self.nonce
+        }
+        signed = Account.unsafe_sign_hash(voucher_digest(voucher), account.key)
+        return {**voucher, "signature": "0x" + signed.signature.hex().removeprefix("0x")}
+
+    def revert(self, voucher: dict, amount: int) -> bool:
+        """
+        Takes back `amount` of a voucher the provider refused. Only the latest voucher can
+        be taken back (a later one already includes it); the nonce stays used either way.
+        """
+        if self.cumulative != voucher["cumulative_amount"]:
+            return False
+        self.cumulative -= amount
+        return True
+
+
+class ChannelManager:
+    """
+    Pays providers with off-chain cumulative vouchers and settles them on-chain in batches.
+
+    Each paid tool call used to be its own on-chain micro-transfer, which put a
+    confirmation wait on the tool call. Here a call only signs a voucher for the
+    running total owed to that provider (no RPC at all). A background loop
+    periodically pays every channel's unsettled balance in one transfer per
+    provider and tells the provider which total that transfer covers. Only totals a
+    provider acknowledged by serving the paid call (mark_accepted) are ever settled.
+
+    Channel totals are written to SQLite on every change and reloaded on start;
+    channel_lifespan() settles the remainder when the server shuts down.
+    """
+
+    def __init__(
+        self,
+        private_key: str,
+        w3=None,
+        fee_oracle: FeeOracle | None = None,
+        settle_interval: float = CHANNEL_SETTLE_INTERVAL,
+        settle_threshold: int = usdc_to_micro(CHANNEL_SETTLE_THRESHOLD),
+        state_path: str = CHANNEL_STATE_PATH
+    ):
+        self._w3 = w3
+        self._private_key = private_key
+        self._account = Account.from_key(private_key)
+        self._fee_oracle = fee_oracle or FeeOracle(w3)
+        self.settle_interval = settle_interval
+        self.settle_threshold = settle_threshold
+        self.channels: dict[str, PaymentChannel] = {}
+        self._settle_lock = asyncio.Lock()
+        self._settle_task: asyncio.Task | None = None
+        self._db = sqlite3.connect(state_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS channels ("
+            "payer TEXT, provider TEXT, channel_id TEXT, provider_url TEXT, "
+            "cumulative INTEGER, settled INTEGER, nonce INTEGER, accepted INTEGER, pending TEXT, PRIMARY KEY (payer, provider))"
+        )
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT provider, channel_id, provider_url, cumulative, settled, nonce, accepted, pending FROM channels WHERE payer = ?",
+            (self._account.address,)
+        )
+        for provider, channel_id, provider_url, cumulative, settled, nonce, accepted, pending in rows:
+            channel = PaymentChannel(self._account.address, provider, provider_url, channel_id)
+            channel.cumulative, channel.settled, channel.nonce, channel.accepted = cumulative, settled, nonce, accepted
+            channel.pending = json.loads(pending) if pending else None
+            self.channels[provider] = channel
+        payable = sum(channel.payable for channel in self.channels.values())
+        if payable:
+            print(f"[PAYMENT_CHANNEL] Restored {len(self.channels)} channel(s) owing {payable / 10 ** 6} USDC")
+
+    def _save(self, channel: PaymentChannel):
+        self._db.execute(
+            "INSERT OR REPLACE INTO channels "
+            "(payer, provider, channel_id, provider_url, cumulative, settled, nonce, accepted, pending) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                channel.payer, channel.provider, channel.channel_id, channel.provider_url, channel.cumulative,
+                channel.settled, channel.nonce, channel.accepted, json.dumps(channel.pending) if channel.pending else None
+            )
+        )
+        self._db.commit()
+
+    async def _client(self):
+        return self._w3 or await get_async_web3()
+
+    def pay(self, provider: str, amount_usdc, provider_url: str | None = None) -> dict:
+        """Signs the next voucher to `provider` for `amount_usdc` more and returns it."""
+        channel = self.channels.get(provider)
+        if channel is None:
+            channel = self.channels[provider] = PaymentChannel(self._account.address, provider, provider_url)
+        voucher = channel.sign_next(self._account, usdc_to_micro(amount_usdc))
+        self._save(channel)
+        return voucher
+
+    def mark_accepted(self, provider: str, voucher: dict):
+        """Records that `provider` served the call `voucher` paid for, making its total settleable."""
+        channel = self.channels.get(provider)
+        if channel is None or channel.channel_id != voucher["channel_id"]:
+            return
+        if voucher["cumulative_amount"] > channel.accepted:
+            channel.accepted = voucher["cumulative_amount"]
+            self._save(channel)
+        self._ensure_settle_loop()
+
+    def void(self, provider: str, voucher: dict, amount_usdc):
+        """Un-bills a voucher `provider` rejected, so later vouchers don't pay for it again."""
+        channel = self.channels.get(provider)
+        if channel is None or channel.channel_id != voucher["channel_id"]:
+            return
+        if not channel.revert(voucher, usdc_to_micro(amount_usdc)):
+            print(f"[PAYMENT_CHANNEL] ⚠️ Rejected voucher #{voucher['nonce']} to {provider} is already covered by a later one")
+            return
+        self._save(channel)
+
+    def _ensure_settle_loop(self):
+        if self._settle_task is None or self._settle_task.done():
+            self._settle_task = asyncio.get_running_loop().create_task(self._settle_loop())
+
+    async def _settle_loop(self):
+        while True:
+            await asyncio.sleep(self.settle_interval)
+            try:
+                await self.settle()
+            except Exception as e:
+                print(f"[PAYMENT_CHANNEL] ❌ Settlement round failed: {e}")
+
+    async def settle(self, force: bool = False) -> list[dict]:
+        """
+        Pays every channel's accepted, unsettled balance on-chain. Without `force`, channels
+        owing less than `settle_threshold` keep accumulating until a later round.
+        A channel whose previous transfer is still unconfirmed is not paid again
+        until that transfer is known to be mined or dropped.
+        """
+        async with self._settle_lock:
+            w3 = await self._client()
+            settlements = []
+            for channel in self.channels.values():
+                if channel.pending is not None:
+                    settlement = await self._resolve_pending(w3, channel)
+                    if settlement:
+                        settlements.append(settlement)
+
+            due = [
+                (channel, channel.accepted, channel.payable)
+                for channel in self.channels.values()
+                if channel.pending is None and channel.payable > 0 and (force or channel.payable >= self.settle_threshold)
+            ]
+            if not due:
+                return settlements
+
+            nonces = get_nonce_manager(self._account.address, w3)
+            fee_fields = await self._fee_oracle.fee_fields()
+            sent, released, stale = [], False, False
+            async with nonces.submit_lock:
+                for channel, cumulative, owed in due:
+                    [nonce] = await nonces.allocate()
+                    tx = {
+                        'to': channel.provider,
+                        'value': owed * WEI_PER_MICRO_USDC,
+                        'gas': PLAIN_TRANSFER_GAS,
+                        'nonce': nonce,
+                        'chainId': SKALE_CHAIN_ID,
+                        **fee_fields
+                    }
+                    signed_tx = w3.eth.account.sign_transaction(tx, self._private_key)
+                    try:
+                        tx_hash = await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+                    except Exception as e:
+                        nonces.release(nonce)
+                        released, stale = True, stale or is_stale_nonce_error(e)
+                        print(f"[PAYMENT_CHANNEL] ❌ Settlement to {channel.provider} failed to send: {e}")
+                        continue
+                    nonces.mark_sent(nonce, w3.to_hex(tx_hash))
+                    channel.pending = {"tx_hash": w3.to_hex(tx_hash), "nonce": nonce, "cumulative": cumulative, "amount": owed}
+                    self._save(channel)
+                    sent.append((channel, nonce, tx_hash))
+            # Same recovery as X402SettlementTool: a stale sequence is resynced, and a nonce
+            # handed back below a later broadcast is filled so that transfer is not stuck behind it
+            if stale:
+                await nonces.sync()
+            elif released:
+                await nonces.fill_gaps(self._private_key, fee_fields)
+
+            for channel, nonce, tx_hash in sent:
+                try:
+                    receipt = await nonces.wait_mined(nonce, tx_hash, CHANNEL_RECEIPT_TIMEOUT)
+                except Exception as e:
+                    print(f"[PAYMENT_CHANNEL] ⏳ Settlement to {channel.provider} still unconfirmed, rechecking next round: {e}")
+                    continue
+                settlement = await self._finish(w3, channel, receipt)
+                if settlement:
+                    settlements.append(settlement)
+            return settlements
+
+    async def _resolve_pending(self, w3, channel: PaymentChannel) -> dict | None:
+        """Checks on a channel's unconfirmed settlement transfer; clears it once mined or dropped."""
+        pending = channel.pending
+        receipt = await self._receipt(w3, pending["tx_hash"])
+        if receipt is not None:
+            return await self._finish(w3, channel, receipt)
+        # Only pay again once the nonce went to another transaction and the node has forgotten this one
+        if await w3.eth.get_transaction_count(self._account.address) <= pending["nonce"] or await self._known(w3, pending["tx_hash"]):
+            return None
+        print(f"[PAYMENT_CHANNEL] ⚠️ Settlement {pending['tx_hash']} to {channel.provider} was dropped; paying again")
+        channel.pending = None
+        self._save(channel)
+        return None
+
+    @staticmethod
+    async def _receipt(w3, tx_hash: str):
+        try:
+            return await w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    @staticmethod
+    async def _known(w3, tx_hash: str) -> bool:
+        try:
+            return await w3.eth.get_transaction(tx_hash) is not None
+        except TransactionNotFound:
+            return False
+
+    async def _finish(self, w3, channel: PaymentChannel, receipt) -> dict | None:
+        """Advances `settled` for a mined settlement transfer and notifies the provider."""
+        pending, channel.pending = channel.pending, None
+        if receipt.get("status") != 1:
+            print(f"[PAYMENT_CHANNEL] ❌ Settlement to {channel.provider} reverted: {pending['tx_hash']}")
+            self._save(channel)
+            return None
+        channel.settled = max(channel.settled, pending["cumulative"])
+        self._save(channel)
+        settlement = {
+            "channel_id": channel.channel_id,
+            "provider": channel.provider,
+            "cumulative_amount": pending["cumulative"],
+            "amount": pending["amount"],
+            "tx_hash": pending["tx_hash"]
+        }
+        print(f"[PAYMENT_CHANNEL] ✅ Settled {pending['amount'] / 10 ** 6} USDC to {channel.provider}: {settlement['tx_hash']}")
+        if channel.provider_url:
+            await self._notify_provider(channel.provider_url, settlement)
+        return settlement
+
+    async def _notify_provider(self, provider_url: str, settlement: dict):
+        try:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                await client.post(f"{provider_url}/vouchers/settle", json=settlement)
+        except Exception as e:
+            # The provider can still find the transfer on-chain; the voucher total is what it is owed
+            print(f"[PAYMENT_CHANNEL] ⚠️ Could not notify {provider_url} of settlement: {e}")
+
+    def resume(self):
+        """Restarts the settlement loop for balances restored from a previous run."""
+        if any(channel.payable > 0 for channel in self.channels.values()):
+            self._ensure_settle_loop()
+
+    async def close(self):
+        """Stops the background loop and settles whatever is still owed."""
+        if self._settle_task is not None:
+            self._settle_task.cancel()
+            self._settle_task = None
+        return await self.settle(force=True)
+
+
+class ProviderLedger:
+    """
+    Provider-side bookkeeping: accepts vouchers that pay at least the call price and
+    records settlements once their transfer is confirmed on-chain.
+    """
+
+    def __init__(self, provider: str, chain_id: int = SKALE_CHAIN_ID, w3=None):
+        self.provider = provider
+        self.chain_id = chain_id
+        self._w3 = w3
+        self.channels: dict[str, dict] = {}
+        self._settlement_txs: set[str] = set()
+
+    def accept(self, voucher: dict, price: int) -> dict:
+        """Validates a voucher for one call costing `price` micro-USDC; raises ValueError if it does not pay."""
+        if voucher.get("provider", "").lower() != self.provider.lower():
+            raise ValueError("Voucher is addressed to a different provider")
+        signer = recover_voucher_signer(voucher, self.chain_id)
+        if signer.lower() != voucher["payer"].lower():
+            raise ValueError("Voucher signature does not match payer")
+
+        channel = self.channels.setdefault(voucher["channel_id"], {
+            "payer": signer, "cumulative_amount": 0, "nonce": 0, "settled_amount": 0, "settlements": []
+        })
+        if channel["payer"] != signer:
+            raise ValueError("Channel belongs to a different payer")
+        if voucher["nonce"] <= channel["nonce"]:
+            raise ValueError("Voucher nonce was already used")
+        if voucher["cumulative_amount"] - channel["cumulative_amount"] < price:
+            raise ValueError(f"Voucher adds less than the {price / 10 ** 6} USDC price")
+
+        channel["cumulative_amount"] = voucher["cumulative_amount"]
+        channel["nonce"] = voucher["nonce"]
+        channel["latest_voucher"] = voucher
+        return self.state(voucher["channel_id"])
+
+    async def record_settlement(self, settlement: dict) -> dict:
+        """
+        Credits a payer's settlement notice, but only for what its transfer provably paid:
+        the transaction must be mined successfully, sent by the channel's payer to this
+        provider, and carry at least the claimed amount. Raises ValueError otherwise.
+        """
+        channel = self.channels.get(settlement["channel_id"])
+        if channel is None:
+            raise ValueError("Unknown channel")
+        if settlement["cumulative_amount"] > channel["cumulative_amount"]:
+            raise ValueError("Settlement covers more than the vouchers received")
+        amount = int(settlement["amount"])
+        if amount <= 0:
+            raise ValueError("Settlement amount must be positive")
+        tx_hash = str(settlement["tx_hash"]).lower()
+        if len(tx_hash) != 66 or not tx_hash.startswith("0x"):
+            raise ValueError("Malformed settlement transaction hash")
+        if tx_hash in self._settlement_txs:
+            raise ValueError("Settlement transaction was already recorded")
+        # Claimed before the lookups so two concurrent notices for one transfer can't both count
+        self._settlement_txs.add(tx_hash)
+        try:
+            await self._verify_transfer(tx_hash, channel["payer"], amount)
+        except BaseException:
+            self._settlement_txs.discard(tx_hash)
+            raise
+
+        # A transfer can only settle what it paid, even if an earlier notice never arrived
+        credited = min(settlement["cumulative_amount"], channel["settled_amount"] + amount)
+        channel["settled_amount"] = max(channel["settled_amount"], credited)
+        channel["settlements"].append(tx_hash)
+        return self.state(settlement["channel_id"])
+
+    async def _verify_transfer(self, tx_hash: str, payer: str, amount: int):
+        w3 = self._w3 or await get_async_web3()
+        try:
+            receipt = await w3.eth.get_transaction_receipt(tx_hash)
+            tx = await w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            raise ValueError("Settlement transaction is not mined")
+        if receipt.get("status") != 1:
+            raise ValueError("Settlement transaction reverted")
+        if (tx.get("to") or "").lower() != self.provider.lower():
+            raise ValueError("Settlement transaction does not pay this provider")
+        if tx["from"].lower() != payer.lower():
+            raise ValueError("Settlement transaction was not sent by the channel payer")
+        if tx["value"] < amount * WEI_PER_MICRO_USDC:
+            raise ValueError("Settlement transaction pays less than the claimed amount")
+
+    def state(self, channel_id: str) -> dict:
+        channel = self.channels[channel_id]
+        return {
+            "channel_id": channel_id,
+            "payer": channel["payer"],
+            "cumulative_amount": channel["cumulative_amount"],
+            "settled_amount": channel["settled_amount"],
+            "unsettled_amount": channel["cumulative_amount"] - channel["settled_amount"],
+            "settlements": list(channel["settlements"])
+        }
+
+
+def encode_voucher_header(voucher: dict) -> str:
+    return json.dumps(voucher, separators=(",", ":"))
+
+
+_channel_manager: ChannelManager | None = None
+
+def get_channel_manager(w3=None) -> ChannelManager | None:
+    """Process-wide ChannelManager paying from SKALE_AGENT_PRIVATE_KEY, or None if no key is configured."""
+    global _channel_manager
+    if _channel_manager is None:
+        private_key = os.environ.get("SKALE_AGENT_PRIVATE_KEY")
+        if not private_key:
+            return None
+        _channel_manager = ChannelManager(private_key, w3)
+    return _channel_manager
+
+
+@asynccontextmanager
+async def channel_lifespan(app):
+    """
+    FastAPI lifespan: opens the pooled RPC client, resumes settling restored channels on
+    startup and settles every remainder on shutdown, before the RPC client is closed.
+    """
+    async with rpc_lifespan(app):
+        channels = get_channel_manager()
+        if channels is not None:
+            channels.resume()
+        yield
+        if channels is not None:
+            try:
+                await channels.close()
+            except Exception as e:
+                # The totals are persisted, so the next start picks the remainder up again
+                print(f"[PAYMENT_CHANNEL] ❌ Final settlement on shutdown failed: {e}")
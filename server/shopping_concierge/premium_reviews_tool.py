@@ -1,7 +1,96 @@
 from google.adk.tools.base_tool import BaseTool, ToolContext
-from typing import Any
-import os
+from typing import Any, Awaitable, Callable
+from collections import OrderedDict
+import asyncio
 import os
+import time
+import httpx
+
+from .payment_channel import VOUCHER_HEADER, encode_voucher_header, get_channel_manager
+
+# Seconds a paid review stays reusable before we pay for a fresh copy
+REVIEW_CACHE_TTL = float(os.getenv("REVIEW_CACHE_TTL", "3600"))
+# Products kept in memory; least recently used ones are dropped past this
+REVIEW_CACHE_MAX_ENTRIES = int(os.getenv("REVIEW_CACHE_MAX_ENTRIES", "512"))
+
+# Provider serving paid reviews, e.g. payment_server.py's http://localhost:8001. Unset = simulated data
+PREMIUM_REVIEWS_URL = os.getenv("PREMIUM_REVIEWS_URL", "")
+PREMIUM_REVIEWS_PROVIDER = os.getenv("PREMIUM_REVIEWS_PROVIDER", "0xFe5e03799Fe833D93e950d22406F9aD901Ff3Bb9")
+PREMIUM_REVIEWS_PRICE = "0.01"
+# Result fields describing the payment for one fetch; a cache hit did not make that payment
+PAYMENT_FIELDS = ("payment_voucher", "micro_payment_tx")
+
+
+def normalize_product_name(product_name: str) -> str:
+    return " ".join(str(product_name).split()).casefold()
+
+
+class _FetchAbandoned(Exception):
+    """The caller running a shared fetch was cancelled; a waiter should run it instead."""
+
+
+class ReviewCache:
+    """
+    TTL + LRU cache of paid review lookups, shared across sessions. Concurrent
+    requests for the same product share one in-flight fetch, so only one fee is paid.
+    """
+
+    def __init__(self, ttl: float = REVIEW_CACHE_TTL, max_entries: int = REVIEW_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[dict]]) -> tuple[dict, bool]:
+        """
+        Returns (reviews, cache_hit). Joining an in-flight fetch counts as a hit: no extra fee is paid.
+        If the caller running that fetch is cancelled, the first waiter to wake takes it over.
+        """
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[0] <= self.ttl:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], True
+        if entry:
+            del self._entries[key]
+
+        while (in_flight := self._in_flight.get(key)) is not None:
+            try:
+                reviews = await asyncio.shield(in_flight)
+            except _FetchAbandoned:
+                continue
+            self.hits += 1
+            return reviews, True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            reviews = await fetch()
+        except asyncio.CancelledError:
+            # Only this caller was cancelled; the others still want the reviews
+            future.set_exception(_FetchAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters see the failure; nobody else needs to retrieve it
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+        future.set_result(reviews)
+        self._entries[key] = (time.monotonic(), reviews)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return reviews, False
+
+
+review_cache = ReviewCache()
+
 
 class PremiumReviewsTool(BaseTool):
     def __init__(self):
@@ -12,21 +101,80 @@ class PremiumReviewsTool(BaseTool):
 
     async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
         product_name = args.get("product_name", "headphones")
-        
+
+        reviews, cache_hit = await review_cache.get_or_fetch(
+            normalize_product_name(product_name),
+            lambda: self._fetch_premium_reviews(product_name)
+        )
+        if not cache_hit:
+            return {**reviews, "cache_hit": False}
+
+        print(f"\n[PREMIUM_REVIEWS] ⚡ Cache hit for {product_name}, no fee paid.")
+        # The voucher or tx in the entry paid for whoever fetched it, not for this caller
+        reviews = {key: value for key, value in reviews.items() if key not in PAYMENT_FIELDS}
+        return {**reviews, "cache_hit": True, "agent_cost_incurred": "0.00 USDC", "payment": "cached"}
+
+    async def _fetch_premium_reviews(self, product_name: str) -> dict:
         print(f"\n[PREMIUM_REVIEWS] Requesting premium data for {product_name}...")
-        
+
+        channels = get_channel_manager()
+        if PREMIUM_REVIEWS_URL and channels is not None:
+            return await self._fetch_from_provider(channels, product_name)
+
         # 1. Encounter the 402 Error
-        print("[PREMIUM_REVIEWS] 🔴 HTTP 402 Payment Required: Endpoint costs 0.01 USDC")
-        
-        # 2. Agent Autonomously Pays (CDP code removed for SKALE migration)
+        print(f"[PREMIUM_REVIEWS] 🔴 HTTP 402 Payment Required: Endpoint costs {PREMIUM_REVIEWS_PRICE} USDC")
+
+        # 2. Agent Autonomously Pays. Simulated: with no provider to accept a voucher, none is
+        #    signed, so nothing is ever settled on-chain for this call
         tx_hash = "0xskale_micro_tx_mocked..." # Simulated for the hackathon demo
-        print(f"[PREMIUM_REVIEWS]  SKALE micro-transaction successful! Hash: {tx_hash}")
+        print(f"[PREMIUM_REVIEWS]  SKALE micro-transaction successful! Hash: {tx_hash}")
+        payment = {"micro_payment_tx": tx_hash}
 
         # 3. Return the gated data
+        insight = f"Audiophiles highly rate the {product_name} for superior active noise cancellation and build quality. Highly recommended."
         print("[PREMIUM_REVIEWS] 🔓 Unlocked premium data.")
+        return self._result(product_name, insight, payment)
+
+    async def _fetch_from_provider(self, channels, product_name: str) -> dict:
+        """
+        x402 round-trip against the provider: a voucher is only signed once it answers
+        402, and is taken back if the provider refuses it, so failed calls bill nothing.
+        """
+        url = f"{PREMIUM_REVIEWS_URL}/premium_reviews"
+        params = {"product_name": product_name}
+        payment = {}
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(url, params=params)
+            if response.status_code == 402:
+                print(f"[PREMIUM_REVIEWS] 🔴 HTTP 402 Payment Required: Endpoint costs {PREMIUM_REVIEWS_PRICE} USDC")
+                voucher = channels.pay(PREMIUM_REVIEWS_PROVIDER, PREMIUM_REVIEWS_PRICE, PREMIUM_REVIEWS_URL)
+                payment = self._payment_fields(voucher)
+                response = await client.get(url, params=params, headers={VOUCHER_HEADER: encode_voucher_header(voucher)})
+                if response.status_code == 200:
+                    channels.mark_accepted(PREMIUM_REVIEWS_PROVIDER, voucher)
+                elif response.status_code == 402:
+                    # Refused outright, so the provider will never count it; any other failure may
+                    # have come after it accepted the voucher, and taking it back would desync us
+                    channels.void(PREMIUM_REVIEWS_PROVIDER, voucher, PREMIUM_REVIEWS_PRICE)
+        if response.status_code != 200:
+            raise Exception(f"Premium reviews provider error {response.status_code}: {response.text}")
+        print("[PREMIUM_REVIEWS] 🔓 Unlocked premium data.")
+        return self._result(product_name, response.json()["premium_insight"], payment)
+
+    @staticmethod
+    def _payment_fields(voucher: dict) -> dict:
+        print(f"[PREMIUM_REVIEWS] 🧾 Signed voucher #{voucher['nonce']} (cumulative {voucher['cumulative_amount'] / 10 ** 6} USDC)")
+        return {"payment_voucher": {
+            "channel_id": voucher["channel_id"],
+            "nonce": voucher["nonce"],
+            "cumulative_amount": voucher["cumulative_amount"]
+        }}
+
+    @staticmethod
+    def _result(product_name: str, insight: str, payment: dict) -> dict:
         return {
             "product": product_name,
-            "premium_insight": f"Audiophiles highly rate the {product_name} for superior active noise cancellation and build quality. Highly recommended.",
-            "agent_cost_incurred": "0.01 USDC",
-            "micro_payment_tx": tx_hash
+            "premium_insight": insight,
+            "agent_cost_incurred": f"{PREMIUM_REVIEWS_PRICE} USDC" if payment else "0.00 USDC",
+            **payment
         }
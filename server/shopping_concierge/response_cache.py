@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from google.adk.models.llm_response import LlmResponse
+from google.genai.types import Content
+
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "response_cache.sqlite3")
+)
+# Entries kept on disk; least recently used ones are evicted past this
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+# Seconds a cached answer stays valid (prices and stock go stale)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(6 * 3600)))
+# Set RESPONSE_CACHE_ENABLED=0 to always call the model
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _content_key(content: Content) -> dict:
+    parts = []
+    for part in content.parts or []:
+        if part.text:
+            parts.append(_normalize(part.text))
+        elif part.function_call:
+            parts.append({"call": part.function_call.name, "args": part.function_call.args})
+        elif part.function_response:
+            # Tool results carry per-call data (vouchers, cache_hit flags) that never repeats;
+            # the model's answer that follows them already reflects what they said
+            parts.append({"response": part.function_response.name})
+    return {"role": content.role, "parts": parts}
+
+
+def _before_tool_calls(contents: list[Content]) -> list[Content]:
+    """The conversation up to the latest user message, without this turn's own tool calls and results."""
+    for index in range(len(contents) - 1, -1, -1):
+        content = contents[index]
+        if content.role == "user" and any(part.text for part in content.parts or []):
+            return contents[:index + 1]
+    return contents
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of final text responses from LlmAgents, persisted in SQLite so it
+    survives restarts. Hooked in through before/after_model_callback: a hit returns the
+    stored response and ADK skips the model call entirely.
+    """
+
+    def __init__(
+        self,
+        path: str = RESPONSE_CACHE_PATH,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[str, str], str] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, agent TEXT, content TEXT, created_at REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    def key_for(self, agent_name: str, llm_request, state_values: dict) -> str:
+        """
+        Hash of everything that shapes the answer: model, instruction, normalized conversation, relevant state.
+        The conversation is taken as it stood before this turn's tool calls, so the request
+        that follows a tool round-trip stores its answer under the key the next identical
+        turn looks up first.
+        """
+        config = llm_request.config
+        payload = {
+            "agent": agent_name,
+            "model": llm_request.model,
+            "instruction": _normalize(str(config.system_instruction)) if config and config.system_instruction else "",
+            "contents": [_content_key(content) for content in _before_tool_calls(llm_request.contents)],
+            "state": state_values
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str) -> Content | None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl:
+                self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                self.hits += 1
+                return Content.model_validate_json(row[0])
+            if row:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, key: str, agent_name: str, content: Content):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, agent, content, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, agent_name, content.model_dump_json(exclude_none=True), now, now)
+            )
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            overflow = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl
+        }
+
+    def callbacks(self, state_keys: tuple[str, ...] = ()):
+        """
+        (before_model_callback, after_model_callback, on_model_error_callback) for an LlmAgent;
+        `state_keys` are folded into the cache key.
+        """
+
+        def before_model_callback(callback_context, llm_request):
+            if not RESPONSE_CACHE_ENABLED:
+                return None
+            state_values = {key: callback_context.state.get(key) for key in state_keys}
+            key = self.key_for(callback_context.agent_name, llm_request, state_values)
+            content = self.get(key)
+            if content is not None:
+                print(f"[RESPONSE_CACHE] ⚡ Hit for {callback_context.agent_name} ({self.hits} hits / {self.misses} misses)")
+                return LlmResponse(content=content)
+            self._pending[(callback_context.invocation_id, callback_context.agent_name)] = key
+            return None
+
+        def after_model_callback(callback_context, llm_response):
+            if llm_response.partial:
+                return None
+            key = self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+            content = llm_response.content
+            if not key or llm_response.error_code or not content or not content.parts:
+                return None
+            # Only final text answers are replayable; tool calls must actually run
+            parts = [part for part in content.parts if not part.thought]
+            if parts and all(part.text for part in parts):
+                self.put(key, callback_context.agent_name, Content(role=content.role, parts=parts))
+            return None
+
+        def on_model_error_callback(callback_context, llm_request, error):
+            # after_model_callback never runs for a failed call, so drop its pending key here
+            self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+            return None
+
+        return before_model_callback, after_model_callback, on_model_error_callback
+
+
+response_cache = ResponseCache()
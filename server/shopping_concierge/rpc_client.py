@@ -0,0 +1,68 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from web3 import AsyncWeb3
+from web3.providers.rpc import AsyncHTTPProvider
+
+SKALE_RPC_URL = os.getenv("SKALE_RPC_URL", "https://base-sepolia-testnet.skalenodes.com/v1/jubilant-horrible-ancha")
+SKALE_CHAIN_ID = 324705682
+
+# Keep-alive pool shared by every settlement, balance and BITE call in the process
+RPC_POOL_SIZE = int(os.getenv("SKALE_RPC_POOL_SIZE", "32"))
+RPC_TIMEOUT = float(os.getenv("SKALE_RPC_TIMEOUT", "30"))
+
+_async_web3: AsyncWeb3 | None = None
+_pooled_loop_id: int | None = None
+
+async def get_async_web3() -> AsyncWeb3:
+    """
+    Returns the process-wide AsyncWeb3 client for the SKALE RPC.
+
+    The client is built once, on first use, over a pooled keep-alive aiohttp
+    session so concurrent checkouts reuse warm TCP/TLS connections instead of
+    opening a fresh one (plus an is_connected() probe) per request. web3 keys
+    its sessions by event loop, so a new loop gets its own pooled session and
+    the previous loop's one is closed.
+    """
+    global _async_web3, _pooled_loop_id
+    if _async_web3 is None:
+        # web3's tx validation asks for eth_chainId on every send/estimate; it never changes
+        _async_web3 = AsyncWeb3(AsyncHTTPProvider(
+            SKALE_RPC_URL, cache_allowed_requests=True, cacheable_requests={"eth_chainId"}
+        ))
+    loop_id = id(asyncio.get_running_loop())
+    if _pooled_loop_id != loop_id:
+        if _pooled_loop_id is not None:
+            await _close_sessions(_async_web3)
+        _pooled_loop_id = loop_id
+        await _async_web3.provider.cache_async_session(ClientSession(
+            raise_for_status=True,
+            connector=TCPConnector(limit=RPC_POOL_SIZE, keepalive_timeout=60),
+            timeout=ClientTimeout(total=RPC_TIMEOUT)
+        ))
+    return _async_web3
+
+async def _close_sessions(w3: AsyncWeb3):
+    """Closes every pooled session, including ones whose event loop has already finished."""
+    try:
+        await w3.provider.disconnect()
+    except Exception as e:
+        print(f"[RPC] ⚠️ Could not close a pooled RPC session cleanly: {e}")
+
+async def close_async_web3():
+    """Closes the pooled sessions. The next get_async_web3() call builds a fresh client."""
+    global _async_web3, _pooled_loop_id
+    if _async_web3 is not None:
+        await _close_sessions(_async_web3)
+        _async_web3 = None
+        _pooled_loop_id = None
+
+@asynccontextmanager
+async def rpc_lifespan(app):
+    """FastAPI lifespan: opens the pooled RPC client on startup and closes it on shutdown."""
+    await get_async_web3()
+    try:
+        yield
+    finally:
+        await close_async_web3()
@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from google.adk.events import Event, EventActions
+from google.adk.events.event_actions import EventCompaction
+from google.genai.types import Content, Part
+
+from .context_compactor import SUMMARY_LABELS, summarize_state
+
+# Sessions longer than this many events get compacted...
+SESSION_COMPACT_AFTER = int(os.getenv("SESSION_COMPACT_AFTER", "40"))
+# ...down to roughly this many recent events (the cut moves to the nearest user turn, or back
+# to the nearest event that does not answer a function call)
+SESSION_KEEP_EVENTS = int(os.getenv("SESSION_KEEP_EVENTS", "20"))
+# Sessions touched more recently than this are left alone so a live turn is never raced
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "300"))
+# Whole sessions untouched for this many days are deleted; 0 keeps them forever
+SESSION_RETENTION_DAYS = float(os.getenv("SESSION_RETENTION_DAYS", "0"))
+# Seconds between background compaction passes
+SESSION_COMPACT_INTERVAL = float(os.getenv("SESSION_COMPACT_INTERVAL", "600"))
+# Longest excerpt of the removed user messages kept when state has nothing to summarize
+SESSION_SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "2500"))
+
+
+class CompactionPolicy:
+    """How much history a session keeps once it is compacted."""
+
+    def __init__(
+        self,
+        compact_after: int = SESSION_COMPACT_AFTER,
+        keep_events: int = SESSION_KEEP_EVENTS,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+        retention_days: float = SESSION_RETENTION_DAYS
+    ):
+        self.compact_after = compact_after
+        self.keep_events = keep_events
+        self.idle_seconds = idle_seconds
+        self.retention_days = retention_days
+
+
+def session_db_path(agents_dir: str, app_name: str = "shopping_concierge") -> str:
+    """Where ADK's default SQLite session service keeps an app's sessions."""
+    return os.path.join(agents_dir, app_name, ".adk", "session.db")
+
+
+def _is_summary(event: dict) -> bool:
+    return bool((event.get("actions") or {}).get("compaction"))
+
+
+def _answers_call(event: dict) -> bool:
+    return any("function_response" in part for part in (event.get("content") or {}).get("parts") or [])
+
+
+def _tail_start(events: list[dict], keep_events: int) -> int | None:
+    """
+    Index of the first event to keep. The tail starts on a user message in the last
+    `keep_events` when there is one. Tool-heavy turns often have none, so otherwise
+    the cut walks back to the nearest event that is not a function response, which
+    keeps every call next to its response.
+    """
+    if len(events) <= keep_events:
+        return None
+    first = max(len(events) - keep_events, 1)
+    for index in range(first, len(events)):
+        if events[index].get("author") == "user" and not _is_summary(events[index]):
+            return index
+    for index in range(first, 0, -1):
+        if not _answers_call(events[index]):
+            return index
+    return None
+
+
+def _user_text(event: dict) -> str:
+    if event.get("author") != "user" or _is_summary(event):
+        return ""
+    return " ".join(part.get("text", "") for part in (event.get("content") or {}).get("parts") or []).strip()
+
+
+def _summary_event(state: dict, folded: list[tuple]) -> Event:
+    """
+    An ADK compaction event standing in for the removed events. When ADK builds a
+    prompt it shows compacted_content in place of the range it covers, so agents
+    still see the plan, list and mandate those turns produced.
+    """
+    text = summarize_state(state, tuple(SUMMARY_LABELS))
+    if text is None:
+        requests = "\n".join(filter(None, (_user_text(json.loads(row[2])) for row in folded)))
+        text = "[Summary of the earlier conversation]\nEarlier user messages:\n" + requests[-SESSION_SUMMARY_CHARS:]
+    # Stamped at the end of the range it covers, so it sorts just before the kept tail
+    return Event(
+        author="user",
+        invocation_id=Event.new_id(),
+        timestamp=folded[-1][1],
+        actions=EventActions(compaction=EventCompaction(
+            start_timestamp=folded[0][1],
+            end_timestamp=folded[-1][1],
+            compacted_content=Content(role="model", parts=[Part(text=text)])
+        ))
+    )
+
+
+def compact_session_db(db_path: str, policy: CompactionPolicy | None = None) -> dict:
+    """
+    One compaction pass over an ADK SQLite session database.
+
+    For each idle session past `compact_after` events, every event before the kept
+    tail is replaced by one ADK compaction event whose summary is built from session
+    state (plan, discovery data, CartMandate), falling back to the removed user
+    messages. Sessions past the retention window are dropped entirely. The sessions
+    table is never written, so a loaded session is not marked stale, and a pass with
+    nothing to do leaves the file untouched.
+    """
+    policy = policy or CompactionPolicy()
+    stats = {"sessions_compacted": 0, "events_removed": 0, "sessions_expired": 0, "bytes_before": 0, "bytes_after": 0}
+    if not os.path.exists(db_path):
+        return stats
+    stats["bytes_before"] = os.path.getsize(db_path)
+    now = time.time()
+
+    db = sqlite3.connect(db_path, timeout=30)
+    try:
+        if policy.retention_days > 0:
+            cutoff = now - policy.retention_days * 86400
+            expired = db.execute(
+                "SELECT app_name, user_id, id FROM sessions WHERE update_time < ?", (cutoff,)
+            ).fetchall()
+            for key in expired:
+                db.execute("DELETE FROM events WHERE app_name=? AND user_id=? AND session_id=?", key)
+                db.execute("DELETE FROM sessions WHERE app_name=? AND user_id=? AND id=?", key)
+            stats["sessions_expired"] = len(expired)
+
+        candidates = db.execute(
+            "SELECT s.app_name, s.user_id, s.id FROM sessions s "
+            "JOIN events e ON e.app_name = s.app_name AND e.user_id = s.user_id AND e.session_id = s.id "
+            "WHERE s.update_time < ? GROUP BY s.app_name, s.user_id, s.id HAVING COUNT(*) > ?",
+            (now - policy.idle_seconds, policy.compact_after)
+        ).fetchall()
+        for app_name, user_id, session_id in candidates:
+            rows = db.execute(
+                "SELECT rowid, timestamp, event_data FROM events WHERE app_name=? AND user_id=? AND session_id=? "
+                "ORDER BY timestamp, rowid",
+                (app_name, user_id, session_id)
+            ).fetchall()
+            start = _tail_start([json.loads(row[2]) for row in rows], policy.keep_events)
+            if start is None:
+                continue
+            folded = rows[:start]
+            (state,) = db.execute(
+                "SELECT state FROM sessions WHERE app_name=? AND user_id=? AND id=?", (app_name, user_id, session_id)
+            ).fetchone()
+            summary = _summary_event(json.loads(state), folded)
+            db.executemany("DELETE FROM events WHERE rowid = ?", [(row[0],) for row in folded])
+            db.execute(
+                "INSERT INTO events (id, app_name, user_id, session_id, invocation_id, timestamp, event_data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (summary.id, app_name, user_id, session_id, summary.invocation_id, summary.timestamp,
+                 summary.model_dump_json(exclude_none=True))
+            )
+            stats["sessions_compacted"] += 1
+            stats["events_removed"] += len(folded)
+        db.commit()
+
+        if stats["events_removed"] or stats["sessions_expired"]:
+            db.execute("VACUUM")
+    finally:
+        db.close()
+
+    stats["bytes_after"] = os.path.getsize(db_path)
+    return stats
+
+
+def start_compaction_thread(
+    db_path: str,
+    policy: CompactionPolicy | None = None,
+    interval: float = SESSION_COMPACT_INTERVAL
+) -> threading.Thread:
+    """Runs compact_session_db every `interval` seconds on a daemon thread."""
+
+    def loop():
+        while True:
+            try:
+                stats = compact_session_db(db_path, policy)
+                if stats["events_removed"] or stats["sessions_expired"]:
+                    print(f"[SESSION_COMPACTION] {db_path}: {stats}")
+            except Exception as e:
+                print(f"[SESSION_COMPACTION] ❌ Pass over {db_path} failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="session-compaction", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # python -m shopping_concierge.session_compaction [session.db ...]
+    paths = sys.argv[1:] or [session_db_path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))]
+    for path in paths:
+        print(f"{path}: {compact_session_db(path)}")
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+
+from google.adk.sessions.base_session_service import BaseSessionService
+
+# Seconds a cached latest-session id is trusted before one listing checks for newer
+# sessions created behind the directory's back (e.g. by another process on a shared store)
+SESSION_DIRECTORY_TTL = float(os.getenv("SESSION_DIRECTORY_TTL", "5"))
+
+
+class RecordingSessionService(BaseSessionService):
+    """Delegates to `inner` and keeps `directory` current with every session created, updated or deleted through it."""
+
+    def __init__(self, inner: BaseSessionService, directory: "SessionDirectory"):
+        self.inner = inner
+        self.directory = directory
+
+    async def create_session(self, **kwargs):
+        session = await self.inner.create_session(**kwargs)
+        self.directory.record(session)
+        return session
+
+    async def get_session(self, **kwargs):
+        return await self.inner.get_session(**kwargs)
+
+    async def list_sessions(self, **kwargs):
+        return await self.inner.list_sessions(**kwargs)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str):
+        await self.inner.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self.directory.forget(app_name, user_id, session_id)
+
+    async def append_event(self, session, event):
+        event = await self.inner.append_event(session, event)
+        # The session just written to is now its user's most recently updated one
+        self.directory.record(session)
+        return event
+
+    async def get_user_state(self, **kwargs):
+        return await self.inner.get_user_state(**kwargs)
+
+    async def flush(self):
+        await self.inner.flush()
+
+
+class SessionDirectory:
+    """
+    (app_name, user_id) -> most recent session id, kept next to a session service.
+
+    get_or_create_session used to list every session a user owns on each call and
+    take whichever came back first. The directory answers from a dict, falls back to
+    a single listing the first time it sees a user (picking the most recently
+    updated session, so the answer is deterministic), and is kept current by
+    `session_service`, which records every session created or written through it.
+    Sessions created around that wrapper are picked up once the cached id is older
+    than `ttl`: the next lookup lists the user's sessions and compares
+    last_update_time before trusting it again.
+    """
+
+    def __init__(self, session_service: BaseSessionService, ttl: float = SESSION_DIRECTORY_TTL):
+        self.session_service = RecordingSessionService(session_service, self)
+        self.ttl = ttl
+        # (app_name, user_id) -> (session id, monotonic time it was last known to be the latest)
+        self._latest: dict[tuple[str, str], tuple[str, float]] = {}
+        # (app_name, user_id) -> [lock, callers holding or waiting on it]; dropped once idle
+        self._locks: dict[tuple[str, str], list] = {}
+
+    def record(self, session):
+        """Marks `session` as its user's current one."""
+        self._latest[(session.app_name, session.user_id)] = (session.id, time.monotonic())
+
+    def forget(self, app_name: str, user_id: str, session_id: str | None = None):
+        """Drops the user's entry (only if it still points at `session_id`, when given)."""
+        cached = self._latest.get((app_name, user_id))
+        if cached is not None and (session_id is None or cached[0] == session_id):
+            del self._latest[(app_name, user_id)]
+
+    async def _cold_lookup(self, app_name: str, user_id: str) -> str | None:
+        response = await self.session_service.list_sessions(app_name=app_name, user_id=user_id)
+        if not response.sessions:
+            return None
+        return max(response.sessions, key=lambda session: session.last_update_time).id
+
+    async def latest(self, app_name: str, user_id: str):
+        """The user's most recent session, or None if they have none."""
+        key = (app_name, user_id)
+        cached = self._latest.get(key)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl:
+            session_id = cached[0]
+        else:
+            session_id = await self._cold_lookup(app_name, user_id)
+            if session_id is None:
+                self.forget(app_name, user_id)
+                return None
+        session = await self.session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if session is None:
+            # Deleted behind our back; rebuild this user's entry from the store
+            self.forget(app_name, user_id)
+            session_id = await self._cold_lookup(app_name, user_id)
+            if session_id is None:
+                return None
+            session = await self.session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if session is not None:
+            self.record(session)
+        return session
+
+    async def get_or_create(self, app_name: str, user_id: str):
+        # Per-user lock so two first requests from the same user do not create two sessions
+        key = (app_name, user_id)
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                session = await self.latest(app_name, user_id)
+                if session is None:
+                    session = await self.session_service.create_session(app_name=app_name, user_id=user_id)
+                return session
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
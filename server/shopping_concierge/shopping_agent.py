@@ -2,9 +2,12 @@ from google.adk.agents import LlmAgent
 from google.adk.tools.google_search_tool import GoogleSearchTool
 from .premium_reviews_tool import PremiumReviewsTool
 from .vault_agent import vault_agent
+from .response_cache import response_cache
+from .context_compactor import ContextCompactor
 
 class ShoppingAgent:
     def __init__(self):
+        before_model_callback, after_model_callback, on_model_error_callback = response_cache.callbacks(state_keys=("project_plan",))
         self.llm_agent = LlmAgent(
             name="ShoppingAgent",
             model="gemini-2.5-flash",
@@ -27,7 +30,13 @@ class ShoppingAgent:
             If the user says "Approve", "Yes", "Looks good", YOU MUST SILENTLY PASS IT ALONG. Do not generate a plan.
             """,
             tools=[PremiumReviewsTool(), GoogleSearchTool()],
-            output_key="discovery_data"
+            output_key="discovery_data",
+            before_model_callback=[
+                ContextCompactor(("project_plan", "discovery_data")).before_model_callback,
+                before_model_callback
+            ],
+            after_model_callback=after_model_callback,
+            on_model_error_callback=on_model_error_callback
         )
 
     def process_intent(self, user_intent: dict) -> dict:
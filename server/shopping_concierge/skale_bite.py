@@ -1,44 +1,186 @@
-
+import asyncio
+import os
+import threading
+import time
 import requests
 from typing import Any
+from .rpc_client import SKALE_RPC_URL, RPC_TIMEOUT, get_async_web3
+from . import bite_engine
+
+# A cached committee key older than this is refreshed in the background while it keeps being used...
+BITE_KEY_REFRESH = float(os.getenv("BITE_KEY_REFRESH", "60"))
+# ...and one older than this is never used; the caller waits for a fresh lookup
+BITE_KEY_MAX_AGE = float(os.getenv("BITE_KEY_MAX_AGE", "600"))
+
+
+class CommitteeKey:
+    """The committee BLS public key for one epoch, as returned by bite_getCommitteesInfo."""
+
+    def __init__(self, public_key: str, epoch: int, fetched_at: float):
+        self.public_key = public_key
+        self.epoch = epoch
+        self.fetched_at = fetched_at
+        self._point = None
+
+    @classmethod
+    def from_response(cls, response: dict) -> "CommitteeKey":
+        committee = response['result'][0]
+        return cls(committee['commonBLSPublicKey'], int(committee.get('epochId', 0)), time.monotonic())
+
+    @property
+    def point(self):
+        """The key as a G2 point, parsed once per epoch."""
+        if self._point is None:
+            self._point = bite_engine.parse_committee_key(self.public_key)
+        return self._point
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
 
 class SkaleBite:
-    def __init__(self, rpc_url: str):
+    """
+    BITE encryption against the chain's current committee key.
+
+    The key only changes when the committee rotates, so it is cached per epoch:
+    encrypting costs no round-trip while the cached key is younger than
+    `refresh_after`. Past that the cached key is still used and a refresh runs in
+    the background; only a key older than `max_age` (or none at all) makes the
+    caller wait for bite_getCommitteesInfo.
+    """
+
+    def __init__(self, rpc_url: str, w3=None, refresh_after: float = BITE_KEY_REFRESH, max_age: float = BITE_KEY_MAX_AGE):
         self.rpc_url = rpc_url
+        # Async callers go through the injected client, or the shared pooled one
+        self._w3 = w3
+        self.refresh_after = refresh_after
+        self.max_age = max_age
+        self._key: CommitteeKey | None = None
+        self._lock = asyncio.Lock()
+        # Held on self: the event loop only keeps a weak reference to the tasks it runs
+        self._refresh_task: asyncio.Task | None = None
+        self._refresh_thread: threading.Thread | None = None
+        self.fetches = 0
 
-    def get_public_key(self) -> str:
-        """Fetches the current BLS Public Key from the BITE-enabled SKALE chain."""
+    def _store(self, key: CommitteeKey) -> CommitteeKey:
+        if self._key is not None and key.epoch != self._key.epoch:
+            print(f"[BITE] 🔑 Committee rotated: epoch {self._key.epoch} -> {key.epoch}")
+        self._key = key
+        self.fetches += 1
+        return key
+
+    def _usable(self) -> CommitteeKey | None:
+        if self._key is not None and self._key.age < self.max_age:
+            return self._key
+        return None
+
+    def _fetch_committee_key(self) -> CommitteeKey:
         payload = {
             "jsonrpc": "2.0",
             "method": "bite_getCommitteesInfo",
             "params": [],
             "id": 1
         }
-        response = requests.post(self.rpc_url, json=payload).json()
-        return response['result'][0]['commonBLSPublicKey']
+        response = requests.post(self.rpc_url, json=payload, timeout=RPC_TIMEOUT).json()
+        return self._store(CommitteeKey.from_response(response))
+
+    async def _fetch_committee_key_async(self) -> CommitteeKey:
+        w3 = self._w3 or await get_async_web3()
+        response = await w3.provider.make_request("bite_getCommitteesInfo", [])
+        return self._store(CommitteeKey.from_response(response))
+
+    def _refresh_in_background(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+
+        async def refresh_async():
+            try:
+                await self._fetch_committee_key_async()
+            except Exception as e:
+                print(f"[BITE] ⚠️ Background key refresh failed, keeping epoch {self._key.epoch}: {e}")
+
+        def refresh_sync():
+            try:
+                self._fetch_committee_key()
+            except Exception as e:
+                print(f"[BITE] ⚠️ Background key refresh failed, keeping epoch {self._key.epoch}: {e}")
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._refresh_thread = threading.Thread(target=refresh_sync, name="bite-key-refresh", daemon=True)
+            self._refresh_thread.start()
+        else:
+            self._refresh_task = loop.create_task(refresh_async())
+
+    def committee_key(self) -> CommitteeKey:
+        """Cached committee key; blocks on the RPC only when there is no usable one."""
+        key = self._usable()
+        if key is None:
+            return self._fetch_committee_key()
+        if key.age >= self.refresh_after:
+            self._refresh_in_background()
+        return key
+
+    async def committee_key_async(self) -> CommitteeKey:
+        key = self._usable()
+        if key is None:
+            async with self._lock:
+                # Another caller may have fetched while we waited on the lock
+                return self._usable() or await self._fetch_committee_key_async()
+        if key.age >= self.refresh_after:
+            self._refresh_in_background()
+        return key
+
+    def get_public_key(self) -> str:
+        """Fetches the current BLS Public Key from the BITE-enabled SKALE chain."""
+        return self.committee_key().public_key
+
+    async def get_public_key_async(self) -> str:
+        """Same lookup as get_public_key(), over the pooled async JSON-RPC client."""
+        return (await self.committee_key_async()).public_key
 
     def encrypt(self, data: Any) -> dict:
         """
-        Encrypts data using BITE threshold encryption logic.
-        Note: Actual encryption often requires RLP encoding and AES-GCM wrapping 
-        of the plaintext, followed by BLS encryption of the AES key.
+        Encrypts data using BITE threshold encryption logic: the value is AES-GCM
+        encrypted under a fresh key that is encapsulated to the committee key
+        (see bite_engine.seal).
         """
-        public_key = self.get_public_key()
-        # PROD: Use py_ecc or skale.py for real BLS encryption
+        return self._wrap({"value": data}, self.committee_key())
+
+    async def encrypt_async(self, data: Any) -> dict:
+        """Non-blocking encrypt() for callers already on the event loop."""
+        key = await self.committee_key_async()
+        return await asyncio.to_thread(self._wrap, {"value": data}, key)
+
+    async def encrypt_many(self, fields: dict[str, Any]) -> dict:
+        """
+        Encrypts every value of `fields` into one envelope: one committee key lookup
+        and one key encapsulation however many fields there are.
+        """
+        key = await self.committee_key_async()
+        return await asyncio.to_thread(self._wrap, fields, key)
+
+    def _wrap(self, fields: dict[str, Any], key: CommitteeKey) -> dict:
+        envelope = bite_engine.seal(fields, key.point, key.epoch)
         return {
             "encrypted": True,
-            "ciphertext": f"BITE_V2_ENCRYPTED_{data}",
-            "epoch": 1,
-            "pubkey_used": public_key
+            "ciphertext": "0x" + envelope.hex(),
+            "fields": list(fields),
+            "epoch": key.epoch,
+            "pubkey_used": key.public_key
         }
 
     def decrypt_request(self, ciphertext: str) -> str:
         """
-        In BITE v2, decryption is typically triggered by sending the ciphertext 
+        In BITE v2, decryption is typically triggered by sending the ciphertext
         to a 'Decryptor' smart contract on-chain.
         """
         # Logic to send a transaction to the BITE magic address or Decryptor contract
         return "Decryption task submitted to SKALE Committee"
 
 # Initialize with your SKALE RPC endpoint
-skale_bite = SkaleBite("https://base-sepolia-testnet.skalenodes.com/v1/jubilant-horrible-ancha")
+skale_bite = SkaleBite(SKALE_RPC_URL)
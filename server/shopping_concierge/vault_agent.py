@@ -1,5 +1,6 @@
 from google.adk.agents import LlmAgent
 from .skale_bite import skale_bite
+from .context_compactor import ContextCompactor
 
 class VaultAgent:
    def __init__(self, llm_agent):
@@ -28,6 +29,7 @@ vault_agent = VaultAgent(
          - If the input contains a JSON block with "merchants", output a message asking the user to "Please sign the EIP-712 payload via MetaMask to authorize this batch transaction."
          - Otherwise, just repeat the input text exactly as received without adding any commentary.
       """,
-      output_key="payment_mandate"
+      output_key="payment_mandate",
+      before_model_callback=ContextCompactor(("cart_mandate_data",)).before_model_callback
    )
 )
\ No newline at end of file
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from .rpc_client import SKALE_CHAIN_ID, get_async_web3
+from .nonce_manager import NonceManager, get_nonce_manager
+
+# Cached balances older than this are re-read before a wallet is picked
+BALANCE_TTL = float(os.getenv("WALLET_BALANCE_TTL", "15"))
+# A wallet holding less than this share of the pool average is topped back up to the average
+REBALANCE_THRESHOLD = 0.5
+# Seconds to wait for a top-up transfer to be mined before giving up on it
+REBALANCE_RECEIPT_TIMEOUT = float(os.getenv("WALLET_REBALANCE_TIMEOUT", "120"))
+
+class AgentWallet:
+    """One hot-wallet signer in the pool, with its own nonce stream and balance bookkeeping."""
+
+    def __init__(self, private_key: str, nonces: NonceManager):
+        self.private_key = private_key
+        self.nonces = nonces
+        self.address = nonces.address
+        self.balance: int | None = None
+        self.balance_read_at = 0.0
+        # Value promised to settlements that are still running on this wallet
+        self.reserved = 0
+        self.active = 0
+
+    @property
+    def available(self) -> int:
+        return (self.balance or 0) - self.reserved
+
+    @property
+    def load(self) -> int:
+        return self.active + self.nonces.in_flight
+
+
+class WalletPool:
+    """
+    Spreads settlements over several agent signer accounts.
+
+    One key means one sequential nonce stream, which caps settlement throughput
+    no matter how fast the chain is. The pool schedules each batch onto the
+    least-loaded wallet that can cover it, tracks balances, and moves funds
+    from the richest wallet to any that run low.
+    """
+
+    def __init__(self, private_keys: list[str], w3=None):
+        if not private_keys:
+            raise Exception("Missing SKALE_AGENT_PRIVATE_KEY in .env")
+        self._w3 = w3
+        self.wallets = []
+        for private_key in private_keys:
+            address = self._account(private_key).address
+            self.wallets.append(AgentWallet(private_key, get_nonce_manager(address, w3)))
+        self._lock = asyncio.Lock()
+        self._rebalance_task: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls, w3=None) -> "WalletPool":
+        """Reads the comma-separated SKALE_AGENT_PRIVATE_KEYS, falling back to SKALE_AGENT_PRIVATE_KEY."""
+        keys = os.environ.get("SKALE_AGENT_PRIVATE_KEYS") or os.environ.get("SKALE_AGENT_PRIVATE_KEY") or ""
+        return cls([key.strip() for key in keys.split(",") if key.strip()], w3)
+
+    @staticmethod
+    def _account(private_key: str):
+        from eth_account import Account
+        return Account.from_key(private_key)
+
+    async def _client(self):
+        return self._w3 or await get_async_web3()
+
+    async def refresh_balances(self, max_age: float = 0.0):
+        """Re-reads every balance older than `max_age` seconds, concurrently."""
+        w3 = await self._client()
+        now = time.monotonic()
+        stale = [wallet for wallet in self.wallets if now - wallet.balance_read_at >= max_age]
+        balances = await asyncio.gather(*(w3.eth.get_balance(wallet.address) for wallet in stale))
+        for wallet, balance in zip(stale, balances):
+            wallet.balance = balance
+            wallet.balance_read_at = now
+
+    @asynccontextmanager
+    async def acquire(self, required_value: int):
+        """
+        Reserves the least-loaded wallet whose unreserved balance covers `required_value`
+        for the duration of one settlement.
+        """
+        async with self._lock:
+            await self.refresh_balances(max_age=BALANCE_TTL)
+            candidates = [wallet for wallet in self.wallets if wallet.available >= required_value]
+            if not candidates:
+                richest = max(self.wallets, key=lambda wallet: wallet.available)
+                raise Exception(
+                    f"No agent wallet can cover {required_value} wei "
+                    f"(largest unreserved balance is {richest.available} at {richest.address})"
+                )
+            wallet = min(candidates, key=lambda wallet: (wallet.load, -wallet.available))
+            wallet.reserved += required_value
+            wallet.active += 1
+
+        try:
+            yield wallet
+        finally:
+            wallet.reserved -= required_value
+            wallet.active -= 1
+            # The spend is not known exactly until the balance is re-read
+            wallet.balance_read_at = 0.0
+
+    def schedule_rebalance(self, fee_fields: dict):
+        """Starts a background rebalance unless one is already running."""
+        if len(self.wallets) > 1 and (self._rebalance_task is None or self._rebalance_task.done()):
+            self._rebalance_task = asyncio.create_task(self.rebalance(fee_fields))
+
+    async def rebalance(self, fee_fields: dict) -> list[str]:
+        """
+        Tops every wallet below REBALANCE_THRESHOLD of the pool average back up to the
+        average, paid from whichever wallet currently has the most to spare.
+        """
+        await self.refresh_balances()
+        average = sum(wallet.available for wallet in self.wallets) // len(self.wallets)
+        w3 = await self._client()
+        tx_hashes = []
+        for wallet in self.wallets:
+            if wallet.available >= average * REBALANCE_THRESHOLD:
+                continue
+            donor = max(self.wallets, key=lambda candidate: candidate.available)
+            amount = average - wallet.available
+            if donor is wallet or donor.available - amount < average:
+                continue
+
+            async with donor.nonces.submit_lock:
+                [nonce] = await donor.nonces.allocate()
+                tx = {
+                    'to': wallet.address,
+                    'value': amount,
+                    'gas': 21000,
+                    'nonce': nonce,
+                    'chainId': SKALE_CHAIN_ID,
+                    **fee_fields
+                }
+                signed_tx = w3.eth.account.sign_transaction(tx, donor.private_key)
+                try:
+                    tx_hash = w3.to_hex(await w3.eth.send_raw_transaction(signed_tx.raw_transaction))
+                except Exception as e:
+                    donor.nonces.release(nonce)
+                    print(f"[WALLET_POOL] ❌ Rebalance {donor.address} -> {wallet.address} failed: {e}")
+                    continue
+                donor.nonces.mark_sent(nonce, tx_hash)
+            donor.balance -= amount
+            wallet.balance += amount
+            # Confirming the top-up clears it from the donor's in_flight, which feeds its scheduling load
+            try:
+                receipt = await donor.nonces.wait_mined(nonce, tx_hash, REBALANCE_RECEIPT_TIMEOUT)
+            except Exception as e:
+                receipt = None
+                print(f"[WALLET_POOL] ⚠️ Rebalance {tx_hash} unconfirmed: {e}")
+            if receipt is None or receipt.get("status") == 0:
+                # The cached balances assumed the transfer landed; re-read them before the next pick
+                donor.balance_read_at = wallet.balance_read_at = 0.0
+                continue
+            print(f"[WALLET_POOL] Rebalanced {amount} wei {donor.address} -> {wallet.address}: {tx_hash}")
+            tx_hashes.append(tx_hash)
+        return tx_hashes
+
+
+_pool: WalletPool | None = None
+
+def get_wallet_pool(w3=None) -> WalletPool:
+    """Returns the process-wide WalletPool built from the environment on first use."""
+    global _pool
+    if _pool is None:
+        _pool = WalletPool.from_env(w3)
+    return _pool
@@ -7,9 +7,20 @@ from google.genai.types import Content, Part, FunctionCall
 from typing import AsyncIterator
 
 from .x402_settlement_tool import X402SettlementTool
+from .mandate_index import current_index
 from pydantic import PrivateAttr
 import json
-import re
+
+PROGRESS_ICONS = {"submitted": "⏳", "confirmed": "✅", "failed": "❌"}
+
+def format_settlement_progress(update: dict) -> str:
+    """One chat line per settlement state change, e.g. `✅ 3/17 Notebooks — confirmed (0x1a2b3c4d…)`."""
+    line = f"{PROGRESS_ICONS[update['status']]} {update['slot'] + 1}/{update['total']} {update['commodity']} — {update['status']}"
+    if update.get("tx_hash"):
+        line += f" (`{update['tx_hash'][:10]}…`)"
+    if update.get("error"):
+        line += f": {update['error']}"
+    return line + "\n"
 
 class ForceToolPaymentProcessor(LlmAgent):
     """
@@ -60,97 +71,20 @@ class ForceToolPaymentProcessor(LlmAgent):
                     authorization_found = True
                     signature = payment_mandate_raw.get("signature")
 
-        # 🚨 THE FIX: Traverse backwards to find the raw MetaMask signature directly!
-        if not signature and hasattr(context.session, 'events') and context.session.events:
-            for event in reversed(context.session.events):
-                if hasattr(event, 'content') and event.content and hasattr(event.content, 'parts') and event.content.parts:
-                    for part in event.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            text = part.text.strip()
-                            # Check 1: The requested JSON flag
-                            if '"authorized": true' in text or '"authorized":true' in text:
-                                authorization_found = True
-                                try:
-                                    parsed = json.loads(text)
-                                    signature = parsed.get("signature")
-                                except:
-                                    pass
-                            # Check 2: Raw regex extraction (bypasses LLM hallucinations)
-                            sig_match = re.search(r'(0x[a-fA-F0-9]{130,})', text)
-                            if sig_match and not signature:
-                                authorization_found = True
-                                signature = sig_match.group(1)
-                if signature:
-                    break
+        # 🚨 THE FIX: Use the raw MetaMask signature indexed from the conversation!
+        index = current_index(context)
+        if not signature and index["signature"]:
+            authorization_found = index["authorized"]
+            signature = index["signature"]
 
         if authorization_found and signature:
             print(f"[PAYMENT_PROCESSOR] ✅ AUTHORIZATION FOUND! Signature extracted: {str(signature)[:15]}...")
             
-            # 2. Extract the CartMandate from the conversation history
-            cart_mandate = None
-            if hasattr(context.session, 'events') and context.session.events:
-                # Traverse backwards to find the last valid JSON block
-                for event in reversed(context.session.events):
-                    if hasattr(event, 'content') and event.content and hasattr(event.content, 'parts') and event.content.parts:
-                        for part in event.content.parts:
-                            if hasattr(part, 'text') and part.text:
-                                text = part.text
-                                json_matches = re.findall(r'```(?:json)?\n([\s\S]*?)\n```', text)
-                                
-                                # If no markdown blocks, try searching for raw JSON objects
-                                if not json_matches:
-                                     try:
-                                         # Find everything between the first { and the last }
-                                         raw_json_match = re.search(r'(\{[\s\S]*\})', text)
-                                         if raw_json_match:
-                                             json_matches = [raw_json_match.group(1)]
-                                     except:
-                                         pass
-
-                                for match in reversed(json_matches): 
-                                    try:
-                                        payload = json.loads(match)
-                                        # Handle the new Batch structure
-                                        if "merchants" in payload and isinstance(payload["merchants"], list):
-                                            cart_mandate = {
-                                                "total_budget": payload.get("total_budget_amount"),
-                                                "currency": payload.get("currency", "USDC"),
-                                                "chain_id": payload.get("chain_id", 324705682), # 🚨 ADD THIS LINE!
-                                                "merchants": payload["merchants"]
-                                            }
-                                        # Handle if wrapped
-                                        elif "cart_mandate" in payload:
-                                            cart_mandate = payload["cart_mandate"]
-                                        # Handle if wrapped in message
-                                        elif "message" in payload and isinstance(payload["message"], dict):
-                                            msg = payload["message"]
-                                            if "merchant_address" in msg and "amount" in msg:
-                                                cart_mandate = {
-                                                    "merchant_address": msg.get("merchant_address"),
-                                                    "amount": msg.get("amount"),
-                                                    "currency": msg.get("currency", "USDC"),
-                                                    "chain_id": msg.get("chain_id", 324705682)
-                                                }
-                                        # Handle if flat
-                                        elif "merchant_address" in payload and "amount" in payload:
-                                            cart_mandate = {
-                                                "merchant_address": payload.get("merchant_address"),
-                                                "amount": payload.get("amount"),
-                                                "currency": payload.get("currency", "USDC"),
-                                                "chain_id": payload.get("chain_id", 324705682)
-                                            }
-                                        if cart_mandate:
-                                            break
-                                    except:
-                                        pass
-                            if cart_mandate:
-                                break
-                    if cart_mandate:
-                        break
+            # 2. Look up the latest CartMandate from the conversation index
+            cart_mandate = index["cart_mandate"]
 
             if not cart_mandate:
                 print("[PAYMENT_PROCESSOR] ❌ Failed to extract cart_mandate from chat history!")
-                from google.adk.events import Event
                 error_content = Content(role="model", parts=[Part(text="❌ Payment processor error: Could not find original mandate in chat history.")])
                 yield Event(invocation_id=context.invocation_id, author=self.name, content=error_content)
                 return
@@ -168,20 +102,28 @@ class ForceToolPaymentProcessor(LlmAgent):
 
             try:
                 print("[PAYMENT_PROCESSOR] Calling x402_settlement tool directly...")
-                result = await self._settlement_tool.run_async(
-                    args={"payment_mandate": combined_payload},
-                    tool_context=None
-                )
+                result = None
+                async for update in self._settlement_tool.settle_stream({"payment_mandate": combined_payload}):
+                    if update["status"] == "result":
+                        result = update["result"]
+                        continue
+                    # Partial events reach the chat over SSE as they happen but are not persisted to history
+                    progress_content = Content(role="model", parts=[Part(text=format_settlement_progress(update))])
+                    yield Event(
+                        invocation_id=context.invocation_id,
+                        author=self.name,
+                        content=progress_content,
+                        partial=True
+                    )
                 print(f"[PAYMENT_PROCESSOR] ✅ Tool returned: {result}")
                 receipts = result.get("receipts", [])
                 if receipts:
                     # 1. Create a JSON block for the frontend to parse automatically
-                    receipt_json = json.dumps(result, indent=2)
+                    # Compact separators: this message is stored in (and replayed from) session history
+                    receipt_json = json.dumps(result, separators=(",", ":"))
                     # 2. Format a message that includes the JSON
                     msg = f"✅ **Payment Complete!**\n\nYour transactions have been securely settled on the SKALE network.\n\n```json\n{receipt_json}\n```"
 
-                    from google.adk.events import Event
-                    from google.genai.types import Content, Part
 
                     success_content = Content(role="model", parts=[Part(text=msg)])
                     yield Event(
@@ -193,7 +135,6 @@ class ForceToolPaymentProcessor(LlmAgent):
                 else:
                     response_text = f"❌ Payment Failed: {result.get('reason', 'Unknown error')}"
                     context.session.state["settlement_receipt"] = result
-                    from google.adk.events import Event
                     response_content = Content(role="model", parts=[Part(text=response_text)])
                     yield Event(
                         invocation_id=context.invocation_id,
@@ -204,7 +145,6 @@ class ForceToolPaymentProcessor(LlmAgent):
                 print(f"[PAYMENT_PROCESSOR] ❌ ERROR calling tool: {e}")
                 import traceback
                 traceback.print_exc()
-                from google.adk.events import Event
                 error_content = Content(role="model", parts=[Part(text=f"❌ Payment processor error: {e}")])
                 yield Event(
                     invocation_id=context.invocation_id,
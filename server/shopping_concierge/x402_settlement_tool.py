@@ -1,21 +1,98 @@
 from google.adk.tools.base_tool import BaseTool, ToolContext
-from typing import Any
+from typing import Any, AsyncIterator
+import asyncio
 import json
 import os
 import random
+from concurrent.futures import ThreadPoolExecutor
+
+from .rpc_client import get_async_web3, SKALE_CHAIN_ID
+from .fee_oracle import FeeOracle, PLAIN_TRANSFER_GAS
+from .wallet_pool import WalletPool, get_wallet_pool
+from .nonce_manager import NonceManager, is_stale_nonce_error
+from .mandate_verifier import mandate_verifier
+from .batch_payout import MAX_PAYOUTS, batch_payout_contract, deploy_batch_payout, parse_payout_events
+
+# Seconds to wait for each payout to be mined before reporting its slot as failed
+RECEIPT_TIMEOUT = float(os.getenv("SETTLEMENT_RECEIPT_TIMEOUT", "120"))
+# Upper bound on one whole settlement, queueing time excluded
+SETTLEMENT_TIMEOUT = float(os.getenv("SETTLEMENT_TIMEOUT", "300"))
+# Settlements allowed to run at once; further checkouts wait for a slot
+SETTLEMENT_MAX_CONCURRENCY = int(os.getenv("SETTLEMENT_MAX_CONCURRENCY", "8"))
+
+# Signature recovery and transaction signing are CPU-bound, so they run on this
+# bounded pool instead of stalling the event loop that serves every /run_sse stream
+_crypto_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SETTLEMENT_CRYPTO_WORKERS", "4")),
+    thread_name_prefix="x402-crypto"
+)
+_settlement_slots = asyncio.Semaphore(SETTLEMENT_MAX_CONCURRENCY)
+
+# pipelined: one transfer per merchant, all submitted before any receipt is awaited
+# sequential: one transfer per merchant, each confirmed before the next is sent
+# batch_contract: every merchant paid by a single BatchPayout.disburse() call
+SETTLEMENT_MODES = ("pipelined", "sequential", "batch_contract")
 
 class X402SettlementTool(BaseTool):
-    def __init__(self):
+    def __init__(
+        self,
+        w3=None,
+        fee_oracle: FeeOracle | None = None,
+        wallet_pool: WalletPool | None = None,
+        mode: str | None = None,
+        batch_contract_address: str | None = None
+    ):
         super().__init__(
             name="x402_settlement",
             description="Settle payments on the x402 blockchain."
         )
+        # Falls back to the shared pooled client when no AsyncWeb3 is injected
+        self._w3 = w3
+        self._fee_oracle = fee_oracle
+        # Agent signer accounts; built from SKALE_AGENT_PRIVATE_KEY(S) on first use
+        self._wallet_pool = wallet_pool
+        self.mode = mode or os.getenv("SETTLEMENT_MODE", "pipelined")
+        if self.mode not in SETTLEMENT_MODES:
+            raise ValueError(f"Unknown settlement mode {self.mode!r}, expected one of {SETTLEMENT_MODES}")
+        # batch_contract mode deploys its own BatchPayout on first use when no address is configured
+        self.batch_contract_address = batch_contract_address or os.getenv("BATCH_PAYOUT_CONTRACT")
+        self._deploy_lock = asyncio.Lock()
 
     async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
-        from web3 import Web3
-        from eth_account.messages import encode_typed_data
-        from eth_account import Account
+        result = None
+        async for update in self.settle_stream(args):
+            if update["status"] == "result":
+                result = update["result"]
+        return result
 
+    async def settle_stream(self, args: dict[str, Any]) -> AsyncIterator[dict]:
+        """
+        Settles the mandate in `args` while yielding per-merchant progress as it happens:
+        {"status": "submitted" | "confirmed" | "failed", "slot", "total", "commodity",
+        "wallet", "amount", "tx_hash", "error"}, and finally {"status": "result", "result"}
+        carrying what run_async() returns.
+        """
+        updates = asyncio.Queue()
+        async with _settlement_slots:
+            task = asyncio.create_task(
+                asyncio.wait_for(self._settle(args, updates.put_nowait), timeout=SETTLEMENT_TIMEOUT)
+            )
+            task.add_done_callback(lambda _: updates.put_nowait(None))
+            try:
+                while (update := await updates.get()) is not None:
+                    yield update
+                try:
+                    result = task.result()
+                except asyncio.TimeoutError:
+                    raise Exception(f"Settlement timed out after {SETTLEMENT_TIMEOUT:.0f}s")
+            finally:
+                # The consumer may stop listening early; don't leave the settlement running unowned
+                if not task.done():
+                    task.cancel()
+        yield {"status": "result", "result": result}
+
+    async def _settle(self, args: dict[str, Any], emit) -> Any:
+        loop = asyncio.get_running_loop()
         payment_mandate = args.get("payment_mandate", {})
         if isinstance(payment_mandate, str):
             try:
@@ -30,57 +107,18 @@ class X402SettlementTool(BaseTool):
         if not signature or not cart_mandate:
             raise Exception("Missing signature or cart_mandate for verification")
 
-        # EIP-712 Domain and Types
-        domain = {
-            "name": "CartBlanche",
-            "version": "1",
-            "chainId": cart_mandate.get("chain_id", 324705682),
-            "verifyingContract": "0x0000000000000000000000000000000000000000"
-        }
-        
-        message = {
-            "merchant_address": cart_mandate.get("merchant_address", "0xFe5e03799Fe833D93e950d22406F9aD901Ff3Bb9"),
-            "amount": cart_mandate.get("amount") or cart_mandate.get("total_budget") or 0,
-            "currency": cart_mandate.get("currency", "USDC")
-        }
-        
-        types = {
-            "EIP712Domain": [
-                {"name": "name", "type": "string"},
-                {"name": "version", "type": "string"},
-                {"name": "chainId", "type": "uint256"},
-                {"name": "verifyingContract", "type": "address"},
-            ],
-            "CartMandate": [
-                {"name": "merchant_address", "type": "address"},
-                {"name": "amount", "type": "uint256"},
-                {"name": "currency", "type": "string"},
-            ],
-        }
+        w3 = self._w3 or await get_async_web3()
 
-        signable_bytes = encode_typed_data(
-            domain_data=domain,
-            message_types={"CartMandate": types["CartMandate"]},
-            message_data=message
+        # Recover signer (EIP-712 CartMandate; repeat verifications are served from the verifier's cache)
+        recovered_address = await loop.run_in_executor(
+            _crypto_executor, mandate_verifier.recover, cart_mandate, signature, SKALE_CHAIN_ID
         )
-        w3 = Web3(Web3.HTTPProvider("https://base-sepolia-testnet.skalenodes.com/v1/jubilant-horrible-ancha"))
-        if not w3.is_connected():
-            raise Exception("Could not connect to SKALE RPC")
-
-        # Recover signer
-        recovered_address = Account.recover_message(signable_bytes, signature=signature)
         print(f"[X402_TOOL] Verified Signer: {recovered_address}")
 
         merchants = cart_mandate.get("merchants", [])
         if not merchants:
             raise Exception("No merchants found in the batch mandate!")
 
-        private_key = os.environ.get("SKALE_AGENT_PRIVATE_KEY")
-        if not private_key:
-            raise Exception("Missing SKALE_AGENT_PRIVATE_KEY in .env")
-        agent_account = w3.eth.account.from_key(private_key)
-        agent_address = agent_account.address
-
         # 🚨 THE 10 PREDEFINED MERCHANT WALLETS 🚨
         MERCHANT_WALLETS = [
             "0xFe5e03799Fe833D93e950d22406F9aD901Ff3Bb9", "0x90C768dDfeA2352511FeEE464BED8b550994d3eB",
@@ -90,68 +128,302 @@ class X402SettlementTool(BaseTool):
             "0xEb18f156d7EC875997729D3CE294848B99A4a35c", "0x32F3CA68C03fa4AA317ec1730012ccF69187Ba23"
         ]
 
-        print(f"[X402_TOOL] Starting MULTI-TX BATCH SETTLEMENT for {len(merchants)} merchants...")
-        tx_hashes = []
-        receipts = []
-        
-        # Get the starting nonce for the wallet
-        current_nonce = w3.eth.get_transaction_count(agent_address)
-
-        # Loop through the list of merchants and pay them all
-        for vendor in merchants:
-            vendor_address = w3.to_checksum_address(random.choice(MERCHANT_WALLETS))
-
-            # 1. Extract the AI's value and strip any $ or commas it might have added
-            raw_val = vendor.get("amount", 0)
-            if isinstance(raw_val, str):
-                raw_val = str(raw_val).replace('$', '').replace(',', '')
-            raw_amount = float(raw_val)
-
-            # 2. SANITIZE WEI: If the AI output USDC 6-decimal format (e.g. 39690000 instead of 39.69)
-            if raw_amount > 10000:
-                raw_amount = raw_amount / 1000000.0
-
-            # 3. 🚨 YOUR STRICT RULE: True Cost in USD / 10,000 🚨
-            actual_value_to_send = raw_amount / 1000000.0
-
-            if actual_value_to_send <= 0:
-                actual_value_to_send = 0.0001 
-
-            commodity_name = vendor.get('name', 'Unknown Item')
-            print(f"[X402_TOOL] Paying {commodity_name} at {vendor_address} ({actual_value_to_send} CREDIT)...")
-
-            # 🚨 THIS IS THE MISSING LOGIC THAT ACTUALLY SENDS IT 🚨
-            tx = {
-                'nonce': current_nonce,
-                'to': vendor_address,
-                'value': w3.to_wei(actual_value_to_send, 'ether'),
-                'gas': 2000000,
-                'gasPrice': w3.eth.gas_price,
-                'chainId': 324705682 
-            }
+        print(f"[X402_TOOL] Starting {self.mode.upper()} BATCH SETTLEMENT for {len(merchants)} merchants...")
+        payouts = [self._build_payout(w3, vendor, MERCHANT_WALLETS) for vendor in merchants]
+        if self._fee_oracle is None:
+            self._fee_oracle = FeeOracle(w3)
 
-            signed_tx = w3.eth.account.sign_transaction(tx, private_key)
-            tx_hash_bytes = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            tx_hash = w3.to_hex(tx_hash_bytes)
+        if self._wallet_pool is None:
+            self._wallet_pool = get_wallet_pool(w3)
 
-            print(f"[X402_TOOL] ⏳ Waiting for confirmation on {tx_hash}...")
-            w3.eth.wait_for_transaction_receipt(tx_hash_bytes, timeout=120)
-            tx_hashes.append(tx_hash)
-            print(f"[X402_TOOL] ✅ Paid! TX: {tx_hash}")
+        # Reserve the payout value plus a transfer's worth of gas per merchant on one wallet
+        gas_reserve = len(payouts) * PLAIN_TRANSFER_GAS * await self._fee_oracle.gas_price()
+        required_value = sum(w3.to_wei(payout["amount"], 'ether') for payout in payouts) + gas_reserve
 
-            receipts.append({
-                "commodity": commodity_name,
-                "wallet": vendor_address,
-                "amount": actual_value_to_send,
-                "tx_hash": tx_hash
-            })
-            
-            # Increment nonce so the next loop's transaction doesn't fail
-            current_nonce += 1
+        async with self._wallet_pool.acquire(required_value) as wallet:
+            print(f"[X402_TOOL] Scheduled on agent wallet {wallet.address} ({wallet.load} in flight)")
+            # Each wallet's nonces come from its process-wide allocator so concurrent checkouts never collide
+            private_key, nonces = wallet.private_key, wallet.nonces
+
+            progress = _SettlementProgress(payouts, emit)
+            try:
+                if self.mode == "batch_contract":
+                    await self._settle_batch_contract(w3, private_key, nonces, progress)
+                else:
+                    txs = await self._prepare_txs(w3, wallet.address, payouts)
+                    if self.mode == "pipelined":
+                        await self._settle_pipelined(w3, private_key, nonces, progress, txs)
+                    else:
+                        await self._settle_sequential(w3, private_key, nonces, progress, txs)
+            finally:
+                # SETTLEMENT_TIMEOUT can cancel the batch after broadcast but before a receipt
+                # wait got to its nonces; don't leave them counted as in flight forever
+                await nonces.reconcile(progress.sent)
+
+        self._wallet_pool.schedule_rebalance(await self._fee_oracle.fee_fields())
+        receipts, failures = progress.outcome()
+
+        if not receipts:
+            return {
+                "status": "failed",
+                "receipts": [],
+                "failures": failures,
+                "network": "SKALE Base Sepolia Testnet",
+                "reason": f"All {len(merchants)} vendor payments failed."
+            }
 
         return {
-            "status": "settled",
+            "status": "settled" if not failures else "partially_settled",
             "receipts": receipts,
+            "failures": failures,
             "network": "SKALE Base Sepolia Testnet",
-            "details": f"Successfully batch-settled {len(merchants)} vendors."
-        }
\ No newline at end of file
+            "details": f"Successfully batch-settled {len(receipts)} of {len(merchants)} vendors."
+        }
+
+    def _build_payout(self, w3, vendor: dict, merchant_wallets: list[str]) -> dict:
+        vendor_address = w3.to_checksum_address(random.choice(merchant_wallets))
+
+        # 1. Extract the AI's value and strip any $ or commas it might have added
+        raw_val = vendor.get("amount", 0)
+        if isinstance(raw_val, str):
+            raw_val = str(raw_val).replace('$', '').replace(',', '')
+        raw_amount = float(raw_val)
+
+        # 2. SANITIZE WEI: If the AI output USDC 6-decimal format (e.g. 39690000 instead of 39.69)
+        if raw_amount > 10000:
+            raw_amount = raw_amount / 1000000.0
+
+        # 3. 🚨 YOUR STRICT RULE: True Cost in USD / 10,000 🚨
+        actual_value_to_send = raw_amount / 1000000.0
+
+        if actual_value_to_send <= 0:
+            actual_value_to_send = 0.0001
+
+        return {
+            "commodity": vendor.get('name', 'Unknown Item'),
+            "wallet": vendor_address,
+            "amount": actual_value_to_send
+        }
+
+    async def _prepare_txs(self, w3, agent_address: str, payouts: list[dict]) -> list[dict]:
+        """
+        Builds the unsigned, nonce-less transfer for every payout. Fee fields come
+        from one cached oracle lookup and gas limits from one batched estimate.
+        """
+        txs = [{
+            'from': agent_address,
+            'to': payout["wallet"],
+            'value': w3.to_wei(payout["amount"], 'ether'),
+            'chainId': SKALE_CHAIN_ID
+        } for payout in payouts]
+        fees = await self._fee_oracle.fee_fields()
+        gas_limits = await self._fee_oracle.estimate_gas_many(txs)
+        return [{**tx, **fees, 'gas': gas} for tx, gas in zip(txs, gas_limits)]
+
+    def _sign(self, w3, private_key: str, tx: dict, nonce: int):
+        unsigned = {key: value for key, value in tx.items() if key != 'from'}
+        return w3.eth.account.sign_transaction({**unsigned, 'nonce': nonce}, private_key)
+
+    async def _submit(self, w3, private_key: str, nonces: NonceManager, txs: list[dict], sent: dict[int, str]) -> list[tuple]:
+        """
+        Signs and broadcasts `txs` back-to-back on nonces drawn from the shared allocator,
+        recording each broadcast as nonce -> tx hash in `sent`.
+
+        Returns one (nonce, tx_hash_bytes, error) per transaction. A transaction that
+        fails to broadcast hands its nonce to the next one, so a failed slot only
+        leaves a gap behind when the allocator has meanwhile served other settlements.
+        When the node says a nonce is already taken, the rest of the reservation is
+        stale too: it is handed back, the sequence resynced, and the transfer retried
+        once on a fresh nonce, so one stale nonce does not fail the whole batch.
+        """
+        loop = asyncio.get_running_loop()
+        results = []
+        async with nonces.submit_lock:
+            reserved = await nonces.allocate(len(txs))
+            try:
+                for index, tx in enumerate(txs):
+                    for attempt in range(2):
+                        nonce = reserved[0]
+                        try:
+                            signed_tx = await loop.run_in_executor(_crypto_executor, self._sign, w3, private_key, tx, nonce)
+                            tx_hash_bytes = await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+                        except Exception as e:
+                            if attempt == 0 and is_stale_nonce_error(e):
+                                print(f"[X402_TOOL] ⚠️ Nonce {nonce} is already used, resyncing and retrying: {e}")
+                                for stale in reserved:
+                                    nonces.release(stale)
+                                await nonces.sync()
+                                reserved = await nonces.allocate(len(txs) - index)
+                                continue
+                            results.append((None, None, str(e)))
+                            break
+                        reserved.pop(0)
+                        nonces.mark_sent(nonce, w3.to_hex(tx_hash_bytes))
+                        sent[nonce] = w3.to_hex(tx_hash_bytes)
+                        results.append((nonce, tx_hash_bytes, None))
+                        break
+            finally:
+                # Also runs when a timeout cancels the settlement mid-batch
+                for nonce in reserved:
+                    nonces.release(nonce)
+        if reserved:
+            await nonces.fill_gaps(private_key, await self._fee_oracle.fee_fields())
+        return results
+
+    async def _settle_sequential(self, w3, private_key: str, nonces: NonceManager, progress, txs: list[dict]):
+        """Send-then-wait: one confirmation round-trip per merchant."""
+        for slot, tx in enumerate(txs):
+            [(nonce, tx_hash_bytes, error)] = await self._submit(w3, private_key, nonces, [tx], progress.sent)
+            if error:
+                progress.failed(slot, None, error)
+                continue
+            tx_hash = w3.to_hex(tx_hash_bytes)
+            progress.submitted(slot, tx_hash)
+
+            _, error = await self._await_receipt(w3, nonces, nonce, tx_hash_bytes)
+            if error:
+                progress.failed(slot, tx_hash, error)
+            else:
+                progress.confirmed(slot, tx_hash)
+
+    async def _settle_pipelined(self, w3, private_key: str, nonces: NonceManager, progress, txs: list[dict]):
+        """
+        Submits every payout back-to-back on consecutive nonces, then awaits
+        all receipts concurrently so the batch costs roughly one block time.
+        """
+        print(f"[X402_TOOL] Submitting {len(txs)} payouts back-to-back...")
+        results = await self._submit(w3, private_key, nonces, txs, progress.sent)
+
+        async def confirm(slot, nonce, tx_hash_bytes):
+            tx_hash = w3.to_hex(tx_hash_bytes)
+            _, error = await self._await_receipt(w3, nonces, nonce, tx_hash_bytes)
+            if error:
+                progress.failed(slot, tx_hash, error)
+            else:
+                progress.confirmed(slot, tx_hash)
+
+        waiting = []
+        for slot, (nonce, tx_hash_bytes, error) in enumerate(results):
+            if error:
+                progress.failed(slot, None, error)
+            else:
+                progress.submitted(slot, w3.to_hex(tx_hash_bytes))
+                waiting.append(confirm(slot, nonce, tx_hash_bytes))
+
+        print(f"[X402_TOOL] ⏳ Waiting for {len(waiting)} confirmations concurrently...")
+        await asyncio.gather(*waiting)
+
+    async def _settle_batch_contract(self, w3, private_key: str, nonces: NonceManager, progress):
+        """
+        Pays every merchant through BatchPayout.disburse(), one transaction per
+        MAX_PAYOUTS merchants, and derives per-merchant receipts from the
+        Payout events it emits.
+        """
+        async with self._deploy_lock:
+            if not self.batch_contract_address:
+                print("[X402_TOOL] No BATCH_PAYOUT_CONTRACT configured, deploying BatchPayout...")
+                self.batch_contract_address = await deploy_batch_payout(w3, private_key, self._fee_oracle, nonces)
+                print(f"[X402_TOOL] ✅ BatchPayout deployed at {self.batch_contract_address}")
+        contract = batch_payout_contract(w3, self.batch_contract_address)
+
+        payouts = progress.payouts
+        chunks = [range(i, min(i + MAX_PAYOUTS, len(payouts))) for i in range(0, len(payouts), MAX_PAYOUTS)]
+        txs = []
+        for chunk in chunks:
+            amounts = [w3.to_wei(payouts[slot]["amount"], 'ether') for slot in chunk]
+            txs.append({
+                'from': nonces.address,
+                'to': contract.address,
+                'value': sum(amounts),
+                'data': contract.encode_abi("disburse", args=[[payouts[slot]["wallet"] for slot in chunk], amounts]),
+                'chainId': SKALE_CHAIN_ID
+            })
+        fees = await self._fee_oracle.fee_fields()
+        gas_limits = await self._fee_oracle.estimate_gas_many(txs)
+        txs = [{**tx, **fees, 'gas': gas} for tx, gas in zip(txs, gas_limits)]
+
+        print(f"[X402_TOOL] Submitting {len(txs)} disburse() call(s)...")
+        results = await self._submit(w3, private_key, nonces, txs, progress.sent)
+
+        for chunk, (nonce, tx_hash_bytes, error) in zip(chunks, results):
+            if error:
+                for slot in chunk:
+                    progress.failed(slot, None, error)
+                continue
+            tx_hash = w3.to_hex(tx_hash_bytes)
+            for slot in chunk:
+                progress.submitted(slot, tx_hash)
+
+            receipt, error = await self._await_receipt(w3, nonces, nonce, tx_hash_bytes)
+            if error:
+                for slot in chunk:
+                    progress.failed(slot, tx_hash, error)
+                continue
+
+            # Payout events number their slots from zero within each disburse() call
+            events = parse_payout_events(contract, receipt)
+            for offset, slot in enumerate(chunk):
+                event = events.get(offset)
+                if event and event["success"]:
+                    progress.confirmed(slot, tx_hash)
+                else:
+                    progress.failed(slot, tx_hash, "Recipient rejected payout, refunded to agent")
+
+    async def _await_receipt(self, w3, nonces: NonceManager, nonce: int, tx_hash_bytes):
+        """
+        Returns (receipt, None) once the transaction is mined successfully, otherwise
+        (receipt or None, failure reason). A mined transaction spends its nonce either way;
+        one whose wait fails is resynced from the node rather than left pending.
+        """
+        try:
+            receipt = await nonces.wait_mined(nonce, tx_hash_bytes, RECEIPT_TIMEOUT)
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+        if receipt.get("status") == 0:
+            return receipt, "Transaction reverted"
+        return receipt, None
+
+
+class _SettlementProgress:
+    """Collects each merchant's outcome and reports every state change as it happens."""
+
+    def __init__(self, payouts: list[dict], emit):
+        self.payouts = payouts
+        self._emit = emit
+        self._receipts: dict[int, dict] = {}
+        self._failures: dict[int, dict] = {}
+        # nonce -> tx hash of every transaction this settlement broadcast
+        self.sent: dict[int, str] = {}
+
+    def _report(self, status: str, slot: int, tx_hash: str | None, error: str | None = None):
+        self._emit({
+            "status": status,
+            "slot": slot,
+            "total": len(self.payouts),
+            **self.payouts[slot],
+            "tx_hash": tx_hash,
+            "error": error
+        })
+
+    def submitted(self, slot: int, tx_hash: str):
+        payout = self.payouts[slot]
+        print(f"[X402_TOOL] ⏳ Submitted {payout['commodity']} to {payout['wallet']} ({payout['amount']} CREDIT): {tx_hash}")
+        self._report("submitted", slot, tx_hash)
+
+    def confirmed(self, slot: int, tx_hash: str):
+        print(f"[X402_TOOL] ✅ Paid {self.payouts[slot]['commodity']}! TX: {tx_hash}")
+        self._receipts[slot] = {**self.payouts[slot], "tx_hash": tx_hash}
+        self._report("confirmed", slot, tx_hash)
+
+    def failed(self, slot: int, tx_hash: str | None, error: str):
+        print(f"[X402_TOOL] ❌ {self.payouts[slot]['commodity']} failed: {error}")
+        self._failures[slot] = {**self.payouts[slot], "tx_hash": tx_hash, "error": error}
+        self._report("failed", slot, tx_hash, error)
+
+    def outcome(self) -> tuple[list[dict], list[dict]]:
+        """(receipts, failures), each in cart order."""
+        return (
+            [self._receipts[slot] for slot in sorted(self._receipts)],
+            [self._failures[slot] for slot in sorted(self._failures)]
+        )
+
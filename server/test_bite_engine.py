@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Checks the hybrid BITE envelopes in shopping_concierge/bite_engine.py:
+1. Fields of any JSON type, including names longer than 255 bytes, round-trip
+2. Two seals of the same fields never share a ciphertext
+3. Flipping any header or body byte, or decrypting with another committee, fails
+4. Committee keys parse from hex, coordinate lists and commonBLSPublicKey0..3 dicts
+
+Run: python test_bite_engine.py
+"""
+
+import asyncio
+import os
+import sys
+
+server_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, server_dir)
+
+from shopping_concierge.bite_engine import (
+    ENVELOPE_VERSION, G2_BYTES, HEADER, LocalCommittee, envelope_epoch, parse_committee_key, seal
+)
+
+committee = LocalCommittee(epoch=12)
+
+
+async def check_round_trip():
+    fields = {
+        "budget": 1250.5,
+        "item_cap:tent": 200,
+        "note": "ünïcode ✓",
+        "tags": ["a", {"b": None}],
+        "n" * 300: True
+    }
+    envelope = seal(fields, committee.public_key, committee.epoch)
+    assert envelope_epoch(envelope) == 12 and envelope[2] == ENVELOPE_VERSION
+    assert committee.decrypt(envelope) == fields
+    assert committee.decrypt(seal({}, committee.public_key, 1)) == {}
+
+
+async def check_fresh_randomness():
+    first = seal({"budget": 1}, committee.public_key, committee.epoch)
+    second = seal({"budget": 1}, committee.public_key, committee.epoch)
+    assert first != second
+    assert first[HEADER.size:HEADER.size + G2_BYTES] != second[HEADER.size:HEADER.size + G2_BYTES]
+
+
+async def check_tampering_is_rejected():
+    envelope = seal({"budget": 500}, committee.public_key, committee.epoch)
+    # Epoch, encapsulated key, nonce, ciphertext and tag
+    for index in (5, HEADER.size + 10, HEADER.size + G2_BYTES + 3, len(envelope) - 20, len(envelope) - 1):
+        tampered = bytearray(envelope)
+        tampered[index] ^= 1
+        try:
+            committee.decrypt(bytes(tampered))
+        except ValueError:
+            continue
+        raise AssertionError(f"flipping byte {index} went unnoticed")
+    try:
+        LocalCommittee().decrypt(envelope)
+        raise AssertionError("another committee's secret opened the envelope")
+    except ValueError:
+        pass
+
+
+async def check_key_formats():
+    expected = parse_committee_key(committee.public_key_hex)
+    coords = [int(committee.public_key_hex[2 + i * 64:2 + (i + 1) * 64], 16) for i in range(4)]
+    assert parse_committee_key(coords) == expected
+    assert parse_committee_key([hex(c) for c in coords]) == expected
+    assert parse_committee_key({f"commonBLSPublicKey{i}": str(c) for i, c in enumerate(coords)}) == expected
+    try:
+        parse_committee_key([1, 2, 3, 4])
+        raise AssertionError("a point off the curve was accepted")
+    except ValueError:
+        pass
+
+
+async def main():
+    checks = [check_round_trip, check_fresh_randomness, check_tampering_is_rejected, check_key_formats]
+    failed = 0
+    for check in checks:
+        try:
+            await check()
+            print(f"✅ PASS: {check.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {check.__name__}: {e}")
+    print("="*80)
+    print("✅ ALL TESTS PASSED!" if not failed else f"❌ {failed} TEST(S) FAILED!")
+    return failed
+
+
+def test_bite_engine():
+    assert asyncio.run(main()) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
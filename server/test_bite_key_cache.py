@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Checks the committee key cache in shopping_concierge/skale_bite.py against a local committee:
+1. Concurrent cold encryptions share one bite_getCommitteesInfo call
+2. Warm encryptions, sync or async, make no call at all
+3. A key past refresh_after keeps being used while a background refresh picks up the new epoch
+4. A key past max_age is never used
+5. encrypt_many() seals every field under one key lookup
+
+Run: python test_bite_key_cache.py
+"""
+
+import asyncio
+import os
+import sys
+
+server_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, server_dir)
+
+from shopping_concierge.bite_engine import LocalCommittee, envelope_epoch
+from shopping_concierge.skale_bite import SkaleBite
+
+
+class CommitteeProvider:
+    """Answers bite_getCommitteesInfo for `committee`, slowly enough for callers to pile up."""
+
+    def __init__(self, committee: LocalCommittee):
+        self.committee = committee
+        self.calls = 0
+
+    async def make_request(self, method, params):
+        assert method == "bite_getCommitteesInfo"
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        return self.committee.committees_info()
+
+
+class FakeWeb3:
+    def __init__(self, committee: LocalCommittee):
+        self.provider = CommitteeProvider(committee)
+
+
+def new_bite(committee: LocalCommittee, **kwargs):
+    w3 = FakeWeb3(committee)
+    # An unreachable URL: any sync fetch would fail the check
+    return SkaleBite("http://127.0.0.1:9", w3=w3, **kwargs), w3.provider
+
+
+async def check_cold_single_flight():
+    committee = LocalCommittee(epoch=3)
+    bite, provider = new_bite(committee)
+    envelopes = await asyncio.gather(*(bite.encrypt_async(i) for i in range(10)))
+    assert provider.calls == 1, f"expected one lookup, got {provider.calls}"
+    assert committee.decrypt(envelopes[7]["ciphertext"]) == {"value": 7}
+
+
+async def check_warm_encrypt_makes_no_call():
+    bite, provider = new_bite(LocalCommittee())
+    await bite.encrypt_async(1)
+    bite.encrypt(250.0)
+    await bite.encrypt_async(2)
+    assert provider.calls == 1 and bite.fetches == 1
+
+
+async def check_background_refresh():
+    bite, provider = new_bite(LocalCommittee(epoch=1), refresh_after=0.05, max_age=60)
+    await bite.encrypt_async(1)
+    await asyncio.sleep(0.06)
+    provider.committee = LocalCommittee(epoch=2)
+    stale = await bite.encrypt_async(1)
+    assert stale["epoch"] == 1, "the caller waited for the refresh"
+    assert bite._refresh_task is not None
+    await bite._refresh_task
+    fresh = await bite.encrypt_async(1)
+    assert fresh["epoch"] == 2 and provider.committee.decrypt(fresh["ciphertext"]) == {"value": 1}
+
+
+async def check_expired_key_is_not_used():
+    bite, provider = new_bite(LocalCommittee(epoch=1), refresh_after=0.01, max_age=0.05)
+    await bite.encrypt_async(1)
+    await asyncio.sleep(0.06)
+    provider.committee = LocalCommittee(epoch=9)
+    envelope = await bite.encrypt_async(1)
+    assert envelope["epoch"] == 9 and provider.calls == 2
+
+
+async def check_encrypt_many():
+    committee = LocalCommittee(epoch=5)
+    bite, provider = new_bite(committee)
+    fields = {"budget": 500, **{f"item_cap:{name}": cap for name, cap in (("tent", 200), ("stove", 80.5))}}
+    envelope = await bite.encrypt_many(fields)
+    ciphertext = bytes.fromhex(envelope["ciphertext"][2:])
+    assert provider.calls == 1 and envelope["fields"] == list(fields)
+    assert envelope_epoch(ciphertext) == 5 and committee.decrypt(ciphertext) == fields
+
+
+async def main():
+    checks = [
+        check_cold_single_flight,
+        check_warm_encrypt_makes_no_call,
+        check_background_refresh,
+        check_expired_key_is_not_used,
+        check_encrypt_many
+    ]
+    failed = 0
+    for check in checks:
+        try:
+            await check()
+            print(f"✅ PASS: {check.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {check.__name__}: {e}")
+    print("="*80)
+    print("✅ ALL TESTS PASSED!" if not failed else f"❌ {failed} TEST(S) FAILED!")
+    return failed
+
+
+def test_bite_key_cache():
+    assert asyncio.run(main()) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
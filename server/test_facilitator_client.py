@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Checks the facilitator transport (shopping_concierge/facilitator_client.py) against mocked responses:
+1. 5xx answers are retried with the same idempotency key
+2. Retry-After is honoured as a floor but never waited past max_backoff
+3. A Retry-After (seconds or HTTP date) beyond the cap or the call's budget ends the retries
+4. The circuit opens after repeated failures, and a cancelled half-open trial frees its slot
+
+Run: python test_facilitator_client.py
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+
+server_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, server_dir)
+
+from shopping_concierge import facilitator_client
+from shopping_concierge.facilitator_client import (
+    IDEMPOTENCY_HEADER, CircuitBreaker, CircuitOpenError, FacilitatorClient, FacilitatorError, ResilientTransport
+)
+
+real_sleep = asyncio.sleep
+sleeps: list[float] = []
+
+
+async def recorded_sleep(seconds: float):
+    sleeps.append(seconds)
+
+
+def flaky(*statuses: int, retry_after: str | None = None):
+    """MockTransport answering with `statuses` in turn (200 afterwards), recording each request."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        status = statuses[len(requests) - 1] if len(requests) <= len(statuses) else 200
+        headers = {"Retry-After": retry_after} if retry_after is not None and status != 200 else {}
+        return httpx.Response(status, headers=headers, json={"success": status == 200})
+
+    return httpx.MockTransport(handler), requests
+
+
+async def send(transport: ResilientTransport) -> httpx.Response:
+    async with httpx.AsyncClient(transport=transport) as client:
+        return await client.post("http://facilitator/settle", json={"amount": 1})
+
+
+async def check_retries_with_idempotency_key():
+    inner, requests = flaky(503, 502)
+    response = await send(ResilientTransport(inner, backoff=0.01))
+    assert response.status_code == 200 and len(requests) == 3
+    assert len({request.headers[IDEMPOTENCY_HEADER] for request in requests}) == 1, "retries used different keys"
+
+
+async def check_retry_after_floor_and_cap():
+    inner, requests = flaky(429, retry_after="3")
+    transport = ResilientTransport(inner, backoff=0.5, max_backoff=10)
+    response = await send(transport)
+    assert response.status_code == 200 and len(requests) == 2
+    assert 3 <= sleeps[-1] <= 10, f"waited {sleeps[-1]}s for Retry-After 3"
+
+
+async def check_long_retry_after_gives_up():
+    in_an_hour = format_datetime(datetime.now(timezone.utc) + timedelta(hours=1))
+    for retry_after in ("3600", in_an_hour):
+        sleeps.clear()
+        inner, requests = flaky(503, retry_after=retry_after)
+        response = await send(ResilientTransport(inner, max_backoff=10))
+        assert response.status_code == 503 and len(requests) == 1 and not sleeps, f"Retry-After {retry_after!r}"
+
+    sleeps.clear()
+    inner, requests = flaky(503, retry_after="5")
+    response = await send(ResilientTransport(inner, max_backoff=10, retry_budget=2))
+    assert response.status_code == 503 and len(requests) == 1 and not sleeps, "waited past the retry budget"
+
+
+async def check_circuit_breaker():
+    breaker = CircuitBreaker(threshold=2, reset_seconds=0.05)
+    inner, requests = flaky(*[500] * 20)
+    transport = ResilientTransport(inner, max_retries=0, breaker=breaker)
+    for _ in range(2):
+        await send(transport)
+    try:
+        await send(transport)
+        raise AssertionError("the circuit did not open")
+    except CircuitOpenError:
+        pass
+    assert len(requests) == 2
+
+    await real_sleep(0.06)
+
+    def hang(request):
+        raise asyncio.CancelledError()
+
+    try:
+        await send(ResilientTransport(httpx.MockTransport(hang), breaker=breaker))
+    except asyncio.CancelledError:
+        pass
+    assert breaker.state == "half_open" and not breaker._trial_in_flight, "a cancelled trial kept the circuit shut"
+
+    client = FacilitatorClient("http://facilitator", transport=flaky(400)[0])
+    try:
+        await client.settle({"amount": 1})
+        raise AssertionError("a 400 did not raise")
+    except FacilitatorError as e:
+        assert e.status_code == 400
+    finally:
+        await client.aclose()
+
+
+async def main():
+    checks = [
+        check_retries_with_idempotency_key,
+        check_retry_after_floor_and_cap,
+        check_long_retry_after_gives_up,
+        check_circuit_breaker
+    ]
+    failed = 0
+    # Record the backoff waits instead of sleeping through them
+    facilitator_client.asyncio.sleep = recorded_sleep
+    try:
+        for check in checks:
+            try:
+                await check()
+                print(f"✅ PASS: {check.__name__}")
+            except AssertionError as e:
+                failed += 1
+                print(f"❌ FAIL: {check.__name__}: {e}")
+    finally:
+        facilitator_client.asyncio.sleep = real_sleep
+    print("="*80)
+    print("✅ ALL TESTS PASSED!" if not failed else f"❌ {failed} TEST(S) FAILED!")
+    return failed
+
+
+def test_facilitator_client():
+    assert asyncio.run(main()) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -1,12 +1,14 @@
 import asyncio
 import os
 import json
-from web3 import Web3
 from eth_account import Account
 from eth_account.messages import encode_typed_data
+from eth_utils import keccak
 
 # Import your actual tool
 from shopping_concierge.x402_settlement_tool import X402SettlementTool
+from shopping_concierge.rpc_client import get_async_web3
+from shopping_concierge.mandate_verifier import mandate_verifier, mandate_message, CART_MANDATE_TYPE
 
 # 1. Create a dummy "User" wallet to sign the mandate
 dummy_user_key = "0x" + "1" * 64
@@ -40,35 +42,26 @@ cart_mandate = {
     ]
 }
 
-# 3. Mathematically construct the EIP-712 Signature
-domain = {
-    "name": "CartBlanche",
-    "version": "1",
-    "chainId": cart_mandate["chain_id"],
-    "verifyingContract": "0x0000000000000000000000000000000000000000"
-}
-message = {
-    "merchant_address": cart_mandate["merchant_address"],
-    "amount": cart_mandate["amount"],
-    "currency": cart_mandate["currency"]
-}
-types = {
-    "EIP712Domain": [
-        {"name": "name", "type": "string"},
-        {"name": "version", "type": "string"},
-        {"name": "chainId", "type": "uint256"},
-        {"name": "verifyingContract", "type": "address"},
-    ],
-    "CartMandate": [
-        {"name": "merchant_address", "type": "address"},
-        {"name": "amount", "type": "uint256"},
-        {"name": "currency", "type": "string"},
-    ],
-}
-
-signable_bytes = encode_typed_data(domain_data=domain, message_types={"CartMandate": types["CartMandate"]}, message_data=message)
-signed_message = Account.sign_message(signable_bytes, private_key=user_account.key)
+# 3. Mathematically construct the EIP-712 Signature with the same verifier the tool uses
+message = mandate_message(cart_mandate)
+digest = mandate_verifier.digest(cart_mandate["chain_id"], message)
+
+# Sanity check: the precompiled digest must match eth_account's generic EIP-712 encoder
+signable_bytes = encode_typed_data(
+    domain_data={
+        "name": "CartBlanche",
+        "version": "1",
+        "chainId": cart_mandate["chain_id"],
+        "verifyingContract": "0x0000000000000000000000000000000000000000"
+    },
+    message_types={"CartMandate": CART_MANDATE_TYPE},
+    message_data=message
+)
+assert keccak(b"\x19" + signable_bytes.version + signable_bytes.header + signable_bytes.body) == digest, "Verifier digest does not match encode_typed_data!"
+
+signed_message = Account.unsafe_sign_hash(digest, private_key=user_account.key)
 signature = signed_message.signature.hex()
+assert mandate_verifier.recover(cart_mandate, signature) == user_account.address, "Verifier recovered the wrong signer!"
 
 # 4. Package it exactly like the LLM does
 payment_mandate = {
@@ -112,9 +105,9 @@ async def run_test():
     print(f"🧮 SIMULATION MATH: Agent will attempt to send exactly {total_tx_value:.5f} sFUEL")
 
     # Connect to blockchain to check real balance
-    w3 = Web3(Web3.HTTPProvider("https://base-sepolia-testnet.skalenodes.com/v1/jubilant-horrible-ancha"))
+    w3 = await get_async_web3()
     agent_account = w3.eth.account.from_key(private_key)
-    balance_wei = w3.eth.get_balance(agent_account.address)
+    balance_wei = await w3.eth.get_balance(agent_account.address)
     balance_sfuel = float(w3.from_wei(balance_wei, 'ether'))
 
     print(f"💰 ACTUAL WALLET BALANCE: {balance_sfuel:.5f} sFUEL")
@@ -128,7 +121,7 @@ async def run_test():
     else:
         print("✅ SIMULATION PASSED: Sufficient funds detected.\n")
 
-    tool = X402SettlementTool()
+    tool = X402SettlementTool(w3=w3)
     
     print("🚀 Firing X402 Settlement Tool (Real SKALE Multi-TX)...\n")
     try:
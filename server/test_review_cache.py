@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Checks the premium review cache without a provider or chain:
+1. Concurrent lookups of one product share a single paid fetch
+2. A waiter takes over a fetch whose caller was cancelled
+3. Expired and least recently used entries are fetched again
+4. Cache hits drop the voucher/tx that paid for the original fetch
+
+Run: python test_review_cache.py
+"""
+
+import asyncio
+import os
+import sys
+
+server_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, server_dir)
+
+from shopping_concierge import premium_reviews_tool
+from shopping_concierge.premium_reviews_tool import PAYMENT_FIELDS, PremiumReviewsTool, ReviewCache
+
+
+def counting_fetch(delay: float = 0.05):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return {"premium_insight": f"fetch #{len(calls)}"}
+
+    return fetch, calls
+
+
+async def check_single_flight():
+    cache = ReviewCache()
+    fetch, calls = counting_fetch()
+    results = await asyncio.gather(*(cache.get_or_fetch("mouse", fetch) for _ in range(5)))
+    assert len(calls) == 1, f"expected one paid fetch, got {len(calls)}"
+    assert [hit for _, hit in results].count(False) == 1
+    assert (cache.hits, cache.misses) == (4, 1)
+
+
+async def check_cancelled_leader():
+    cache = ReviewCache()
+    fetch, calls = counting_fetch()
+    leader = asyncio.create_task(cache.get_or_fetch("desk", fetch))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(cache.get_or_fetch("desk", fetch))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    reviews, cache_hit = await waiter
+    assert reviews == {"premium_insight": "fetch #2"} and cache_hit is False
+    assert len(calls) == 2
+
+
+async def check_ttl_and_lru():
+    cache = ReviewCache(ttl=0.05, max_entries=2)
+    fetch, calls = counting_fetch(delay=0)
+    await cache.get_or_fetch("a", fetch)
+    await asyncio.sleep(0.06)
+    _, cache_hit = await cache.get_or_fetch("a", fetch)
+    assert cache_hit is False, "an expired entry was served"
+    cache.ttl = 60
+    await cache.get_or_fetch("b", fetch)
+    await cache.get_or_fetch("c", fetch)
+    _, cache_hit = await cache.get_or_fetch("a", fetch)
+    assert cache_hit is False, "the least recently used entry was not evicted"
+    assert len(calls) == 5
+
+
+async def check_hit_drops_payment():
+    premium_reviews_tool.review_cache = ReviewCache()
+    tool = PremiumReviewsTool()
+
+    async def paid_fetch(product_name):
+        return {"product": product_name, "premium_insight": "ok", "agent_cost_incurred": "0.01 USDC",
+                "payment_voucher": {"channel_id": "0x01", "nonce": 1, "cumulative_amount": 10000}}
+
+    tool._fetch_premium_reviews = paid_fetch
+    first = await tool.run_async(args={"product_name": "Mouse"}, tool_context=None)
+    second = await tool.run_async(args={"product_name": "  mouse "}, tool_context=None)
+    assert first["cache_hit"] is False and "payment_voucher" in first
+    assert second["cache_hit"] is True and second["payment"] == "cached"
+    assert second["agent_cost_incurred"] == "0.00 USDC"
+    assert not any(field in second for field in PAYMENT_FIELDS), second
+
+
+async def main():
+    checks = [check_single_flight, check_cancelled_leader, check_ttl_and_lru, check_hit_drops_payment]
+    failed = 0
+    for check in checks:
+        try:
+            await check()
+            print(f"✅ PASS: {check.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {check.__name__}: {e}")
+    print("="*80)
+    print("✅ ALL TESTS PASSED!" if not failed else f"❌ {failed} TEST(S) FAILED!")
+    return failed
+
+
+def test_review_cache():
+    assert asyncio.run(main()) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Checks session compaction (shopping_concierge/session_compaction.py) on a scratch ADK SQLite DB:
+1. A tool-heavy session is folded into one summary event plus its tail
+2. The kept tail never starts with a tool response cut off from its call
+3. The compacted session still loads and accepts new events
+4. Short sessions and a pass with nothing to do leave the DB untouched
+
+Run: python test_session_compaction.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+server_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, server_dir)
+
+from google.adk.events import Event
+from google.adk.sessions.sqlite_session_service import SqliteSessionService
+from google.genai.types import Content, FunctionCall, FunctionResponse, Part
+from shopping_concierge.session_compaction import CompactionPolicy, compact_session_db
+
+POLICY = CompactionPolicy(compact_after=6, keep_events=3, idle_seconds=-1)
+
+
+async def tool_heavy_session(service: SqliteSessionService, calls: int = 4):
+    session = await service.create_session(
+        app_name="test", user_id="u", state={"discovery_data": "1. **Gel Pen** - Price: $2"}
+    )
+    await service.append_event(session, Event(author="user", content=Content(role="user", parts=[Part(text="find pens")])))
+    for i in range(calls):
+        await service.append_event(session, Event(author="ShoppingAgent", content=Content(role="model", parts=[
+            Part(function_call=FunctionCall(id=f"call-{i}", name="get_premium_reviews", args={"product_name": "pen"}))
+        ])))
+        await service.append_event(session, Event(author="ShoppingAgent", content=Content(role="user", parts=[
+            Part(function_response=FunctionResponse(id=f"call-{i}", name="get_premium_reviews", response={"ok": i}))
+        ])))
+    await service.append_event(session, Event(author="ShoppingAgent", content=Content(role="model", parts=[Part(text="done")])))
+    return session
+
+
+async def check_tool_heavy_session(db_path: str):
+    service = SqliteSessionService(db_path)
+    session = await tool_heavy_session(service)
+    stats = compact_session_db(db_path, POLICY)
+    assert stats["sessions_compacted"] == 1 and stats["events_removed"] > 0, stats
+
+    events = (await service.get_session(app_name="test", user_id="u", session_id=session.id)).events
+    assert len(events) < 10, f"expected fewer than 10 events, got {len(events)}"
+    compaction = events[0].actions.compaction
+    assert compaction is not None, "the first event is not a compaction summary"
+    assert "Gel Pen" in compaction.compacted_content.parts[0].text
+    assert not events[1].content.parts[0].function_response, "the tail starts with an orphaned tool response"
+
+    loaded = await service.get_session(app_name="test", user_id="u", session_id=session.id)
+    await service.append_event(loaded, Event(author="user", content=Content(role="user", parts=[Part(text="approve")])))
+
+
+async def check_idle_pass(db_path: str):
+    service = SqliteSessionService(db_path)
+    await service.append_event(
+        await service.create_session(app_name="test", user_id="short"),
+        Event(author="user", content=Content(role="user", parts=[Part(text="hi")]))
+    )
+    compact_session_db(db_path, POLICY)
+    modified = os.path.getmtime(db_path)
+    stats = compact_session_db(db_path, POLICY)
+    assert stats["sessions_compacted"] == 0 and stats["events_removed"] == 0, stats
+    assert os.path.getmtime(db_path) == modified, "a pass with nothing to do rewrote the DB"
+
+
+async def main():
+    checks = [check_tool_heavy_session, check_idle_pass]
+    failed = 0
+    for check in checks:
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                await check(os.path.join(tmp, "sessions.db"))
+            print(f"✅ PASS: {check.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {check.__name__}: {e}")
+    print("="*80)
+    print("✅ ALL TESTS PASSED!" if not failed else f"❌ {failed} TEST(S) FAILED!")
+    return failed
+
+
+def test_session_compaction():
+    assert asyncio.run(main()) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Checks the latest-session directory (shopping_concierge/session_directory.py) over an in-memory store:
+1. Concurrent first requests from one user share a single new session
+2. Sessions created or written through the wrapper become the user's latest at once
+3. Sessions created around the wrapper are picked up after the TTL
+4. Deleting the latest session falls back to the user's remaining one
+5. Per-user locks are dropped once nobody holds them
+
+Run: python test_session_directory.py
+"""
+
+import asyncio
+import os
+import sys
+
+server_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, server_dir)
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai.types import Content, Part
+from shopping_concierge.session_directory import SessionDirectory
+
+
+async def check_concurrent_first_requests():
+    directory = SessionDirectory(InMemorySessionService())
+    sessions = await asyncio.gather(*(directory.get_or_create("app", "u") for _ in range(10)))
+    assert len({session.id for session in sessions}) == 1, "one user got several sessions"
+    assert not directory._locks, f"idle locks left behind: {directory._locks}"
+
+
+async def check_writes_through_wrapper():
+    directory = SessionDirectory(InMemorySessionService(), ttl=60)
+    first = await directory.get_or_create("app", "u")
+    second = await directory.session_service.create_session(app_name="app", user_id="u")
+    assert (await directory.latest("app", "u")).id == second.id
+
+    await directory.session_service.append_event(
+        first, Event(author="user", content=Content(role="user", parts=[Part(text="hi")]))
+    )
+    assert (await directory.latest("app", "u")).id == first.id, "the session just written to is not the latest"
+
+
+async def check_sessions_created_around_wrapper():
+    inner = InMemorySessionService()
+    directory = SessionDirectory(inner, ttl=0.1)
+    known = await directory.get_or_create("app", "u")
+    await asyncio.sleep(0.01)
+    outside = await inner.create_session(app_name="app", user_id="u")
+    assert (await directory.latest("app", "u")).id == known.id, "the cached id was not trusted within the TTL"
+    await asyncio.sleep(0.15)
+    assert (await directory.latest("app", "u")).id == outside.id, "a newer session was missed after the TTL"
+
+
+async def check_delete_falls_back():
+    directory = SessionDirectory(InMemorySessionService())
+    older = await directory.get_or_create("app", "u")
+    newer = await directory.session_service.create_session(app_name="app", user_id="u")
+    await directory.session_service.delete_session(app_name="app", user_id="u", session_id=newer.id)
+    assert (await directory.latest("app", "u")).id == older.id
+    await directory.session_service.delete_session(app_name="app", user_id="u", session_id=older.id)
+    assert await directory.latest("app", "u") is None
+
+
+async def main():
+    checks = [
+        check_concurrent_first_requests,
+        check_writes_through_wrapper,
+        check_sessions_created_around_wrapper,
+        check_delete_falls_back
+    ]
+    failed = 0
+    for check in checks:
+        try:
+            await check()
+            print(f"✅ PASS: {check.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {check.__name__}: {e}")
+    print("="*80)
+    print("✅ ALL TESTS PASSED!" if not failed else f"❌ {failed} TEST(S) FAILED!")
+    return failed
+
+
+def test_session_directory():
+    assert asyncio.run(main()) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)